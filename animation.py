@@ -1,6 +1,9 @@
+import math
 import tkinter as tk
 from tkinter import Canvas, Scrollbar
 
+from designtool.keyframes import KeyframeIndex
+
 class Timeline(tk.Frame):
     def __init__(self, master):
         super().__init__(master)
@@ -20,15 +23,20 @@ class Timeline(tk.Frame):
         self.canvas_pad_y = 5
         self.canvas = Canvas(self, height=self.canvas_height, bg="#f0f0f0", scrollregion=(0, 0, 1000, self.canvas_height))
         self.scrollbar = Scrollbar(self, orient="horizontal", command=self.canvas.xview)
-        self.canvas.config(xscrollcommand=self.scrollbar.set)
+        self.canvas.config(xscrollcommand=self.on_scroll)
 
         self.canvas.pack(side="top", fill="both", expand=True, padx=self.canvas_pad_x, pady=self.canvas_pad_y)
         self.scrollbar.pack(side="bottom", fill="x")
 
-        self.keyframes = []  # List to store keyframe markers
-        self.frames = []  # List to store frame lines
+        # Only the frames inside the visible scroll window have canvas items;
+        # they are redrawn from these whenever the view moves
+        self.keyframes = KeyframeIndex()  # Frame numbers that have a keyframe marker
+        self.ranges = []  # (start, stop) frame ranges filled by effects, drawn as bars
+        self.frame_lines = {}  # Frame number -> line item, for the visible frames
+        self.keyframe_markers = {}  # Frame number -> marker item, for the visible keyframes
 
         self.selected_frame = None  # Currently selected frame
+        self.drawn_width = None  # Canvas width the visible frames were last drawn for
 
         # Buttons for adding and removing keyframes
         self.button_frame = tk.Frame(self)
@@ -54,50 +62,105 @@ class Timeline(tk.Frame):
 
         self.canvas.bind("<Button-1>", self.on_canvas_click)
         
-        # Bind resize event to adjust canvas layout
-        master.bind("<Configure>", self.on_resize)
+        # Bind resize event to adjust canvas layout; the canvas's own event, since the
+        # master's also fires for every child widget that is moved or resized
+        self.canvas.bind("<Configure>", self.on_resize)
 
     def draw_frames(self):
         # Calculate total width for frames based on padding and spacing
         total_width = self.padding_left + self.frame_spacing * (self.total_frames - 1) + 50  # Extra padding on right
         self.canvas.config(scrollregion=(0, 0, total_width, self.canvas_height))
+        self.draw_visible()
+
+    def frame_x(self, frame_num):
+        return self.padding_left + frame_num * self.frame_spacing
+
+    def visible_frames(self):
+        # Range of frames inside the visible part of the canvas
+        left = self.canvas.canvasx(0)
+        width = max(self.canvas.winfo_width(), self.canvas_width)
+        first = max(0, math.floor((left - self.padding_left) / self.frame_spacing))
+        last = min(self.total_frames, math.ceil((left + width - self.padding_left) / self.frame_spacing) + 1)
+        return range(first, last)
+
+    def draw_visible(self):
+        # Recreate the items for the visible frames only
+        self.canvas.delete("frame", "keyframe", "range")
+        self.frame_lines.clear()
+        self.keyframe_markers.clear()
+        visible = self.visible_frames()
+
+        # Effect ranges as bars along the bottom, behind the frame lines
+        for start, stop in self.ranges:
+            if start < visible.stop and stop > visible.start:
+                self.canvas.create_rectangle(
+                    self.frame_x(start), self.canvas_height - 8, self.frame_x(stop - 1), self.canvas_height,
+                    fill="orange", outline="", tags="range"
+                )
 
         # Draw vertical lines to represent frames
-        for i in range(self.total_frames):
-            x = self.padding_left + i * self.frame_spacing
-            frame = self.canvas.create_line(x, 0, x, self.canvas_height, fill="gray")  # Shorter lines
-            self.frames.append(frame)
+        for i in visible:
+            x = self.frame_x(i)
+            fill = "red" if i == self.selected_frame else "gray"
+            self.frame_lines[i] = self.canvas.create_line(x, 0, x, self.canvas_height, fill=fill, tags="frame")  # Shorter lines
+
+        # Create the keyframe polygons centered around the frame lines
+        for i in self.keyframes.between(visible.start, visible.stop):
+            self.draw_keyframe_marker(i)
+
+    def draw_keyframe_marker(self, frame_num):
+        x = self.frame_x(frame_num)
+        center_y = self.canvas_height // 2
+        self.keyframe_markers[frame_num] = self.canvas.create_polygon(
+            x - 10, center_y,  # Top left
+            x, center_y - 10,      # Top center
+            x + 10, center_y,  # Top right
+            x, center_y + 10,       # Bottom center
+            fill="blue", outline="black", tags="keyframe"
+        )
+
+    def set_ranges(self, ranges):
+        self.ranges = list(ranges)
+        self.draw_visible()
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.draw_visible()
+
+    def set_total_frames(self, total_frames):
+        # Grow the timeline so it has at least total_frames frames
+        if total_frames > self.total_frames:
+            self.total_frames = total_frames
+            self.draw_frames()
 
     def on_canvas_click(self, event):
         # Adjust event.x by the canvas's current scroll offset
         scroll_offset = self.canvas.canvasx(0)
         click_x = event.x + scroll_offset
 
-        # Handle clicks on the canvas to select a frame
-        for i, frame in enumerate(self.frames):
-            x1, _, x2, _ = self.canvas.coords(frame)
-            if x1 - 5 <= click_x <= x2 + 5:  # Click within the frame line area
-                self.select_frame(i)
-                break
+        # Handle clicks on the canvas to select the nearest frame
+        frame_num = round((click_x - self.padding_left) / self.frame_spacing)
+        if 0 <= frame_num < self.total_frames and abs(click_x - self.frame_x(frame_num)) <= 5:  # Click within the frame line area
+            self.select_frame(frame_num)
 
     def add_keyframe_ui(self, frame_num):
-        # Add a keyframe marker to the selected frame
-        if self.selected_frame is not None:
-            x = self.selected_frame * self.frame_spacing + self.padding_left
-            # Get the coordinates of the selected frame line
-            x1, y1, x2, y2 = self.canvas.coords(self.frames[self.selected_frame])
-            # Calculate the center of the frame line
-            center_y = (y1 + y2) // 2
-
-            # Create the keyframe polygon centered around the frame line
-            keyframe = self.canvas.create_polygon(
-                x - 10, center_y,  # Top left
-                x, center_y - 10,      # Top center
-                x + 10, center_y,  # Top right
-                x, center_y + 10,       # Bottom center
-                fill="blue", outline="black"
-            )
-            self.keyframes.append((self.selected_frame, keyframe))
+        # Add a keyframe marker to the given frame; only that marker is drawn
+        if frame_num is not None and frame_num not in self.keyframes:
+            self.keyframes.add(frame_num)
+            if frame_num in self.frame_lines:
+                self.draw_keyframe_marker(frame_num)
+
+    def add_keyframes_ui(self, frame_nums):
+        # Add markers to many frames at once, drawing only the visible ones
+        for frame_num in frame_nums:
+            self.add_keyframe_ui(frame_num)
+
+    def remove_keyframe_ui(self, frame_num):
+        # Take the marker off the given frame
+        self.keyframes.remove(frame_num)
+        marker = self.keyframe_markers.pop(frame_num, None)
+        if marker is not None:
+            self.canvas.delete(marker)
 
     def add_keyframe(self):
         # Calculate the frame number from the x-coordinate of the selected frame
@@ -108,21 +171,18 @@ class Timeline(tk.Frame):
 
     def remove_keyframe(self):
         # Remove the keyframe at the selected frame
-        if self.selected_frame is not None:
-            for i, (frame_index, keyframe) in enumerate(self.keyframes):
-                if frame_index == self.selected_frame:
-                    self.canvas.delete(keyframe)
-                    del self.keyframes[i]
-                    break
+        if self.selected_frame is not None and self.selected_frame in self.keyframes:
+            self.remove_keyframe_ui(self.selected_frame)
+            for func in self.remove_keyframe_handler:
+                func(self.selected_frame)
 
     def select_frame_ui(self, frame_num):
-        # Highlight the selected frame
-        if self.selected_frame is not None:
-            # Reset previous selection
-            self.canvas.itemconfig(self.frames[self.selected_frame], fill="gray")
-
-        self.selected_frame = frame_num
-        self.canvas.itemconfig(self.frames[frame_num], fill="red")
+        # Highlight the selected frame by recoloring two lines, so playback redraws nothing else
+        previous, self.selected_frame = self.selected_frame, frame_num
+        if previous in self.frame_lines:
+            self.canvas.itemconfigure(self.frame_lines[previous], fill="gray")
+        if frame_num in self.frame_lines:
+            self.canvas.itemconfigure(self.frame_lines[frame_num], fill="red")
 
     def select_frame(self, frame_num):
         for func in self.select_frame_handler:
@@ -137,8 +197,10 @@ class Timeline(tk.Frame):
             func()
 
     def on_resize(self, event):
-        # Adjust canvas layout when window is resized
-        self.canvas.config(scrollregion=(0, 0, self.canvas.bbox("all")[2], self.canvas_height))
+        # More or fewer frames may be visible after the canvas gets wider or narrower
+        if event.width != self.drawn_width:
+            self.drawn_width = event.width
+            self.draw_visible()
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,182 @@
+"""
+Headless benchmarks for the design tool's hot paths.
+
+Runs without a display or hardware: grids are GridModels and plain arrays,
+and the controller is a stub. Results are printed (or written) as JSON so
+runs can be compared when the quantizer, file format or renderer changes.
+
+    python -m designtool.benchmarks.hotpaths --sizes 20 64 --output bench.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from designtool import colorconversion
+from designtool.colorconversion import PALETTE_CODES, codes_to_hex_grid, rgb_array_to_codes, rgb_to_hex
+from designtool.filesave import save_frames_to_binary, save_grid_to_file
+from designtool.gridmodel import GridModel
+from designtool.keyframes import KeyframeIndex
+from designtool.sender import FrameSender
+from designtool.tween import Tweener
+
+DEFAULT_SIZES = (20, 64, 128, 256)
+
+
+class StubController:
+    """Stands in for LightsController: accepts frames and does nothing with them."""
+
+    def __init__(self):
+        self.frames_sent = 0
+
+    async def connect(self, run_simul_on_fail=False):
+        pass
+
+    async def drawFrame(self, grid):
+        self.frames_sent += 1
+
+
+def measure(func, repeat, min_time=0.05):
+    """
+    Time func, calling it enough times per sample to smooth out timer noise.
+
+    Returns:
+        dict: Best and median seconds per call, and the number of calls made.
+    """
+    # Find how many calls make one sample last at least min_time
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        if time.perf_counter() - start >= min_time or calls >= 1 << 16:
+            break
+        calls *= 2
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        samples.append((time.perf_counter() - start) / calls)
+    return {"best_s": min(samples), "median_s": statistics.median(samples), "calls": calls * repeat}
+
+
+def random_design(size, rng):
+    # A mostly-off design with some lit regions, like a real one
+    codes = np.full((size, size), 0xFE, dtype=np.uint8)
+    lit = rng.random((size, size)) < 0.3
+    codes[lit] = rng.choice(PALETTE_CODES, lit.sum())
+    return codes
+
+
+def bench_size(size, repeat, workdir):
+    rng = np.random.default_rng(size)
+    codes = random_design(size, rng)
+    model = GridModel(size, size, keep_rgb=True)  # What both front ends keep the grid in
+    model.set_codes(codes)
+    hex_grid = codes_to_hex_grid(codes.T)  # grid[x][y], what the controller and save path take
+    rgb = rng.integers(0, 256, (size, size, 3))
+    rgb_tuples = [tuple(color) for color in rgb.reshape(-1, 3).tolist()]
+    text_path = os.path.join(workdir, "grid.lcf")
+    binary_path = os.path.join(workdir, "grid_v2.lcf")
+
+    # Keyframes every 10 frames, looked up across the whole timeline
+    keyframe_count = 1000
+    index = KeyframeIndex(range(0, keyframe_count * 10, 10))
+    lookups = rng.integers(0, keyframe_count * 10, 1000).tolist()
+
+    tweener = Tweener("linear")
+    tweener.set_keyframe(0, codes)
+    tweener.set_keyframe(100, random_design(size, rng))
+
+    controller = StubController()
+    sender = FrameSender()
+    frames = [random_design(size, rng).T for _ in range(2)]
+    frame_cycle = itertools.count()
+    loop = asyncio.new_event_loop()
+
+    def rgb_to_hex_once():
+        # Drop the cached palette matches so every call searches the palette
+        colorconversion._nearest_code.cache_clear()
+        for color in rgb_tuples:
+            rgb_to_hex(color)
+
+    def tween_once():
+        # Drop the cached blend so every call computes the frame
+        tweener.cache.invalidate()
+        tweener.frame(50)
+
+    def send_once():
+        loop.run_until_complete(sender.send(controller, frames[next(frame_cycle) % 2]))
+
+    def end_to_end_once():
+        # Take the current frame from the model and send it
+        loop.run_until_complete(sender.send(controller, model.frame().copy(), force=True))
+
+    benchmarks = {
+        "rgb_to_hex": rgb_to_hex_once,
+        "rgb_array_to_codes": lambda: rgb_array_to_codes(rgb),
+        "model_color_grid": model.color_grid,
+        "model_frame": lambda: model.frame().copy(),
+        "save_grid_to_file": lambda: save_grid_to_file(hex_grid, text_path),
+        "save_frames_to_binary": lambda: save_frames_to_binary([codes.T], binary_path),
+        "keyframe_select": lambda: [index.previous(frame_num) for frame_num in lookups],
+        "tween_frame": tween_once,
+        "send_delta": send_once,
+        "send_end_to_end": end_to_end_once,
+    }
+    # Per-call work: cells for grid benchmarks, lookups for keyframe_select
+    units = {name: size * size for name in benchmarks}
+    units["keyframe_select"] = len(lookups)
+
+    results = []
+    try:
+        for name, func in benchmarks.items():
+            result = measure(func, repeat)
+            result.update(
+                name=name, size=size, units=units[name],
+                units_per_s=units[name] / result["best_s"] if result["best_s"] else None,
+            )
+            results.append(result)
+    finally:
+        loop.close()
+    return results
+
+
+def run(sizes=DEFAULT_SIZES, repeat=5):
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [result for size in sizes for result in bench_size(size, repeat, workdir)]
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "timestamp": time.time(),
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the design tool's hot paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Grid sizes (N for N x N)")
+    parser.add_argument("--repeat", type=int, default=5, help="Samples per benchmark")
+    parser.add_argument("--output", help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    report = json.dumps(run(args.sizes, args.repeat), indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,213 @@
-# Function to find the closest 2-digit hex value for an RGB color
-def rgb_to_hex(color_code):
+import functools
+
+import numpy as np
+
+# Predefined data points for color matching (palette code -> bulb RGB)
+# Order matters: ties in the nearest-color search resolve to the earliest entry
+PALETTE = {
+    0x00: (255, 0, 0), 0x07: (252, 136, 59), 0x10: (251, 250, 110),
+    0x17: (218, 240, 91), 0x20: (178, 240, 83), 0x27: (139, 243, 69),
+    0x30: (18, 245, 79), 0x37: (0, 247, 78), 0x40: (0, 255, 182),
+    0x47: (0, 255, 255), 0x50: (0, 196, 250), 0x57: (0, 174, 254),
+    0x60: (0, 137, 251), 0x67: (0, 117, 253), 0x70: (0, 64, 253),
+    0x77: (0, 1, 255), 0x80: (91, 0, 255), 0x87: (103, 0, 255),
+    0x90: (146, 0, 255), 0x97: (164, 0, 254), 0xA0: (190, 0, 254),
+    0xA7: (255, 0, 253), 0xB0: (255, 0, 191), 0xB7: (255, 80, 14),
+    0xC0: (250, 198, 85), 0xC7: (245, 237, 91), 0xD0: (203, 236, 83),
+    0xD7: (168, 239, 93), 0xE0: (106, 242, 95), 0xE7: (14, 245, 93),
+    0xF0: (0, 249, 85), 0xF7: (0, 242, 211), 0xFC: (0, 234, 243),
+    0xFD: (252, 181, 141), 0xFE: (0, 0, 0), 0xFF: (255, 255, 255),
+}
+
+# Array forms of the palette, built once at import
+PALETTE_CODES = np.array(list(PALETTE.keys()), dtype=np.uint8)
+PALETTE_RGB = np.array(list(PALETTE.values()), dtype=np.int64)
+
+# Code -> 2-digit hex string, e.g. 0xFE -> "FE"
+HEX_STRINGS = np.array([f"{code:02X}" for code in range(256)])
+
+_HEX_TO_CODE = {text: code for code, text in enumerate(HEX_STRINGS.tolist())}
+
+# Distinct colors whose palette code rgb_to_code remembers; the least recently used are forgotten
+_CODE_CACHE_SIZE = 4096
+
+# Number of distinct colors matched against the palette at once in rgb_array_to_codes
+_CHUNK_SIZE = 16384
+
+
+def _nearest_codes(rgb):
+    # Brute force nearest palette entry for an (N, 3) array of colors
+    # argmin keeps the first minimum, matching min() over the PALETTE dict order
+    distances = ((rgb[:, None, :] - PALETTE_RGB[None, :, :]) ** 2).sum(axis=2)
+    return PALETTE_CODES[distances.argmin(axis=1)]
+
+
+def _to_rgb_tuple(color_code):
     # If hex string was passed in, convert to RGB tuple
     if isinstance(color_code, str):
         color_code = tuple(int(color_code.lstrip('#')[i:i+2], 16) for i in (0, 2, 4))
+    return tuple(int(c) for c in color_code)
+
+
+def rgb_to_code(color_code):
+    """
+    Find the closest palette code for a single color.
+
+    Args:
+        color_code (tuple or str): An RGB tuple or a "#RRGGBB" hex string.
+
+    Returns:
+        int: The palette code (0-255).
+    """
+    return _nearest_code(_to_rgb_tuple(color_code))
+
+
+@functools.lru_cache(maxsize=_CODE_CACHE_SIZE)
+def _nearest_code(rgb):
+    # Palette code of one RGB tuple, cached so repeated colors skip the search
+    return int(_nearest_codes(np.array([rgb], dtype=np.int64))[0])
+
+
+# Function to find the closest 2-digit hex value for an RGB color
+def rgb_to_hex(color_code):
+    return f"{rgb_to_code(color_code):02X}"
+
+
+def rgb_array_to_codes(rgb):
+    """
+    Quantize a whole image to palette codes in one pass.
+
+    Each distinct color is matched against the palette only once, so a frame
+    with a handful of colors costs a handful of distance computations no
+    matter how large the grid is. Results match rgb_to_hex exactly.
+
+    Args:
+        rgb (array-like): An H x W x 3 array of RGB values.
+
+    Returns:
+        numpy.ndarray: An H x W uint8 array of palette codes.
+    """
+    rgb = np.asarray(rgb)
+    shape = rgb.shape[:-1]
+    flat = rgb.reshape(-1, 3).astype(np.int64)
+
+    # Pack each color into a single integer so the unique colors can be found quickly
+    packed = (flat[:, 0] << 32) | (flat[:, 1] << 16) | flat[:, 2]
+    unique, inverse = np.unique(packed, return_inverse=True)
+    colors = np.stack([unique >> 32, (unique >> 16) & 0xFFFF, unique & 0xFFFF], axis=1)
+
+    # Match the distinct colors against the palette in chunks to bound memory
+    unique_codes = np.empty(len(unique), dtype=np.uint8)
+    for start in range(0, len(unique), _CHUNK_SIZE):
+        unique_codes[start:start + _CHUNK_SIZE] = _nearest_codes(colors[start:start + _CHUNK_SIZE])
+
+    return unique_codes[inverse.reshape(-1)].reshape(shape)
+
+
+# Bits kept per channel by the lookup table in rgb_array_to_codes_fast
+_LUT_BITS = 6
+_lut = None
+
+
+def _quantize_lut():
+    # Nearest palette code for the center of every (2**_LUT_BITS)**3 color bucket, built on first use
+    global _lut
+    if _lut is None:
+        levels = 1 << _LUT_BITS
+        step = 256 // levels
+        centers = np.arange(levels, dtype=np.int64) * step + step // 2
+        r, g, b = np.meshgrid(centers, centers, centers, indexing='ij')
+        colors = np.stack([r.ravel(), g.ravel(), b.ravel()], axis=1)
+        _lut = np.concatenate([
+            _nearest_codes(colors[start:start + _CHUNK_SIZE]) for start in range(0, len(colors), _CHUNK_SIZE)
+        ])
+    return _lut
+
+
+def rgb_array_to_codes_fast(rgb):
+    """
+    Quantize a whole image to palette codes through a lookup table.
+
+    Much faster than rgb_array_to_codes for images with many distinct
+    colors, such as generated effects, but NOT exact: colors are first
+    rounded to 6 bits per channel, so a color near halfway between two
+    palette entries can get a different code than rgb_to_code gives it.
+    Only use it where a close match is good enough, like generated effect
+    frames; anything that has to agree with rgb_to_code, such as painted
+    or imported colors, must use rgb_array_to_codes.
+
+    Args:
+        rgb (array-like): An H x W x 3 array of RGB values (0-255).
+
+    Returns:
+        numpy.ndarray: An H x W uint8 array of palette codes.
+    """
+    rgb = np.asarray(rgb, dtype=np.uint8) >> (8 - _LUT_BITS)
+    index = (rgb[..., 0].astype(np.intp) << (2 * _LUT_BITS)) | (rgb[..., 1].astype(np.intp) << _LUT_BITS) | rgb[..., 2]
+    return _quantize_lut()[index]
+
+
+def color_grid_to_codes(color_grid, name_to_rgb=None):
+    """
+    Convert a grid of colors ("#RRGGBB" strings or RGB tuples) into a uint8
+    array of palette codes.
+
+    Args:
+        name_to_rgb (callable): Resolves color names such as "white" to an RGB
+            tuple, e.g. a Tk widget's winfo_rgb.
+    """
+    return np.array([
+        [rgb_to_code(name_to_rgb(color) if isinstance(color, str) and not color.startswith('#') else color) for color in row]
+        for row in color_grid
+    ], dtype=np.uint8)
+
+
+def codes_to_hex_grid(codes):
+    """
+    Convert an array of palette codes into the list-of-lists of 2-digit hex
+    strings used by the controller and the save path.
+    """
+    return HEX_STRINGS[np.asarray(codes, dtype=np.uint8)].tolist()
+
+
+def hex_grid_to_codes(grid):
+    """
+    Convert a list-of-lists of 2-digit hex strings into a uint8 code array.
+    """
+    return np.array([[_HEX_TO_CODE[cell] for cell in row] for row in grid], dtype=np.uint8)
+
+
+# Color the design tool shows for an "off" bulb
+OFF_PREVIEW_COLOR = "#1a1a1a"
+
+# Code -> "#RRGGBB" color used to preview the bulb in the design tool
+# Codes outside the palette have no bulb color, so they preview as "off"
+PREVIEW_COLORS = np.full(256, OFF_PREVIEW_COLOR, dtype=object)
+for _code, _rgb in PALETTE.items():
+    PREVIEW_COLORS[_code] = "#%02x%02x%02x" % _rgb
+PREVIEW_COLORS[0xFE] = OFF_PREVIEW_COLOR
+
+# Code -> RGB of its preview color
+PREVIEW_RGB = np.array([
+    [int(color[i:i + 2], 16) for i in (1, 3, 5)] for color in PREVIEW_COLORS
+], dtype=np.uint8)
+
+
+def codes_to_color_grid(codes):
+    """
+    Convert an array of palette codes into a grid of preview color strings,
+    the format the design tool stores in keyframe_data.
+    """
+    return PREVIEW_COLORS[np.asarray(codes, dtype=np.uint8)].tolist()
+
+
+# Code -> RGB color of the bulb, for blending frames; codes outside the palette are off
+CODE_RGB = np.zeros((256, 3), dtype=np.uint8)
+CODE_RGB[PALETTE_CODES] = PALETTE_RGB
+
 
-    # Handle special cases
-    if color_code == (0, 0, 0):  # "off"
-        return "FE"
-    if color_code == (255, 255, 255):  # "white"
-        return "FF"
-
-    # Predefined data points for color matching
-    data_points = {
-        0x00: (255, 0, 0), 0x07: (252, 136, 59), 0x10: (251, 250, 110),
-        0x17: (218, 240, 91), 0x20: (178, 240, 83), 0x27: (139, 243, 69),
-        0x30: (18, 245, 79), 0x37: (0, 247, 78), 0x40: (0, 255, 182),
-        0x47: (0, 255, 255), 0x50: (0, 196, 250), 0x57: (0, 174, 254),
-        0x60: (0, 137, 251), 0x67: (0, 117, 253), 0x70: (0, 64, 253),
-        0x77: (0, 1, 255), 0x80: (91, 0, 255), 0x87: (103, 0, 255),
-        0x90: (146, 0, 255), 0x97: (164, 0, 254), 0xA0: (190, 0, 254),
-        0xA7: (255, 0, 253), 0xB0: (255, 0, 191), 0xB7: (255, 80, 14),
-        0xC0: (250, 198, 85), 0xC7: (245, 237, 91), 0xD0: (203, 236, 83),
-        0xD7: (168, 239, 93), 0xE0: (106, 242, 95), 0xE7: (14, 245, 93),
-        0xF0: (0, 249, 85), 0xF7: (0, 242, 211), 0xFC: (0, 234, 243),
-        0xFD: (252, 181, 141), 0xFE: (0, 0, 0), 0xFF: (255, 255, 255),
-    }
-
-    # Find the closest match using squared distance
-    closest_key = min(
-        data_points, 
-        key=lambda k: sum((a - b) ** 2 for a, b in zip(data_points[k], color_code))
-    )
-    return f"{closest_key:02X}"
+def codes_to_rgb(codes):
+    """
+    Convert an array of palette codes into an array of bulb RGB colors.
+    """
+    return CODE_RGB[np.asarray(codes, dtype=np.uint8)]
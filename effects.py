@@ -0,0 +1,304 @@
+"""
+Procedural effects that fill a range of timeline frames.
+
+Each effect is a function of the frame's time that computes RGB colors for
+the whole grid at once with NumPy; the result is quantized to the bulb
+palette in bulk. Effects keep no state between frames, so any frame can be
+computed on its own: an EffectClip only computes the frames that are
+actually shown, played or exported, in any order.
+"""
+from collections.abc import Mapping
+
+import numpy as np
+
+from designtool.colorconversion import rgb_array_to_codes_fast
+from designtool.keyframes import KeyframeIndex
+from designtool.tween import TweenCache, hsv_to_rgb
+
+# Each effect takes (t, progress, y, x, **params): t is seconds since the
+# clip started, progress runs 0-1 across the clip, and y/x are float grids
+# of every cell's row/column. It returns an H x W x 3 float RGB array.
+
+
+def _color_ramp(position, colors):
+    # Map positions in 0-1 onto evenly spaced color stops
+    colors = np.asarray(colors, dtype=np.float32)
+    stops = np.linspace(0, 1, len(colors))
+    return np.stack([np.interp(position, stops, colors[:, channel]) for channel in range(3)], axis=-1)
+
+
+def gradient(t, progress, y, x, colors=((255, 0, 0), (0, 0, 255), (255, 0, 0)), angle=0.0, speed=0.25):
+    # Repeating linear gradient at angle (degrees), scrolling by speed repeats per second
+    rows, cols = y.shape
+    direction = np.radians(angle)
+    position = (x * np.cos(direction) + y * np.sin(direction)) / max(rows, cols) + t * speed
+    return _color_ramp(position % 1, colors)
+
+
+def plasma(t, progress, y, x, scale=0.25, speed=1.0):
+    # Classic sum-of-sines plasma, mapped around the hue circle
+    t = t * speed
+    value = (
+        np.sin(x * scale + t)
+        + np.sin((y * scale + t) / 2)
+        + np.sin((x + y) * scale / 2 + t)
+        + np.sin(np.sqrt(x * x + y * y) * scale + t)
+    )
+    hsv = np.stack([value / 8 + 0.5, np.ones_like(value), np.ones_like(value)], axis=-1)
+    return hsv_to_rgb(hsv)
+
+
+def _value_noise(y, x, seed):
+    # Smooth 2D noise in 0-1: random values on an integer lattice, blended bilinearly
+    y0, x0 = np.floor(y).astype(np.int64), np.floor(x).astype(np.int64)
+    fy, fx = y - y0, x - x0
+    fy, fx = fy * fy * (3 - 2 * fy), fx * fx * (3 - 2 * fx)
+
+    def lattice(yi, xi):
+        # Hash lattice points to 0-1 without storing a table
+        h = (yi * 374761393 + xi * 668265263 + seed * 144665) & 0xFFFFFFFF
+        h = ((h ^ (h >> 13)) * 1274126177) & 0xFFFFFFFF
+        return (h & 0xFFFF) / 0xFFFF
+
+    top = lattice(y0, x0) * (1 - fx) + lattice(y0, x0 + 1) * fx
+    bottom = lattice(y0 + 1, x0) * (1 - fx) + lattice(y0 + 1, x0 + 1) * fx
+    return top * (1 - fy) + bottom * fy
+
+
+FIRE_COLORS = ((0, 0, 0), (160, 0, 0), (255, 80, 0), (255, 200, 0), (255, 255, 200))
+
+
+def fire(t, progress, y, x, speed=8.0, scale=0.3, seed=0):
+    # Noise rising at speed rows per second, hottest at the bottom row
+    rows = y.shape[0]
+    flames = 0.65 * _value_noise((y + t * speed) * scale, x * scale, seed) + 0.35 * _value_noise((y + t * speed * 1.7) * scale * 2, x * scale * 2, seed + 1)
+    heat = flames * (y + 1) / rows * 1.4
+    return _color_ramp(np.clip(heat, 0, 1), FIRE_COLORS)
+
+
+def sparkle(t, progress, y, x, color=(255, 255, 255), background=(0, 0, 40), density=0.1, rate=1.0, seed=0):
+    # Each cell twinkles at its own random period and phase; density is the share of cells that twinkle
+    rng = np.random.default_rng(seed)
+    period = rng.uniform(0.5, 2.0, y.shape) / rate
+    phase = rng.random(y.shape)
+    active = rng.random(y.shape) < density
+    brightness = np.maximum(0, np.sin(2 * np.pi * (t / period + phase))) ** 8 * active
+    background, color = np.asarray(background, dtype=np.float32), np.asarray(color, dtype=np.float32)
+    return background + (color - background) * brightness[..., None]
+
+
+def wipe(t, progress, y, x, start_color=(0, 0, 0), end_color=(255, 255, 255), direction="right"):
+    # end_color sweeps across the grid over the length of the clip
+    rows, cols = y.shape
+    position = {
+        "right": x / max(cols - 1, 1),
+        "left": 1 - x / max(cols - 1, 1),
+        "down": y / max(rows - 1, 1),
+        "up": 1 - y / max(rows - 1, 1),
+    }[direction]
+    covered = position <= progress
+    return np.where(covered[..., None], np.asarray(end_color, dtype=np.float32), np.asarray(start_color, dtype=np.float32))
+
+
+_text_bitmaps = {}
+
+
+def _text_bitmap(text):
+    # The text rendered once with PIL's built-in font, as a boolean array
+    bitmap = _text_bitmaps.get(text)
+    if bitmap is None:
+        from PIL import Image, ImageDraw, ImageFont
+
+        font = ImageFont.load_default()
+        left, top, right, bottom = font.getbbox(text)
+        image = Image.new("1", (right - left, bottom - top))
+        ImageDraw.Draw(image).text((-left, -top), text, fill=1, font=font)
+        bitmap = _text_bitmaps[text] = np.array(image, dtype=bool)
+    return bitmap
+
+
+def scrolling_text(t, progress, y, x, text="HELLO", color=(255, 255, 255), background=(0, 0, 0), speed=10.0):
+    # Text entering from the right edge and scrolling left at speed columns per second
+    rows, cols = y.shape
+    bitmap = _text_bitmap(text)
+    height, width = bitmap.shape
+
+    # Pad the text with a grid's width of blank columns so it scrolls fully off before repeating
+    offset = int(t * speed) % (width + cols)
+    columns = (np.arange(cols) + offset - cols) % (width + cols)
+    top = (rows - height) // 2
+    bitmap_rows = np.arange(rows) - top
+
+    lit = np.zeros((rows, cols), dtype=bool)
+    valid_rows = (bitmap_rows >= 0) & (bitmap_rows < height)
+    valid_cols = columns < width
+    lit[np.ix_(valid_rows, valid_cols)] = bitmap[np.ix_(bitmap_rows[valid_rows], columns[valid_cols])]
+    return np.where(lit[..., None], np.asarray(color, dtype=np.float32), np.asarray(background, dtype=np.float32))
+
+
+EFFECTS = {
+    "gradient": gradient,
+    "plasma": plasma,
+    "fire": fire,
+    "sparkle": sparkle,
+    "wipe": wipe,
+    "text": scrolling_text,
+}
+
+
+class EffectClip:
+    """
+    An effect filling frames [start, start + length) of the timeline.
+
+    Frames are computed when asked for and kept in a TweenCache, so a
+    minute-long clip costs memory only for the frames recently used.
+
+    Args:
+        effect (str): A name in EFFECTS.
+        start (int): First timeline frame.
+        length (int): Number of frames.
+        rows (int): Grid rows.
+        cols (int): Grid columns.
+        fps (float): Timeline rate, used to turn frames into seconds.
+        cache (TweenCache): Where computed frames are kept.
+        **params: Passed on to the effect function.
+    """
+
+    def __init__(self, effect, start, length, rows, cols, fps=30, cache=None, **params):
+        if effect not in EFFECTS:
+            raise ValueError(f"Unknown effect: {effect}")
+        self.effect = effect
+        self.start = start
+        self.length = length
+        self.fps = fps
+        self.params = params
+        self.cache = cache or TweenCache(max_bytes=8 * 1024 * 1024)
+        self.y, self.x = np.mgrid[0:rows, 0:cols].astype(np.float32)
+
+    @property
+    def stop(self):
+        return self.start + self.length
+
+    def __contains__(self, frame_num):
+        return self.start <= frame_num < self.stop
+
+    def rgb(self, frame_num):
+        # H x W x 3 float colors of a frame, before quantizing
+        i = frame_num - self.start
+        progress = i / (self.length - 1) if self.length > 1 else 1.0
+        return EFFECTS[self.effect](i / self.fps, progress, self.y, self.x, **self.params)
+
+    def frame(self, frame_num):
+        """
+        The rows x cols palette codes of a frame inside the clip.
+        """
+        frame = self.cache.get(frame_num)
+        if frame is None:
+            frame = rgb_array_to_codes_fast(np.clip(np.rint(self.rgb(frame_num)), 0, 255).astype(np.uint8))
+            self.cache.put(frame_num, frame)
+        return frame
+
+    def frames(self):
+        # Every frame of the clip in order, computed one at a time
+        for frame_num in range(self.start, self.stop):
+            yield frame_num, self.frame(frame_num)
+
+
+class EffectTrack:
+    """
+    The effect clips on a timeline. Clips never overlap: adding a clip
+    removes any it overlaps.
+    """
+
+    def __init__(self):
+        self.starts = KeyframeIndex()
+        self.clips = {}  # Start frame -> EffectClip
+
+    def __len__(self):
+        return len(self.clips)
+
+    def __iter__(self):
+        return (self.clips[start] for start in self.starts)
+
+    def add(self, clip):
+        for other in list(self):
+            if other.start < clip.stop and clip.start < other.stop:
+                self.remove(other)
+        self.starts.add(clip.start)
+        self.clips[clip.start] = clip
+
+    def remove(self, clip):
+        self.starts.remove(clip.start)
+        del self.clips[clip.start]
+
+    def clip_at(self, frame_num):
+        # The clip covering frame_num, or None
+        start = self.starts.previous(frame_num)
+        if start is None:
+            return None
+        clip = self.clips[start]
+        return clip if frame_num in clip else None
+
+    @property
+    def stop(self):
+        # Just past the last frame any clip covers
+        return max((clip.stop for clip in self.clips.values()), default=0)
+
+    def clear(self):
+        self.starts.clear()
+        self.clips.clear()
+
+    def specs(self):
+        # Each clip as [effect, start, length, fps, params], as files and the journal store them
+        return [[clip.effect, clip.start, clip.length, clip.fps, clip.params] for clip in self]
+
+    def add_specs(self, specs, rows, cols):
+        # Rebuild clips stored by specs()
+        for effect, start, length, fps, params in specs:
+            self.add(EffectClip(effect, start, length, rows, cols, fps=fps, **params))
+
+    def baked_frames(self, total_frames):
+        """
+        The frames to store so that a player reading only frames shows the
+        clips: every frame a clip covers, plus the frame just after each clip
+        that no clip covers. Players hold the last frame until the next one,
+        so without that frame the clip's last frame would stay up until the
+        next keyframe.
+
+        Returns:
+            tuple: (covered, after) sets of frame numbers.
+        """
+        covered, after = set(), set()
+        for clip in self:
+            covered.update(range(clip.start, clip.stop))
+            after.add(clip.stop)
+        return covered, {frame_num for frame_num in after - covered if frame_num < total_frames}
+
+
+class LazyFrames(Mapping):
+    """
+    Read-only mapping of frame number -> frame, computed on access.
+
+    Lets generated frames be passed wherever a dict of frames is expected,
+    e.g. filesave.save_animation, without materializing them all.
+
+    Args:
+        frame_numbers (iterable): The frames the mapping has.
+        render (callable): Takes a frame number and returns its frame.
+    """
+
+    def __init__(self, frame_numbers, render):
+        self.frame_numbers = sorted(frame_numbers)
+        self._members = set(self.frame_numbers)
+        self.render = render
+
+    def __getitem__(self, frame_num):
+        if frame_num not in self._members:
+            raise KeyError(frame_num)
+        return self.render(frame_num)
+
+    def __iter__(self):
+        return iter(self.frame_numbers)
+
+    def __len__(self):
+        return len(self.frame_numbers)
@@ -0,0 +1,336 @@
+"""
+Headless export of animations to shareable previews.
+
+Every timeline frame is drawn the way the design tool shows it, one circle
+from circle.png per bulb tinted with the bulb's preview color, and written
+out as an animated GIF, a numbered PNG sequence, a video (through ffmpeg,
+when it is installed) or raw RGB24 video.
+
+Frames are rendered and encoded on a pool of worker processes, each with its
+own tinted sprites. Frames that hold a keyframe are only rendered once, so
+the work grows with the number of stored frames, not the show's length.
+
+Frames between keyframes are held or blended with the interpolation mode
+saved in the animation file, unless --tween names another one. Effect clips
+are exported as the frames the design tool bakes into the file.
+
+    python -m designtool.exporter show.lcfa preview.gif
+    python -m designtool.exporter show.lcfa frames/ --cell-size 16 --workers 8
+    python -m designtool.exporter show.lcfa preview.mp4 --fps 30 --tween linear
+"""
+import argparse
+import io
+import os
+import shutil
+import subprocess
+import time
+from collections import deque
+from multiprocessing import Pool
+
+import numpy as np
+from PIL import Image
+
+from designtool.colorconversion import PREVIEW_RGB
+from designtool.filesave import is_animation_file, load_animation, load_lcf
+from designtool.tween import INTERPOLATION_MODES, TweenCache, Tweener
+
+CIRCLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "circle.png")
+DEFAULT_CELL_SIZE = 25  # The design tool shows circle.png at half size
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv", ".webm")
+RAW_EXTENSIONS = (".rgb", ".raw")
+OUTPUT_FORMATS = ("gif", "video", "raw", "png")
+
+OFF_CODE = 0xFE
+
+
+def bulb_tiles(cell_size=DEFAULT_CELL_SIZE, circle_path=CIRCLE_PATH):
+    """
+    The circle sprite tinted for every palette code.
+
+    Returns:
+        numpy.ndarray: (256, cell_size, cell_size, 3) uint8 tiles, indexed by code.
+    """
+    circle = Image.open(circle_path).convert("RGBA").resize((cell_size, cell_size), Image.Resampling.LANCZOS)
+    alpha = np.asarray(circle.split()[3], dtype=np.float32) / 255
+    # Tinted like the design tool's sprites: color * alpha, over black
+    return np.rint(alpha[None, :, :, None] * PREVIEW_RGB[:, None, None, :].astype(np.float32)).astype(np.uint8)
+
+
+def render_frame(frame, tiles):
+    """
+    Draw a grid[x][y] frame of palette codes with one tile per bulb, as
+    bulb_tiles() makes them.
+
+    Returns:
+        numpy.ndarray: (rows * cell_size, cols * cell_size, 3) uint8 image.
+    """
+    rows, cols = frame.shape[1], frame.shape[0]
+    size = tiles.shape[1]
+    # Gather every bulb's tile at once, then lay the tiles out row by row
+    return tiles[frame.T].transpose(0, 2, 1, 3, 4).reshape(rows * size, cols * size, 3)
+
+
+# Tinted tiles of the current worker process, built once by _init_worker
+_worker_tiles = None
+_worker_format = None
+
+
+def _init_worker(cell_size, circle_path, output_format):
+    global _worker_tiles, _worker_format
+    _worker_tiles = bulb_tiles(cell_size, circle_path)
+    _worker_format = output_format
+
+
+def _render(frame):
+    # Render and encode one frame in a worker: PNG bytes, a palette image for GIFs, or the RGB image
+    image = render_frame(frame, _worker_tiles)
+    if _worker_format == "png":
+        buffer = io.BytesIO()
+        Image.fromarray(image).save(buffer, format="PNG", compress_level=1)
+        return buffer.getvalue()
+    if _worker_format == "gif":
+        return Image.fromarray(image).quantize(256, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+    return image
+
+
+def timeline_runs(source, tween=None):
+    """
+    The frames of an animation or .lcf file as runs of identical frames.
+
+    Args:
+        tween (str): One of INTERPOLATION_MODES; frames between two
+            keyframes of an animation are blended with it, one run each.
+            None uses the mode saved in the file, or holds keyframes if
+            it has none.
+
+    Returns:
+        tuple: (total_frames, runs), where runs yields (start, stop, frame)
+        for each stored or blended frame: frame is shown on timeline frames
+        [start, stop), in grid[x][y] order. Frames before the first keyframe
+        are all off.
+    """
+    if is_animation_file(source):
+        animation = load_animation(source)
+        settings = animation.settings
+        if tween is None:
+            tween = settings.get("interpolation", "hold")
+        starts = animation.keyframe_numbers.tolist()
+        total_frames = max(animation.total_frames, starts[-1] + 1 if starts else 0)
+
+        # Effect frames and the frames ending the clips are baked in; only the
+        # real keyframes are blended between
+        in_clips = set()
+        for effect, start, length, fps, params in settings.get("effects", []):
+            in_clips.update(range(start, start + length))
+        baked = in_clips | set(settings.get("clip_end_frames", []))
+        keys = [position for position, start in enumerate(starts) if start not in baked]
+
+        def runs():
+            if starts and starts[0] > 0:
+                yield 0, starts[0], np.full(animation.shape, OFF_CODE, dtype=np.uint8)
+            # Only the two keyframes around the frames being blended are kept;
+            # every blended frame is exported once, so none are cached
+            tweener = Tweener(tween, TweenCache(max_bytes=0))
+            next_key = 0  # Index in keys of the next real keyframe
+            following = None  # (position, frame) of the next real keyframe, once read
+            for position, start in enumerate(starts):
+                stop = starts[position + 1] if position + 1 < len(starts) else total_frames
+                if following is not None and following[0] == position:
+                    frame = following[1]
+                else:
+                    frame = animation.read(position)
+                if next_key < len(keys) and keys[next_key] == position:
+                    tweener.clear()
+                    tweener.set_keyframe(start, frame)
+                    next_key += 1
+
+                # Blend up to the next real keyframe, unless this is an effect frame or
+                # there is no keyframe on one side
+                if tween == "hold" or stop - start == 1 or start in in_clips or not tweener.keys or next_key == len(keys):
+                    yield start, stop, frame
+                    continue
+                if following is None or following[0] != keys[next_key]:
+                    following = keys[next_key], animation.read(keys[next_key])
+                    tweener.set_keyframe(starts[following[0]], following[1])
+                yield start, start + 1, frame
+                for frame_num in range(start + 1, stop):
+                    yield frame_num, frame_num + 1, tweener.frame(frame_num)
+
+        return total_frames, runs()
+
+    lcf = load_lcf(source)
+    return len(lcf), ((i, i + 1, lcf.frame(i)) for i in range(len(lcf)))
+
+
+def output_format(output, format=None):
+    """
+    The format to write output in: gif, video, raw, or png for a directory
+    of PNG files.
+
+    Args:
+        format (str): One of OUTPUT_FORMATS, overriding the path.
+
+    Raises:
+        ValueError: If the format can't be told from the path: it has an
+            unknown extension and is not an existing directory.
+    """
+    if format is not None:
+        if format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format {format!r}")
+        return format
+    extension = os.path.splitext(output)[1].lower()
+    if extension == ".gif":
+        return "gif"
+    if extension in VIDEO_EXTENSIONS:
+        return "video"
+    if extension in RAW_EXTENSIONS:
+        return "raw"
+    if os.path.isdir(output) or not extension:
+        return "png"
+    raise ValueError(f"Can't tell the output format of {output}; pass a format (--format on the command line)")
+
+
+def export(source, output, fps=30, cell_size=DEFAULT_CELL_SIZE, workers=None, circle_path=CIRCLE_PATH, chunksize=4,
+           tween=None, format=None):
+    """
+    Render every timeline frame of source and write them to output.
+
+    Args:
+        source (str): An animation file or .lcf file.
+        output (str): A .gif file, a video file (needs ffmpeg), a .rgb raw
+            RGB24 video file, or a directory for a PNG sequence.
+        fps (float): Frames per second of the output.
+        cell_size (int): Pixels per bulb.
+        workers (int): Worker processes; None uses every core, 1 renders
+            in this process.
+        chunksize (int): Frames handed to a worker at a time.
+        tween (str): How frames between keyframes are blended, one of
+            INTERPOLATION_MODES; "hold" repeats each keyframe. None uses
+            the mode saved in the animation file.
+        format (str): One of OUTPUT_FORMATS, when the output path does not
+            tell it.
+
+    Returns:
+        dict: Output format, timeline frame count, frames rendered and image size.
+    """
+    kind = output_format(output, format)
+    if tween is not None and tween not in INTERPOLATION_MODES:
+        raise ValueError(f"Unknown interpolation mode: {tween}")
+    if kind == "video" and shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg was not found; export raw video (.rgb) or a PNG sequence instead")
+    encoding = {"png": "png", "gif": "gif"}.get(kind, "rgb")
+
+    total_frames, runs = timeline_runs(source, tween)
+    spans = deque()
+
+    def frames():
+        # Decode stored frames in order, keeping track of how long each is shown;
+        # results come back in the same order, so they pick their spans up from the front
+        for start, stop, frame in runs:
+            spans.append((start, stop))
+            yield np.ascontiguousarray(frame)
+
+    def with_spans(rendered):
+        return ((result, spans.popleft()) for result in rendered)
+
+    if workers == 1:
+        _init_worker(cell_size, circle_path, encoding)
+        size, count = _write(kind, output, with_spans(map(_render, frames())), fps)
+    else:
+        # Leaving the block terminates the workers, also when writing fails part way
+        with Pool(workers, initializer=_init_worker, initargs=(cell_size, circle_path, encoding)) as pool:
+            size, count = _write(kind, output, with_spans(pool.imap(_render, frames(), chunksize)), fps)
+
+    return {"format": kind, "frames": total_frames, "rendered": count, "size": size}
+
+
+def _write(kind, output, results, fps):
+    # Write rendered frames, each repeated over its span of the timeline
+    if kind == "png":
+        return _write_png_sequence(output, results)
+    if kind == "gif":
+        return _write_gif(output, results, fps)
+    return _write_video(output, results, fps, raw=kind == "raw")
+
+
+def _write_png_sequence(directory, results):
+    os.makedirs(directory, exist_ok=True)
+    size, count = None, 0
+    for data, (start, stop) in results:
+        if size is None:
+            size = Image.open(io.BytesIO(data)).size
+        for frame_num in range(start, stop):
+            with open(os.path.join(directory, f"frame{frame_num:06d}.png"), "wb") as file:
+                file.write(data)
+        count += 1
+    return size, count
+
+
+def _write_gif(path, results, fps):
+    # A held frame becomes one GIF frame shown for the whole hold
+    images, durations = [], []
+    for image, (start, stop) in results:
+        images.append(image)
+        durations.append(round((stop - start) * 1000 / fps))
+    if images:
+        images[0].save(path, save_all=True, append_images=images[1:], duration=durations, loop=0, optimize=False)
+    return (images[0].size if images else None), len(images)
+
+
+def _write_video(path, results, fps, raw):
+    size, count, process, file = None, 0, None, None
+    try:
+        for image, (start, stop) in results:
+            if file is None:
+                size = (image.shape[1], image.shape[0])
+                if raw:
+                    file = open(path, "wb")
+                else:
+                    process = subprocess.Popen(
+                        ["ffmpeg", "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24",
+                         "-s", f"{size[0]}x{size[1]}", "-r", str(fps), "-i", "-", "-pix_fmt", "yuv420p", path],
+                        stdin=subprocess.PIPE,
+                    )
+                    file = process.stdin
+            for _ in range(start, stop):
+                file.write(image)
+            count += 1
+    finally:
+        if file is not None:
+            file.close()
+        if process is not None and process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed with exit code {process.returncode}")
+    return size, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export an animation to a GIF, PNG sequence or video preview")
+    parser.add_argument("source", help="Animation or .lcf file")
+    parser.add_argument("output", help="A .gif, .mp4/.mov/.mkv/.webm (needs ffmpeg) or .rgb file, or a directory for PNGs")
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--cell-size", type=int, default=DEFAULT_CELL_SIZE, help="Pixels per bulb")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--tween", choices=INTERPOLATION_MODES, default=None,
+                        help="Blend the frames between keyframes with this mode instead of the file's")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default=None,
+                        help="Output format, when the output path does not tell it")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        result = export(args.source, args.output, fps=args.fps, cell_size=args.cell_size, workers=args.workers,
+                        tween=args.tween, format=args.format)
+    except ValueError as error:
+        parser.error(str(error))
+    elapsed = time.perf_counter() - started
+    show_seconds = result["frames"] / args.fps
+    print(f"Wrote {result['frames']} frames ({result['rendered']} rendered) to {args.output} in {elapsed:.1f} s, "
+          f"{show_seconds / elapsed if elapsed else 0:.1f}x real time")
+    if result["format"] == "raw" and result["size"]:
+        width, height = result["size"]
+        print(f"Play it with: ffplay -f rawvideo -pixel_format rgb24 -video_size {width}x{height} -framerate {args.fps:g} {args.output}")
+
+
+if __name__ == "__main__":
+    main()
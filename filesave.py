@@ -1,15 +1,39 @@
+import json
+import struct
+
+import numpy as np
+
+from designtool.colorconversion import codes_to_hex_grid, hex_grid_to_codes
+
+# Binary .lcf (version 2) layout, little endian:
+#   magic "LCF2", version, x/y dimensions, x/y crop origin, frame count
+# followed by frame count * x * y bytes, one palette code per bulb.
+# Frames are stored in grid order, grid[x][y], the same as the text format.
+LCF_MAGIC = b"LCF2"
+LCF_VERSION = 2
+LCF_HEADER = struct.Struct("<4sHHHHHI")
+
+# Text files keep the .lcf extension existing tools expect; binary files get their own.
+# The loaders tell the formats apart by content, so either loads whatever it is called.
+LCF_EXTENSION = ".lcf"
+BINARY_LCF_EXTENSION = ".lcfb"
+ANIMATION_EXTENSION = ".lcfa"
+
+OFF_CODE = 0xFE
+
+
 def save_grid_to_file(grid, file_path):
     # First get rid of "empty" rows and columns
     # --------------------------------------------------------------------
     # Remove empty rows (rows that only contain 'FE')
     altered_grid = [row for row in grid if any(cell != 'FE' for cell in row)]
-    
+
     # Remove empty columns (columns that only contain 'FE' in each row)
     # Transpose the grid, filter columns, then transpose back
     altered_grid = list(zip(*altered_grid))  # Transpose the grid
     altered_grid = [col for col in altered_grid if any(cell != 'FE' for cell in col)]
     altered_grid = list(zip(*altered_grid))  # Transpose back to the original orientation
-    
+
     # Convert tuples back to lists
     altered_grid = [list(row) for row in altered_grid]
     # --------------------------------------------------------------------
@@ -21,4 +45,345 @@ def save_grid_to_file(grid, file_path):
         file.write(str(len(altered_grid[0])) + '\n') # y
 
         for row in altered_grid:
-            file.write(' '.join(row) + '\n')
\ No newline at end of file
+            file.write(' '.join(row) + '\n')
+
+
+def _frames_to_codes(frames):
+    # Accept a code array, or a list of hex-string grids / code arrays
+    if isinstance(frames, np.ndarray) and frames.dtype == np.uint8:
+        return frames.reshape((-1,) + frames.shape[-2:])
+    return np.stack([
+        np.asarray(frame, dtype=np.uint8) if isinstance(frame, np.ndarray) else hex_grid_to_codes(frame)
+        for frame in frames
+    ])
+
+
+def crop_bounds(frames):
+    """
+    Find the bounding box of every lit (non-'FE') bulb across all frames.
+
+    Returns:
+        tuple: (x0, x1, y0, y1) slice bounds, or None if every bulb is off.
+    """
+    lit = (frames != OFF_CODE).any(axis=0)
+    xs = np.flatnonzero(lit.any(axis=1))
+    ys = np.flatnonzero(lit.any(axis=0))
+    if len(xs) == 0:
+        return None
+    return xs[0], xs[-1] + 1, ys[0], ys[-1] + 1
+
+
+def save_frames_to_binary(frames, file_path):
+    """
+    Save one or more grids to a binary (version 2) .lcf file.
+
+    Empty rows and columns around the design are cropped, using one bounding
+    box for all frames, and the crop origin is kept in the header so the
+    design can be placed back where it was.
+
+    Args:
+        frames (list or numpy.ndarray): Grids in grid[x][y] order, either
+            2-digit hex strings or uint8 palette codes.
+        file_path (str): Where to write the file.
+    """
+    frames = _frames_to_codes(frames)
+    bounds = crop_bounds(frames)
+    if bounds is None:
+        x0 = y0 = 0
+        cropped = frames[:, :0, :0]
+    else:
+        x0, x1, y0, y1 = bounds
+        cropped = frames[:, x0:x1, y0:y1]
+
+    with open(file_path, 'wb') as file:
+        file.write(LCF_HEADER.pack(
+            LCF_MAGIC, LCF_VERSION,
+            cropped.shape[1], cropped.shape[2],  # x, y
+            x0, y0,  # Crop origin
+            cropped.shape[0],  # Frame count
+        ))
+        file.write(np.ascontiguousarray(cropped).tobytes())
+
+
+class LcfFile:
+    """
+    A loaded .lcf file.
+
+    Attributes:
+        version (int): 1 for the text format, 2 for binary.
+        origin (tuple): (x, y) crop origin of the stored grids.
+        frames (numpy.ndarray): frame count x X x Y uint8 palette codes. For
+            binary files this is a read-only view of the memory-mapped file.
+    """
+
+    def __init__(self, version, origin, frames):
+        self.version = version
+        self.origin = origin
+        self.frames = frames
+
+    def __len__(self):
+        return len(self.frames)
+
+    def frame(self, index):
+        # Zero-copy view of a single frame
+        return self.frames[index]
+
+    def hex_grid(self, index=0):
+        # A frame as a list-of-lists of 2-digit hex strings
+        return codes_to_hex_grid(self.frames[index])
+
+
+def load_lcf(file_path):
+    """
+    Load a .lcf file, either binary (version 2) or the original text format.
+
+    Binary files are memory-mapped, so opening them is instant and frames
+    are only read from disk when they are accessed.
+
+    Returns:
+        LcfFile: The loaded file.
+    """
+    with open(file_path, 'rb') as file:
+        header = file.read(LCF_HEADER.size)
+
+    if header[:len(LCF_MAGIC)] != LCF_MAGIC:
+        return _load_text_lcf(file_path)
+
+    magic, version, x, y, x0, y0, frame_count = LCF_HEADER.unpack(header)
+    if version != LCF_VERSION:
+        raise ValueError(f"Unsupported .lcf version: {version}")
+
+    if frame_count * x * y == 0:
+        frames = np.empty((frame_count, x, y), dtype=np.uint8)
+    else:
+        frames = np.memmap(file_path, dtype=np.uint8, mode='r', offset=LCF_HEADER.size, shape=(frame_count, x, y))
+    return LcfFile(version, (x0, y0), frames)
+
+
+def _load_text_lcf(file_path):
+    # Original format: x and y on their own lines, then one line of hex values per grid row
+    with open(file_path, 'r') as file:
+        x = int(file.readline())
+        y = int(file.readline())
+        grid = [file.readline().split() for _ in range(x)]
+
+    frames = hex_grid_to_codes(grid).reshape(1, x, y)
+    return LcfFile(1, (0, 0), frames)
+
+
+# Animation container layout, little endian:
+#   magic "LCFA", version, x/y dimensions, stored frame count, timeline length, key interval
+# followed by one index entry per stored frame, then the encoded frame payloads.
+# Every key_interval-th stored frame is a full frame; the rest are deltas (XOR)
+# against the previous stored frame. Payloads are run-length encoded, so long
+# runs of 'FE' and unchanged cells cost a few bytes each.
+# An optional JSON object of design settings (interpolation mode, effect
+# clips, ...) follows the last payload and runs to the end of the file.
+ANIMATION_MAGIC = b"LCFA"
+ANIMATION_VERSION = 1
+ANIMATION_HEADER = struct.Struct("<4sHHHIII")
+ANIMATION_INDEX_DTYPE = np.dtype([('frame', '<u4'), ('kind', 'u1'), ('offset', '<u8'), ('length', '<u4')])
+RLE_RUN_DTYPE = np.dtype([('count', '<u2'), ('value', 'u1')])
+
+FULL_FRAME = 0
+DELTA_FRAME = 1
+
+_MAX_RUN = np.iinfo(np.uint16).max
+
+
+def encode_rle(values):
+    """
+    Run-length encode a 1D uint8 array.
+
+    Returns:
+        bytes: Packed (count, value) runs.
+    """
+    values = np.asarray(values, dtype=np.uint8).reshape(-1)
+    if len(values) == 0:
+        return b""
+
+    starts = np.concatenate(([0], np.flatnonzero(values[1:] != values[:-1]) + 1))
+    lengths = np.diff(np.append(starts, len(values)))
+
+    # Split runs that are too long for a single count
+    parts = (lengths + _MAX_RUN - 1) // _MAX_RUN
+    run_index = np.repeat(np.arange(len(starts)), parts)
+    part_number = np.arange(len(run_index)) - np.repeat(np.cumsum(parts) - parts, parts)
+
+    runs = np.empty(len(run_index), dtype=RLE_RUN_DTYPE)
+    runs['count'] = np.minimum(_MAX_RUN, lengths[run_index] - part_number * _MAX_RUN)
+    runs['value'] = values[starts[run_index]]
+    return runs.tobytes()
+
+
+def decode_rle(data):
+    """
+    Decode bytes produced by encode_rle back into a 1D uint8 array.
+    """
+    runs = np.frombuffer(data, dtype=RLE_RUN_DTYPE)
+    return np.repeat(runs['value'], runs['count'])
+
+
+def save_animation(keyframes, file_path, total_frames=None, key_interval=16, settings=None):
+    """
+    Save a timeline's keyframes to a delta/RLE-compressed animation file.
+
+    Args:
+        keyframes (Mapping): Frame number -> grid in grid[x][y] order, either
+            2-digit hex strings or uint8 palette codes. All grids must be
+            the same size. Frames are read one at a time.
+        file_path (str): Where to write the file.
+        total_frames (int): Length of the timeline. Defaults to just past the
+            last keyframe.
+        key_interval (int): Store a full frame every key_interval frames, which
+            bounds how many deltas have to be decoded to seek to any frame.
+        settings (dict): JSON-serializable design settings stored with the
+            frames, read back as AnimationFile.settings.
+
+    Raises:
+        ValueError: If key_interval is not positive.
+    """
+    if key_interval < 1:
+        raise ValueError(f"key_interval must be at least 1, not {key_interval}")
+    frame_numbers = sorted(keyframes)
+    if total_frames is None:
+        total_frames = frame_numbers[-1] + 1 if frame_numbers else 0
+
+    # Frames are fetched and encoded one at a time, so keyframes may compute
+    # them on demand; the index is written last, once every offset is known
+    index = np.zeros(len(frame_numbers), dtype=ANIMATION_INDEX_DTYPE)
+    offset = ANIMATION_HEADER.size + index.nbytes
+    previous = None
+    shape = (0, 0)
+    with open(file_path, 'wb') as file:
+        file.seek(offset)
+        for i, frame_num in enumerate(frame_numbers):
+            frame = _frames_to_codes([keyframes[frame_num]])[0]
+            if previous is None:
+                shape = frame.shape
+            elif frame.shape != shape:
+                raise ValueError(f"Frame {frame_num} is {frame.shape}, expected {shape}")
+            if i % key_interval == 0:
+                kind, payload = FULL_FRAME, encode_rle(frame)
+            else:
+                kind, payload = DELTA_FRAME, encode_rle(frame ^ previous)
+            index[i] = (frame_num, kind, offset, len(payload))
+            file.write(payload)
+            offset += len(payload)
+            previous = frame
+        if settings:
+            file.write(json.dumps(settings).encode())
+
+        file.seek(0)
+        file.write(ANIMATION_HEADER.pack(
+            ANIMATION_MAGIC, ANIMATION_VERSION,
+            shape[0], shape[1],  # x, y
+            len(frame_numbers), total_frames, key_interval,
+        ))
+        file.write(index.tobytes())
+
+
+class AnimationFile:
+    """
+    A saved animation, opened lazily.
+
+    The file is memory-mapped and only the index is read up front; frames
+    are decoded on demand, starting from the nearest full frame.
+
+    Attributes:
+        shape (tuple): (x, y) size of each grid.
+        total_frames (int): Length of the timeline.
+        keyframe_numbers (numpy.ndarray): Timeline frame number of each stored frame.
+        settings (dict): The design settings saved with the frames; empty
+            for files saved without any.
+    """
+
+    def __init__(self, file_path):
+        self.data = np.memmap(file_path, dtype=np.uint8, mode='r')
+        magic, version, x, y, frame_count, total_frames, key_interval = ANIMATION_HEADER.unpack_from(self.data)
+        if magic != ANIMATION_MAGIC:
+            raise ValueError(f"Not an animation file: {file_path}")
+        if version != ANIMATION_VERSION:
+            raise ValueError(f"Unsupported animation version: {version}")
+        if key_interval < 1:
+            raise ValueError(f"Damaged animation file, key interval {key_interval}: {file_path}")
+
+        self.shape = (x, y)
+        self.total_frames = total_frames
+        self.key_interval = key_interval
+        self.index = np.frombuffer(self.data, dtype=ANIMATION_INDEX_DTYPE, count=frame_count, offset=ANIMATION_HEADER.size)
+        self.keyframe_numbers = self.index['frame']
+        # Deltas are decoded from the full frame before them, so there has to be one first
+        if frame_count and self.index[0]['kind'] != FULL_FRAME:
+            raise ValueError(f"Damaged animation file, no full frame first: {file_path}")
+
+        # Settings run from the end of the last payload to the end of the file
+        end = ANIMATION_HEADER.size + self.index.nbytes
+        if frame_count:
+            end = int(self.index[-1]['offset']) + int(self.index[-1]['length'])
+        try:
+            self.settings = json.loads(bytes(self.data[end:]).decode()) if len(self.data) > end else {}
+        except ValueError:
+            raise ValueError(f"Damaged animation file, unreadable settings: {file_path}") from None
+
+        # Last decoded stored frame, so reading frames in order only decodes one delta each
+        self._cached_position = None
+        self._cached_frame = None
+
+    def __len__(self):
+        return len(self.index)
+
+    def _payload(self, position):
+        entry = self.index[position]
+        return self.data[entry['offset']:entry['offset'] + entry['length']]
+
+    def read(self, position):
+        """
+        Decode the stored frame at the given position in the index.
+
+        Returns:
+            numpy.ndarray: An x by y uint8 array of palette codes.
+        """
+        # Walk back to the nearest full frame
+        start = position
+        while self.index[start]['kind'] != FULL_FRAME:
+            start -= 1
+
+        if self._cached_position is not None and start <= self._cached_position <= position:
+            start, frame = self._cached_position, self._cached_frame
+        else:
+            frame = decode_rle(self._payload(start)).reshape(self.shape)
+
+        for i in range(start + 1, position + 1):
+            frame = frame ^ decode_rle(self._payload(i)).reshape(self.shape)
+
+        # The frame is shared with the cache, so callers get it read-only
+        frame.flags.writeable = False
+        self._cached_position, self._cached_frame = position, frame
+        return frame
+
+    def position_of(self, frame_num):
+        # Index position of the most recent stored frame at or before frame_num, or None
+        position = int(np.searchsorted(self.keyframe_numbers, frame_num, side='right')) - 1
+        return position if position >= 0 else None
+
+    def frame_at(self, frame_num):
+        """
+        The grid shown at a timeline frame: the most recent keyframe at or
+        before it, or None if there is no such keyframe.
+        """
+        position = self.position_of(frame_num)
+        return None if position is None else self.read(position)
+
+    def keyframes(self):
+        # Decode every stored frame, in order
+        return {int(self.keyframe_numbers[i]): self.read(i) for i in range(len(self))}
+
+
+def is_animation_file(file_path):
+    with open(file_path, 'rb') as file:
+        return file.read(len(ANIMATION_MAGIC)) == ANIMATION_MAGIC
+
+
+def load_animation(file_path):
+    return AnimationFile(file_path)
@@ -0,0 +1,255 @@
+"""
+The bulb grid as plain arrays, shared by both front ends.
+
+A GridModel holds one palette code per bulb in a rows x cols uint8 array,
+and optionally the exact RGB color each bulb was painted with, so colors
+that are not in the palette can still be previewed as picked. Views
+subscribe to changes instead of keeping cell state of their own, and the
+save and send paths read the code array directly.
+
+Cell colors are given as palette codes (int), RGB tuples or "#RRGGBB"
+strings, and reported back as "#rrggbb" preview strings.
+"""
+import functools
+
+import numpy as np
+
+from designtool.colorconversion import PREVIEW_COLORS, PREVIEW_RGB, rgb_to_code
+
+OFF_CODE = 0xFE
+
+# Distinct colors remembered by the color -> palette code caches; once full,
+# the least recently used are forgotten, so arbitrary picked colors can't grow them without bound
+_COLOR_CACHE_SIZE = 4096
+
+# Edits of up to this many cells are converted cell by cell; np.unique only pays off for more
+_SMALL_EDIT = 64
+
+
+@functools.lru_cache(maxsize=_COLOR_CACHE_SIZE)
+def _resolve(color):
+    # Color -> (palette code, preview RGB tuple)
+    if isinstance(color, (int, np.integer)):
+        return int(color), tuple(PREVIEW_RGB[color].tolist())
+    if isinstance(color, str):
+        rgb = tuple(int(color.lstrip('#')[i:i + 2], 16) for i in (0, 2, 4))
+    else:
+        rgb = tuple(int(c) for c in color)
+    return rgb_to_code(rgb), rgb
+
+
+def _pack(rgb):
+    # (..., 3) RGB array -> one 0xRRGGBB integer per color
+    rgb = np.asarray(rgb, dtype=np.int32)
+    return (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+
+
+def _unpack(values):
+    rgb = np.empty(np.shape(values) + (3,), dtype=np.uint8)
+    rgb[..., 0] = values >> 16
+    rgb[..., 1] = (values >> 8) & 0xFF
+    rgb[..., 2] = values & 0xFF
+    return rgb
+
+
+@functools.lru_cache(maxsize=_COLOR_CACHE_SIZE)
+def _packed_code(value):
+    # Packed color -> palette code, for edits of a few cells
+    return rgb_to_code((value >> 16, (value >> 8) & 0xFF, value & 0xFF))
+
+
+def _packed_codes(values):
+    # Palette code of each packed color, matching every distinct color once
+    if values.size <= _SMALL_EDIT:
+        return np.array([_packed_code(value) for value in values.ravel().tolist()], dtype=np.uint8).reshape(values.shape)
+    unique, inverse = np.unique(values, return_inverse=True)
+    codes = np.array([rgb_to_code(rgb) for rgb in _unpack(unique).tolist()], dtype=np.uint8)
+    return codes[inverse.reshape(values.shape)]
+
+
+class GridModel:
+    """
+    Palette codes of a rows x cols grid of bulbs, indexed [row][col].
+
+    Every change goes through set_cells, set_values, set_codes, set_grid or
+    fill. Only cells whose value actually changes are written; listeners are
+    then called with (rows, cols) index arrays of those cells, and the
+    bounds of all changes are collected until take_dirty() is called.
+
+    Args:
+        rows (int): Number of grid rows.
+        cols (int): Number of grid columns.
+        fill: Initial color of every bulb.
+        keep_rgb (bool): Also keep each bulb's exact RGB color. Cells are
+            then compared by RGB, so two colors with the same palette code
+            are still different cells.
+    """
+
+    def __init__(self, rows, cols, fill=OFF_CODE, keep_rgb=False):
+        self.rows = rows
+        self.cols = cols
+        code, rgb = _resolve(fill)
+        self.codes = np.full((rows, cols), code, dtype=np.uint8)
+        self.rgb = np.full((rows, cols, 3), rgb, dtype=np.uint8) if keep_rgb else None
+        self.listeners = []  # Called with (rows, cols) index arrays of the cells that changed
+        self.dirty = None  # Bounds (top, left, bottom, right) of the changes since take_dirty()
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    def frame(self):
+        """
+        The grid in grid[x][y] order, as the controller and the save path take it.
+
+        This is a view of the codes, not a copy: it follows later edits, so
+        copy it before handing it to another thread.
+        """
+        return self.codes.T
+
+    def values(self):
+        """
+        The grid as a rows x cols array of comparable integers, one per cell:
+        the packed RGB color when RGB is kept, otherwise the palette code.
+        Region tools work on this array and hand the result to set_values.
+        """
+        if self.rgb is None:
+            return self.codes.copy()
+        return _pack(self.rgb)
+
+    def value_of(self, color):
+        code, rgb = _resolve(color)
+        return code if self.rgb is None else int(_pack(rgb))
+
+    def values_at(self, rows, cols):
+        # Values of the cells at (rows, cols) index arrays
+        if self.rgb is None:
+            return self.codes[rows, cols]
+        return _pack(self.rgb[rows, cols])
+
+    def to_values(self, color_grid):
+        # A list of lists of colors as an array of values
+        return np.array([[self.value_of(color) for color in colors] for colors in color_grid], dtype=self._value_dtype)
+
+    def codes_to_values(self, codes):
+        # A rows x cols array of palette codes as an array of values
+        codes = np.asarray(codes, dtype=np.uint8)
+        return codes if self.rgb is None else _pack(PREVIEW_RGB[codes])
+
+    def to_color_grid(self, values):
+        # An array of values as a list of lists of preview colors
+        return self._value_colors(np.asarray(values)).tolist()
+
+    def _value_colors(self, values):
+        # Preview color strings of an array of values, as an object array
+        if self.rgb is None:
+            return PREVIEW_COLORS[values]
+        if np.size(values) <= _SMALL_EDIT:
+            return np.array([f"#{value:06x}" for value in np.ravel(values).tolist()], dtype=object).reshape(np.shape(values))
+        unique, inverse = np.unique(values, return_inverse=True)
+        names = np.array([f"#{value:06x}" for value in unique.tolist()], dtype=object)
+        return names[inverse.reshape(np.shape(values))]
+
+    def preview_rgb(self):
+        # The rows x cols x 3 RGB color every bulb is previewed with
+        if self.rgb is None:
+            return PREVIEW_RGB[self.codes]
+        return self.rgb.copy()
+
+    def color(self, row, col):
+        if self.rgb is None:
+            return PREVIEW_COLORS[self.codes[row, col]]
+        return "#%02x%02x%02x" % tuple(self.rgb[row, col].tolist())
+
+    def color_grid(self):
+        # The preview colors as a list of lists, indexed [row][col]
+        return self._value_colors(self.values()).tolist()
+
+    def set_cells(self, cells):
+        """
+        Set many (row, col, color) cells as one update.
+
+        Returns:
+            list of tuple: (row, col, old color, new color) for each cell that changed.
+        """
+        latest = {(row, col): color for row, col, color in cells}  # A cell given twice ends up with its last color
+        if not latest:
+            return []
+        index = np.array(list(latest), dtype=np.intp)
+        values = np.array([self.value_of(color) for color in latest.values()], dtype=self._value_dtype)
+        return self._write(index[:, 0], index[:, 1], values)
+
+    def set_values(self, values, codes=None):
+        """
+        Set the whole grid from an array like values() returns.
+
+        Args:
+            codes (numpy.ndarray): Palette codes to store with the values, when
+                they are already known; otherwise they are worked out from the values.
+
+        Returns:
+            list of tuple: (row, col, old color, new color) for each cell that changed.
+        """
+        values = np.asarray(values)
+        rows, cols = np.nonzero(self._differs(values))
+        return self._write(rows, cols, values[rows, cols], None if codes is None else codes[rows, cols])
+
+    def set_codes(self, codes):
+        # Show a rows x cols array of palette codes, e.g. a generated frame
+        codes = np.asarray(codes, dtype=np.uint8)
+        return self.set_values(self.codes_to_values(codes), codes)
+
+    def set_grid(self, color_grid):
+        # Show a list of lists of colors, indexed [row][col]
+        return self.set_values(self.to_values(color_grid))
+
+    def fill(self, color):
+        return self.set_values(np.full(self.shape, self.value_of(color), dtype=self._value_dtype))
+
+    def _differs(self, values):
+        # Which cells of a whole-grid values array differ from the grid, compared
+        # against the stored planes without packing them first
+        if self.rgb is None:
+            return values != self.codes
+        changed = self.rgb[..., 0] != (values >> 16)
+        changed |= self.rgb[..., 1] != ((values >> 8) & 0xFF)
+        changed |= self.rgb[..., 2] != (values & 0xFF)
+        return changed
+
+    @property
+    def _value_dtype(self):
+        return np.uint8 if self.rgb is None else np.int32
+
+    def _write(self, rows, cols, values, codes=None):
+        # Store new values for the cells at (rows, cols), skipping any that already hold them
+        old = self.values_at(rows, cols)
+        changed = old != values
+        rows, cols, old, values = rows[changed], cols[changed], old[changed], values[changed]
+        if len(rows) == 0:
+            return []
+
+        if self.rgb is None:
+            self.codes[rows, cols] = values
+        else:
+            self.rgb[rows, cols] = _unpack(values)
+            self.codes[rows, cols] = _packed_codes(values) if codes is None else codes[changed]
+
+        bounds = (int(rows.min()), int(cols.min()), int(rows.max()) + 1, int(cols.max()) + 1)
+        if self.dirty is not None:
+            bounds = (
+                min(bounds[0], self.dirty[0]), min(bounds[1], self.dirty[1]),
+                max(bounds[2], self.dirty[2]), max(bounds[3], self.dirty[3]),
+            )
+        self.dirty = bounds
+
+        for listener in self.listeners:
+            listener(rows, cols)
+        return list(zip(rows.tolist(), cols.tolist(), self._value_colors(old).tolist(), self._value_colors(values).tolist()))
+
+    def take_dirty(self):
+        """
+        Bounds (top, left, bottom, right) of every cell changed since the
+        last call, or None if nothing changed.
+        """
+        dirty, self.dirty = self.dirty, None
+        return dirty
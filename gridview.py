@@ -0,0 +1,123 @@
+import tkinter as tk
+
+import numpy as np
+from PIL import Image, ImageTk
+
+from designtool.stroke import point_to_cell
+
+# Share of the cells that have to change for the whole grid to be drawn as one image
+FULL_REDRAW_SHARE = 0.5
+
+
+class GridCanvas(tk.Canvas):
+    """
+    A GridModel drawn on a single Canvas, one image item per bulb.
+
+    The canvas keeps no cell state of its own: it listens to the model, and
+    a change only marks the changed cells dirty. All dirty cells are redrawn
+    together once per idle cycle, and cells that did not change are never touched.
+
+    Sprites come from a SpriteAtlas, which is told what every cell shows so
+    it keeps those sprites alive; the canvas only remembers each cell's color.
+
+    Reconfiguring thousands of items is slow, so when most of the grid
+    changes at once (playback, loading a frame) the whole grid is drawn with
+    NumPy into one image on top of the cell items instead. The cell items
+    are only brought up to date, and that image hidden, with the next
+    change too small to be worth it.
+
+    Args:
+        master: Parent widget.
+        model (GridModel): The grid to show.
+        sprites (SpriteAtlas): Where the sprites come from.
+        cell_size (int): Distance between neighbouring bulb centers, in pixels.
+    """
+
+    def __init__(self, master, model, sprites, cell_size, **kwargs):
+        super().__init__(
+            master, width=model.cols * cell_size, height=model.rows * cell_size,
+            highlightthickness=0, borderwidth=0, **kwargs
+        )
+        self.model = model
+        self.rows = model.rows
+        self.cols = model.cols
+        self.sprites = sprites
+        self.cell_size = cell_size
+
+        self.dirty = set()
+        self._flush_pending = False
+        self.full_redraw_cells = max(1, int(self.rows * self.cols * FULL_REDRAW_SHARE))
+        model.listeners.append(self.cells_changed)
+
+        # Item ids are created in row-major order, so they are never looked up per cell
+        self.colors = [[model.color(row, col) for col in range(self.cols)] for row in range(self.rows)]
+        self.items = [
+            [self.create_image(col * cell_size, row * cell_size, image=sprites.show(self.colors[row][col]), anchor="nw") for col in range(self.cols)]
+            for row in range(self.rows)
+        ]
+
+        # The whole grid as one image, stacked above the cells and below anything drawn later
+        self.grid_image = ImageTk.PhotoImage("RGB", (self.cols * cell_size, self.rows * cell_size))
+        self.grid_image_item = self.create_image(0, 0, image=self.grid_image, anchor="nw", state="hidden")
+        self.grid_image_shown = False
+        self._background = None
+
+    def cell_at(self, x, y, radius=None):
+        """
+        Map canvas coordinates to a (row, col) cell, or None if outside the grid.
+
+        Args:
+            radius (float): Only count points within this distance of the bulb center.
+        """
+        row, col = point_to_cell(x, y, self.cell_size)
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return None
+        if radius is not None:
+            center = self.cell_size / 2
+            dx, dy = x - col * self.cell_size - center, y - row * self.cell_size - center
+            if dx * dx + dy * dy > radius * radius:
+                return None
+        return row, col
+
+    def cells_changed(self, rows, cols):
+        self.dirty.update(zip(rows.tolist(), cols.tolist()))
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self.dirty and not self._flush_pending:
+            self._flush_pending = True
+            self.after_idle(self.flush)
+
+    def flush(self):
+        # Redraw every dirty cell in one pass
+        self._flush_pending = False
+        dirty, self.dirty = self.dirty, set()
+        if len(dirty) >= self.full_redraw_cells:
+            self.draw_grid_image()
+            return
+        if self.grid_image_shown:
+            # The cell items still show what was there before the grid image
+            self.grid_image_shown = False
+            self.itemconfigure(self.grid_image_item, state="hidden")
+            dirty = ((row, col) for row in range(self.rows) for col in range(self.cols))
+        for row, col in dirty:
+            old, color = self.colors[row][col], self.model.color(row, col)
+            if color == old:
+                continue  # Changed back before it was drawn
+            self.itemconfigure(self.items[row][col], image=self.sprites.show(color))
+            self.sprites.hide(old)
+            self.colors[row][col] = color
+
+    def draw_grid_image(self):
+        # Draw every cell's sprite into the grid image with one paste
+        if self._background is None:
+            self._background = np.array([value >> 8 for value in self.winfo_rgb(self["bg"])], dtype=np.uint8)
+        tints = self.sprites.tints(self.model.preview_rgb())
+        height, width = tints.shape[1], tints.shape[3]
+        pixels = np.empty((self.rows, self.cell_size, self.cols, self.cell_size, 3), dtype=np.uint8)
+        pixels[...] = self._background
+        pixels[:, :height, :, :width] = tints
+        self.grid_image.paste(Image.fromarray(pixels.reshape(self.rows * self.cell_size, self.cols * self.cell_size, 3)))
+        if not self.grid_image_shown:
+            self.grid_image_shown = True
+            self.itemconfigure(self.grid_image_item, state="normal")
@@ -0,0 +1,222 @@
+from collections import deque
+
+import numpy as np
+
+
+def _pack_colors(colors):
+    # "#rrggbb" colors -> one 0xRRGGBB integer each
+    return np.array([int(color[1:], 16) for color in colors], dtype=np.uint32)
+
+
+def _unpack_colors(values):
+    return [f"#{value:06x}" for value in values.tolist()]
+
+
+class CellEdit:
+    """
+    The cells changed by one operation, kept as parallel arrays.
+
+    Only the first "before" and the last "after" color of each cell are
+    kept, so a stroke that crosses the same cell many times stores it once.
+    Colors are "#rrggbb" strings, stored as packed integers once the edit
+    is closed.
+    """
+
+    def __init__(self, kind, changes):
+        self.kind = kind
+        self.cells = {}  # (row, col) -> [before, after], while the edit is still open
+        self.add(changes)
+
+    def add(self, changes):
+        for row, col, before, after in changes:
+            cell = self.cells.get((row, col))
+            if cell is None:
+                self.cells[(row, col)] = [before, after]
+            else:
+                cell[1] = after
+
+    def close(self):
+        # Pack the changes into compact arrays, dropping cells that ended where they started
+        changed = [(cell, colors) for cell, colors in self.cells.items() if colors[0] != colors[1]]
+        self.rows = np.array([cell[0] for cell, _ in changed], dtype=np.int32)
+        self.cols = np.array([cell[1] for cell, _ in changed], dtype=np.int32)
+        self.before = _pack_colors([colors[0] for _, colors in changed])
+        self.after = _pack_colors([colors[1] for _, colors in changed])
+        self.cells = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def nbytes(self):
+        return self.rows.nbytes + self.cols.nbytes + self.before.nbytes + self.after.nbytes
+
+    def cells_for(self, values):
+        return list(zip(self.rows.tolist(), self.cols.tolist(), _unpack_colors(values)))
+
+    def patch(self, color_grid, values):
+        # A copy of color_grid with this edit's cells set to values
+        color_grid = [list(colors) for colors in color_grid]
+        for row, col, color in self.cells_for(values):
+            color_grid[row][col] = color
+        return color_grid
+
+
+class KeyframeEdit:
+    """
+    A keyframe added, overwritten or removed.
+
+    Only the cells that differ between the two states are kept, as a
+    CellEdit. An added or removed keyframe is compared against an all-off
+    grid; an overwrite is undone or redone by patching the keyframe as it
+    is at that moment.
+    """
+
+    kind = "keyframe"
+
+    def __init__(self, frame_num, before, after, off_color, rows, cols):
+        self.frame_num = frame_num
+        self.added = before is None
+        self.removed = after is None
+        off_grid = [[off_color] * cols for _ in range(rows)]
+        before, after = before or off_grid, after or off_grid
+        self.cells = CellEdit(self.kind, [
+            (row, col, before[row][col], after[row][col]) for row in range(rows) for col in range(cols)
+        ])
+        self.cells.close()
+
+    def state(self, current, off_grid, undo):
+        """
+        The keyframe's color grid before (undo) or after the edit, or None
+        when there was no keyframe.
+
+        Args:
+            current: The keyframe's color grid as it is now.
+        """
+        if self.added if undo else self.removed:
+            return None
+        base = off_grid if (self.removed if undo else self.added) else current
+        return self.cells.patch(base, self.cells.before if undo else self.cells.after)
+
+    @property
+    def nbytes(self):
+        return self.cells.nbytes
+
+
+class EditHistory:
+    """
+    Undo/redo history of grid and keyframe edits.
+
+    Each entry holds only the cells an operation changed. Consecutive changes
+    made inside begin_group()/end_group(), e.g. every segment of one stroke,
+    become a single entry. The oldest entries are dropped once the history
+    is larger than max_bytes.
+
+    Colors are "#rrggbb" strings.
+
+    Args:
+        apply_cells (callable): Takes a list of (row, col, color) tuples and
+            shows them on the grid in one update.
+        apply_keyframe (callable): Takes (frame number, color grid or None)
+            and stores or removes that keyframe.
+        get_keyframe (callable): Takes a frame number and returns the
+            keyframe's color grid as it is now.
+        rows (int): Number of grid rows.
+        cols (int): Number of grid columns.
+        off_color: Color of an "off" bulb.
+        max_bytes (int): Memory budget for the history.
+    """
+
+    def __init__(self, apply_cells, apply_keyframe, get_keyframe, rows, cols, off_color, max_bytes=8 * 1024 * 1024):
+        self.apply_cells = apply_cells
+        self.apply_keyframe = apply_keyframe
+        self.get_keyframe = get_keyframe
+        self.rows = rows
+        self.cols = cols
+        self.off_color = off_color
+        self.max_bytes = max_bytes
+
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.size = 0
+        self._group = None  # Open CellEdit collecting a group of changes
+
+    def begin_group(self, kind):
+        self.end_group()
+        self._group = CellEdit(kind, [])
+
+    def end_group(self):
+        group, self._group = self._group, None
+        if group is not None:
+            self._push(group)
+
+    def record_cells(self, kind, changes):
+        """
+        Record grid changes as (row, col, before, after) tuples.
+        """
+        if not changes:
+            return
+        if self._group is not None:
+            self._group.add(changes)
+        else:
+            self._push(CellEdit(kind, changes))
+
+    def record_keyframe(self, frame_num, before, after):
+        """
+        Record a keyframe changing from one color grid to another (None when absent).
+        """
+        self.end_group()
+        if before is None and after is None:
+            return
+        self._push(KeyframeEdit(frame_num, before, after, self.off_color, self.rows, self.cols))
+
+    def clear(self):
+        # Forget everything, e.g. when a file replaces the design the entries refer to
+        self._group = None
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.size = 0
+
+    def _push(self, entry):
+        if isinstance(entry, CellEdit):
+            entry.close()
+            if len(entry) == 0:
+                return
+        elif len(entry.cells) == 0 and not (entry.added or entry.removed):
+            return  # A keyframe overwritten with the same contents
+        self.undo_stack.append(entry)
+        self.size += entry.nbytes
+
+        # Anything undone before is no longer reachable
+        for undone in self.redo_stack:
+            self.size -= undone.nbytes
+        self.redo_stack.clear()
+
+        while self.size > self.max_bytes and len(self.undo_stack) > 1:
+            self.size -= self.undo_stack.popleft().nbytes
+
+    def _apply(self, entry, undo):
+        if isinstance(entry, CellEdit):
+            self.apply_cells(entry.cells_for(entry.before if undo else entry.after))
+        else:
+            off_grid = [[self.off_color] * self.cols for _ in range(self.rows)]
+            current = self.get_keyframe(entry.frame_num)
+            self.apply_keyframe(entry.frame_num, entry.state(current, off_grid, undo))
+
+    def undo(self):
+        self.end_group()
+        if not self.undo_stack:
+            return None
+        entry = self.undo_stack.pop()
+        self.redo_stack.append(entry)
+        self._apply(entry, undo=True)
+        return entry
+
+    def redo(self):
+        self.end_group()
+        if not self.redo_stack:
+            return None
+        entry = self.redo_stack.pop()
+        self.undo_stack.append(entry)
+        self._apply(entry, undo=False)
+        return entry
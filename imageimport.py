@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+from designtool.colorconversion import PALETTE, PALETTE_CODES, rgb_array_to_codes
+
+IMAGE_EXTENSIONS = (".png", ".gif", ".jpg", ".jpeg", ".bmp", ".webp", ".tif", ".tiff")
+
+# Palette image for PIL's error-diffusion quantizer
+# PIL palettes hold 256 entries, so the unused slots repeat the first bulb color
+_palette_image = Image.new("P", (1, 1))
+_palette_image.putpalette(
+    [channel for rgb in PALETTE.values() for channel in rgb]
+    + list(next(iter(PALETTE.values()))) * (256 - len(PALETTE))
+)
+
+# PIL palette index -> bulb palette code
+_INDEX_TO_CODE = np.full(256, PALETTE_CODES[0], dtype=np.uint8)
+_INDEX_TO_CODE[:len(PALETTE_CODES)] = PALETTE_CODES
+
+
+def iter_image_frames(source):
+    """
+    Yield the frames of an image source one at a time as PIL images.
+
+    Args:
+        source (str or list of str): A still image or animated GIF, a directory
+            of images (read in name order), or a list of image paths.
+
+    Yields:
+        PIL.Image.Image: Each frame, converted to RGB.
+    """
+    if isinstance(source, str) and os.path.isdir(source):
+        source = sorted(
+            os.path.join(source, name) for name in os.listdir(source)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+    if isinstance(source, str):
+        source = [source]
+
+    # Only one file is open at a time, and animated files are walked frame by frame
+    for path in source:
+        with Image.open(path) as image:
+            for frame in ImageSequence.Iterator(image):
+                yield frame.convert("RGB")
+
+
+def quantize_image(image, rows, cols, dither=False):
+    """
+    Downscale an image to the grid size and quantize it to the bulb palette.
+
+    Args:
+        image (PIL.Image.Image): The source image.
+        rows (int): Number of grid rows.
+        cols (int): Number of grid columns.
+        dither (bool): Use Floyd-Steinberg error diffusion instead of the
+            nearest bulb color.
+
+    Returns:
+        numpy.ndarray: A rows x cols uint8 array of palette codes.
+    """
+    # BOX averages every source pixel that lands in a cell, which suits large downscales
+    small = image.convert("RGB").resize((cols, rows), Image.Resampling.BOX)
+
+    if dither:
+        quantized = small.quantize(palette=_palette_image, dither=Image.Dither.FLOYDSTEINBERG)
+        return _INDEX_TO_CODE[np.asarray(quantized)]
+
+    return rgb_array_to_codes(np.asarray(small))
+
+
+def import_frames(source, rows, cols, dither=False):
+    """
+    Stream an image, image sequence or animated GIF as grids of palette codes.
+
+    Frames are decoded, downscaled and quantized lazily, so memory stays
+    bounded no matter how many frames the source has.
+
+    Yields:
+        numpy.ndarray: A rows x cols uint8 array of palette codes per frame.
+    """
+    for image in iter_image_frames(source):
+        yield quantize_image(image, rows, cols, dither)
@@ -0,0 +1,355 @@
+"""
+Autosave: an append-only journal of edits, written on a background thread.
+
+The front ends hand every edit to a Journal as a small record: the cells
+that changed, a keyframe stored or removed, or a few settings. Queuing a
+record is all the UI thread does. A writer thread batches records, merges
+repeated cell changes, appends them to the journal file, and every so often
+rewrites the file as one compact snapshot.
+
+The writer keeps its own copy of the design by replaying the records it
+writes, so snapshots never need anything from the UI. After a crash,
+recover() replays the journal the same way and returns the last state.
+"""
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+
+import numpy as np
+
+# Journal layout, little endian:
+#   magic "LCFJ", version, rows, cols
+# followed by records: a type byte and payload length, then the payload.
+JOURNAL_MAGIC = b"LCFJ"
+JOURNAL_VERSION = 1
+JOURNAL_HEADER = struct.Struct("<4sHHH")
+RECORD_HEADER = struct.Struct("<BI")
+
+# Record types
+CELLS = 1  # Changed cells: (row, col, value) for each
+GRID = 2  # The whole grid's values, compressed
+KEYFRAME = 3  # Frame number and the keyframe's values, compressed
+REMOVE = 4  # Frame number of a removed keyframe
+CLEAR = 5  # Every keyframe removed
+SETTINGS = 6  # JSON object of settings, merged into the previous ones
+
+# Queued along with the records, never written: many keyframes handed over at once,
+# each written as a KEYFRAME record
+KEYFRAMES = 0
+
+CELL_DTYPE = np.dtype([('row', '<u2'), ('col', '<u2'), ('value', '<u4')])
+FRAME_NUMBER = struct.Struct("<I")
+
+
+class JournalState:
+    """
+    A design as rebuilt from journal records.
+
+    Attributes:
+        grid (numpy.ndarray): rows x cols values of the grid on screen.
+        keyframes (dict): Frame number -> rows x cols values.
+        settings (dict): Latest value of every setting recorded.
+    """
+
+    def __init__(self, shape, grid=None):
+        self.shape = shape
+        self.grid = np.zeros(shape, dtype=np.uint32) if grid is None else np.array(grid, dtype=np.uint32)
+        self.keyframes = {}
+        self.settings = {}
+
+    def apply(self, kind, payload):
+        if kind == CELLS:
+            cells = np.frombuffer(payload, dtype=CELL_DTYPE)
+            self.grid[cells['row'], cells['col']] = cells['value']
+        elif kind == GRID:
+            self.grid = _decode_values(payload, self.shape)
+        elif kind == KEYFRAME:
+            frame_num, = FRAME_NUMBER.unpack_from(payload)
+            self.keyframes[frame_num] = _decode_values(payload[FRAME_NUMBER.size:], self.shape)
+        elif kind == REMOVE:
+            self.keyframes.pop(FRAME_NUMBER.unpack(payload)[0], None)
+        elif kind == CLEAR:
+            self.keyframes.clear()
+        elif kind == SETTINGS:
+            self.settings.update(json.loads(payload))
+
+    def records(self):
+        # The records that rebuild this state from nothing
+        yield GRID, _encode_values(self.grid)
+        for frame_num in sorted(self.keyframes):
+            yield KEYFRAME, FRAME_NUMBER.pack(frame_num) + _encode_values(self.keyframes[frame_num])
+        if self.settings:
+            yield SETTINGS, json.dumps(self.settings).encode()
+
+
+def _encode_values(values):
+    return zlib.compress(np.ascontiguousarray(values, dtype='<u4').tobytes())
+
+
+def _decode_values(data, shape):
+    return np.frombuffer(zlib.decompress(data), dtype='<u4').reshape(shape).copy()
+
+
+def _merge_cells(batches, shape):
+    # One CELLS payload from many (rows, cols, values) batches; a cell changed more than once keeps its last value
+    rows = np.concatenate([batch[0] for batch in batches])
+    cols = np.concatenate([batch[1] for batch in batches])
+    values = np.concatenate([batch[2] for batch in batches])
+    index = rows.astype(np.int64) * shape[1] + cols
+    _, last = np.unique(index[::-1], return_index=True)
+    last = len(index) - 1 - last
+    cells = np.empty(len(last), dtype=CELL_DTYPE)
+    cells['row'], cells['col'], cells['value'] = rows[last], cols[last], values[last]
+    return cells.tobytes()
+
+
+def read_records(path):
+    """
+    Read a journal.
+
+    A record cut short, e.g. by a crash in the middle of a write, ends the
+    journal: everything before it is still returned.
+
+    Returns:
+        tuple: ((rows, cols), list of (type, payload) records).
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    if len(data) < JOURNAL_HEADER.size:
+        raise ValueError(f"{path} is not a journal")
+    magic, version, rows, cols = JOURNAL_HEADER.unpack_from(data)
+    if magic != JOURNAL_MAGIC:
+        raise ValueError(f"{path} is not a journal")
+    if version != JOURNAL_VERSION:
+        raise ValueError(f"Unsupported journal version {version}")
+
+    records = []
+    position = JOURNAL_HEADER.size
+    while position + RECORD_HEADER.size <= len(data):
+        kind, length = RECORD_HEADER.unpack_from(data, position)
+        start = position + RECORD_HEADER.size
+        if start + length > len(data):
+            break
+        records.append((kind, data[start:start + length]))
+        position = start + length
+    return (rows, cols), records
+
+
+def recover_in_background(path, shape=None):
+    """
+    Run recover() on its own thread, so replaying a long journal does not
+    hold up the UI while it starts.
+
+    Returns:
+        concurrent.futures.Future: Resolves to what recover() returns.
+    """
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(recover(path, shape))
+        except Exception as error:
+            future.set_exception(error)
+
+    threading.Thread(target=run, name="journal-recover", daemon=True).start()
+    return future
+
+
+def recover(path, shape=None):
+    """
+    Rebuild the design saved in a journal.
+
+    Args:
+        shape (tuple): Only recover a journal of this (rows, cols) grid.
+
+    Returns:
+        JournalState: The state after the last complete record, or None
+        when there is no usable journal.
+    """
+    try:
+        journal_shape, records = read_records(path)
+    except (OSError, ValueError):
+        return None
+    if shape is not None and tuple(shape) != journal_shape:
+        return None
+
+    state = JournalState(journal_shape)
+    for kind, payload in records:
+        try:
+            state.apply(kind, payload)
+        except (ValueError, zlib.error):
+            break  # A damaged record; keep what came before it
+    return state
+
+
+class Journal:
+    """
+    Append edits to a journal file from a background thread.
+
+    Every method only queues a record and returns at once; the arrays passed
+    in must not be changed afterwards.
+
+    Args:
+        path (str): The journal file.
+        shape (tuple): (rows, cols) of the grid.
+        interval (float): Seconds the writer waits to gather records into
+            one write after it wakes up.
+        compact_bytes (int): Rewrite the journal as a snapshot once this
+            many bytes have been appended since the last one.
+        compact_seconds (float): Also rewrite it once this many seconds
+            have passed since the last snapshot and anything was appended,
+            so a long session of small edits does not replay slowly.
+    """
+
+    def __init__(self, path, shape, interval=0.5, compact_bytes=1024 * 1024, compact_seconds=300):
+        self.path = path
+        self.shape = tuple(shape)
+        self.interval = interval
+        self.compact_bytes = compact_bytes
+        self.compact_seconds = compact_seconds
+
+        self.error = None  # Error of the last write that failed, cleared once a write succeeds
+        self.snapshots = 0
+        self._snapshot_time = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._state = None
+
+    def start(self, state=None):
+        """
+        Start the writer. It first replaces the journal with a snapshot of
+        state: a recovered JournalState, or an empty design.
+        """
+        self._state = state or JournalState(self.shape)
+        self._thread = threading.Thread(target=self._run, name="journal", daemon=True)
+        self._thread.start()
+
+    def cells(self, rows, cols, values):
+        # Cells that changed on the grid, as index and value arrays
+        self._queue.put((CELLS, (rows, cols, values)))
+
+    def grid(self, values):
+        self._queue.put((GRID, values))
+
+    def keyframe(self, frame_num, values):
+        self._queue.put((KEYFRAME, (frame_num, values)))
+
+    def keyframes(self, keyframes):
+        # Many keyframes at once, as a dict of frame number -> values, e.g. an import
+        self._queue.put((KEYFRAMES, keyframes))
+
+    def remove_keyframe(self, frame_num):
+        self._queue.put((REMOVE, frame_num))
+
+    def clear_keyframes(self):
+        self._queue.put((CLEAR, None))
+
+    def settings(self, **settings):
+        # JSON-serializable settings, e.g. the timeline length
+        self._queue.put((SETTINGS, settings))
+
+    def close(self):
+        # Write everything still queued and stop the writer
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        # Any error is kept in self.error for the UI to show; the writer keeps
+        # draining the queue, so close() never waits on a dead thread
+        file, appended = None, 0
+        try:
+            file = self._compact()
+        except Exception as error:
+            self.error = error  # Tried again with the next batch
+        running = True
+        while running:
+            items = [self._queue.get()]
+            if items[0] is not None:
+                time.sleep(self.interval)  # Let a burst of edits collect into one write
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in items:
+                running = False
+                items = items[:items.index(None)]
+
+            try:
+                records = self._encode(items)
+                if file is None:
+                    # The last write failed: the snapshot covers everything so far
+                    file, appended = self._compact(), 0
+                else:
+                    data = b"".join(RECORD_HEADER.pack(kind, len(payload)) + payload for kind, payload in records)
+                    file.write(data)
+                    file.flush()
+                    appended += len(data)
+                    if appended >= self.compact_bytes or (appended and time.monotonic() - self._snapshot_time >= self.compact_seconds):
+                        file.close()
+                        file, appended = self._compact(), 0
+                self.error = None
+            except Exception as error:
+                self.error = error
+                if file is not None:
+                    try:
+                        file.close()
+                    except OSError:
+                        pass
+                    file = None
+        if file is not None:
+            file.close()
+
+    def _encode(self, items):
+        # Records for a batch of queued items, applied to the writer's copy of the state
+        # Runs of cell changes between other records are merged into one record
+        records, cells = [], []
+        for kind, item in items:
+            if kind == CELLS:
+                cells.append(item)
+                continue
+            if cells:
+                records.append((CELLS, _merge_cells(cells, self.shape)))
+                cells = []
+            if kind == GRID:
+                records.append((GRID, _encode_values(item)))
+            elif kind == KEYFRAME:
+                records.append((KEYFRAME, FRAME_NUMBER.pack(item[0]) + _encode_values(item[1])))
+            elif kind == KEYFRAMES:
+                records.extend((KEYFRAME, FRAME_NUMBER.pack(frame_num) + _encode_values(values))
+                               for frame_num, values in sorted(item.items()))
+            elif kind == REMOVE:
+                records.append((REMOVE, FRAME_NUMBER.pack(item)))
+            elif kind == CLEAR:
+                records.append((CLEAR, b""))
+            elif kind == SETTINGS:
+                records.append((SETTINGS, json.dumps(item).encode()))
+        if cells:
+            records.append((CELLS, _merge_cells(cells, self.shape)))
+
+        for kind, payload in records:
+            self._state.apply(kind, payload)
+        return records
+
+    def _compact(self):
+        # Replace the journal with a snapshot of the current state, and keep appending to that
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "wb") as snapshot:
+            snapshot.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION, *self.shape))
+            for kind, payload in self._state.records():
+                snapshot.write(RECORD_HEADER.pack(kind, len(payload)) + payload)
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(temp_path, self.path)  # The old journal stays whole until the snapshot is complete
+        self.snapshots += 1
+        self._snapshot_time = time.monotonic()
+        return open(self.path, "ab")
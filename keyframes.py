@@ -0,0 +1,111 @@
+import bisect
+import itertools
+
+
+class KeyframeIndex:
+    """
+    Sorted set of keyframe numbers.
+
+    The numbers are kept in sorted chunks of up to 2 * chunk_size, with the
+    first number of each chunk in a separate sorted list, like a B-tree one
+    level deep. Every operation is a binary search over the chunks and then
+    one within a chunk. Adding or removing a number only shifts the numbers
+    of its own chunk, so lookups such as "the most recent keyframe at or
+    before this frame" and edits both stay fast on timelines with many
+    thousands of keyframes.
+
+    Args:
+        frame_numbers (iterable): Initial keyframe numbers.
+        chunk_size (int): Numbers per chunk; chunks are split in two once
+            they reach twice this.
+    """
+
+    def __init__(self, frame_numbers=(), chunk_size=512):
+        self.chunk_size = chunk_size
+        numbers = sorted(set(frame_numbers))
+        self.chunks = [numbers[i:i + chunk_size] for i in range(0, len(numbers), chunk_size)]
+        self.firsts = [chunk[0] for chunk in self.chunks]  # First number of each chunk
+        self.count = len(numbers)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self.chunks)
+
+    def _chunk_for(self, frame_num):
+        # Index of the chunk frame_num belongs in: the last one starting at or before it
+        return max(bisect.bisect_right(self.firsts, frame_num) - 1, 0)
+
+    def __contains__(self, frame_num):
+        if not self.chunks:
+            return False
+        chunk = self.chunks[self._chunk_for(frame_num)]
+        i = bisect.bisect_left(chunk, frame_num)
+        return i < len(chunk) and chunk[i] == frame_num
+
+    def add(self, frame_num):
+        if not self.chunks:
+            self.chunks.append([frame_num])
+            self.firsts.append(frame_num)
+            self.count = 1
+            return
+        c = self._chunk_for(frame_num)
+        chunk = self.chunks[c]
+        i = bisect.bisect_left(chunk, frame_num)
+        if i < len(chunk) and chunk[i] == frame_num:
+            return
+        chunk.insert(i, frame_num)
+        self.firsts[c] = chunk[0]
+        self.count += 1
+        if len(chunk) >= 2 * self.chunk_size:
+            # Split a full chunk in two
+            half = chunk[self.chunk_size:]
+            del chunk[self.chunk_size:]
+            self.chunks.insert(c + 1, half)
+            self.firsts.insert(c + 1, half[0])
+
+    def remove(self, frame_num):
+        if not self.chunks:
+            return
+        c = self._chunk_for(frame_num)
+        chunk = self.chunks[c]
+        i = bisect.bisect_left(chunk, frame_num)
+        if i == len(chunk) or chunk[i] != frame_num:
+            return
+        del chunk[i]
+        self.count -= 1
+        if chunk:
+            self.firsts[c] = chunk[0]
+        else:
+            del self.chunks[c]
+            del self.firsts[c]
+
+    def clear(self):
+        self.chunks.clear()
+        self.firsts.clear()
+        self.count = 0
+
+    def previous(self, frame_num):
+        # The most recent keyframe at or before frame_num, or None
+        c = bisect.bisect_right(self.firsts, frame_num) - 1
+        if c < 0:
+            return None
+        chunk = self.chunks[c]
+        return chunk[bisect.bisect_right(chunk, frame_num) - 1]
+
+    def next(self, frame_num):
+        # The first keyframe after frame_num, or None
+        c = self._chunk_for(frame_num)
+        for chunk in self.chunks[c:c + 2]:
+            i = bisect.bisect_right(chunk, frame_num)
+            if i < len(chunk):
+                return chunk[i]
+        return None
+
+    def between(self, start, stop):
+        # Keyframes in [start, stop)
+        frames = []
+        for chunk in self.chunks[self._chunk_for(start):bisect.bisect_left(self.firsts, stop)]:
+            frames.extend(chunk[bisect.bisect_left(chunk, start):bisect.bisect_left(chunk, stop)])
+        return frames
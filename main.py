@@ -1,22 +1,79 @@
 import pygame
-import random
-import tkinter as tk
-from tkinter import colorchooser, filedialog
+import numpy as np
 import asyncio
+import os
 
-from lightsimul.simul import *
-from lightslib.LightsController import LightsController
+from designtool.colorconversion import CODE_RGB, PALETTE_CODES, codes_to_hex_grid, rgb_to_code
+from designtool.stroke import point_to_cell
+from designtool.filesave import save_grid_to_file as write_grid_to_file
+from designtool.gridmodel import GridModel
+from designtool.journal import Journal, JournalState, recover_in_background
+from designtool.sender import CONNECTED, ControllerWorker
+from designtool.metrics import metrics
 
-controller = LightsController()
-asyncio.run(controller.connect(run_simul_on_fail=False))
+# The controller is connected in the background once the window is up; its
+# worker only sends the cells that changed since the last frame.
+# DESIGNTOOL_RECORD records every frame to a log file instead of sending it.
+record_path = os.environ.get("DESIGNTOOL_RECORD")
+if record_path:
+    from designtool.recorder import RecordingController
+    controller = RecordingController(record_path)
+else:
+    from lightslib.LightsController import LightsController
+    controller = LightsController()
+controller_worker = ControllerWorker(controller)
+
+# Grid edits are journaled on a background thread and the last grid is
+# recovered at start. DESIGNTOOL_AUTOSAVE names the journal file; set it to
+# an empty string to turn autosave off.
+autosave_path = os.environ.get("DESIGNTOOL_AUTOSAVE", os.path.join(os.path.expanduser("~"), ".designtool", "autosave_pygame.lcfj"))
+journal = None
+recovery = None  # Future of the recovered grid while it is being read
 
 # Grid origin starts below the toolbar
 GRID_SIZE = 20
 WIDTH = 600
 HEIGHT = 650
-FPS = 60
+IDLE_TIMEOUT_MS = 100  # Longest the main loop sleeps waiting for events
+STATS_REFRESH_MS = 500  # How often the stats overlay is redrawn while shown
 toolbar_height = 50  # Height of the toolbar
 grid_origin = (0, toolbar_height)  # Start the grid below the toolbar
+background_color = (30, 30, 30)
+
+# Bulbs are laid out in square cells filling the area below the toolbar
+cell_size = min(WIDTH, HEIGHT - toolbar_height) // GRID_SIZE
+grid_rect = pygame.Rect(grid_origin, (GRID_SIZE * cell_size, GRID_SIZE * cell_size))
+
+# The bulbs' palette codes; drawing, saving and sending all read them from here
+grid_model = GridModel(GRID_SIZE, GRID_SIZE)
+
+# Map a click to the (col, row) of the bulb under it, or None
+def handle_click(pos):
+    row, col = point_to_cell(pos[0], pos[1], cell_size, grid_origin)
+    if 0 <= row < GRID_SIZE and 0 <= col < GRID_SIZE:
+        return col, row
+    return None
+
+# Tk dialogs run on a hidden root window; Tk is only loaded when a dialog is first opened
+def ask_color(**options):
+    import tkinter as tk
+    from tkinter import colorchooser
+
+    root = tk.Tk()
+    root.withdraw()  # Hide the main Tkinter window
+    color = colorchooser.askcolor(**options)
+    root.destroy()
+    return color
+
+def ask_save_path(**options):
+    import tkinter as tk
+    from tkinter import filedialog
+
+    root = tk.Tk()
+    root.withdraw()
+    file_path = filedialog.asksaveasfilename(**options)
+    root.destroy()
+    return file_path
 
 # Function to handle click events
 def bulb_clicked(bulb_pos):
@@ -24,47 +81,54 @@ def bulb_clicked(bulb_pos):
     row = bulb_pos[1]
 
     # Open color picker
-    root = tk.Tk()
-    root.withdraw()  # Hide the main Tkinter window
-    color_code = colorchooser.askcolor(title="Choose a color")[0]  # Get RGB from color picker
-    root.destroy()
+    color_code = ask_color(title="Choose a color")[0]  # Get RGB from color picker
     if color_code:
-        # Convert RGB to 2-digit hex value
-        new_hex = rgb_to_hex(color_code)
-        grid[col][row] = new_hex
+        # Convert RGB to the closest palette code
+        set_bulb(col, row, rgb_to_code(color_code))
+
+def set_bulb(col, row, code):
+    journal_edit(grid_model.set_cells([(row, col, code)]))
 
 def reset_grid():
-    global grid
-    grid = [["FE" for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
+    journal_edit(grid_model.fill(0xFE))
+
+def journal_edit(changes):
+    # Only the user's edits are journaled, not every change to the grid
+    if journal is not None and changes:
+        rows, cols = np.array([change[:2] for change in changes], dtype=np.intp).T
+        journal.cells(rows, cols, grid_model.values_at(rows, cols))
+
+def start_journal():
+    # Read the last grid back on a thread; the main loop finishes once it is done
+    global recovery
+    recovery = recover_in_background(autosave_path, grid_model.shape)
+
+def finish_recovery():
+    # Bring back the last grid, then journal every change to it
+    global journal, recovery
+    state = recovery.result()
+    recovery = None
+    if state is not None:
+        grid_model.set_values(state.grid)
+    else:
+        state = JournalState(grid_model.shape, grid_model.values())
+    journal = Journal(autosave_path, grid_model.shape)
+    journal.start(state)
+
+def journal_error():
+    # Why the last autosave write failed, as text, while it is failing
+    # Each failed write makes a new exception, so only the text tells whether it changed
+    if journal is None or journal.error is None:
+        return None
+    return str(journal.error)
 
-async def send_config():
-    global grid
-    await controller.drawFrame(grid)
+def send_config():
+    # The worker sends in the background; the copy keeps later edits out of this frame
+    with metrics.span("ui.send_config"):
+        controller_worker.submit(grid_model.frame().copy(), force=True)
 
 def save_grid_to_file(file_path):
-    # First get rid of "empty" rows and columns
-    # --------------------------------------------------------------------
-    # Remove empty rows (rows that only contain 'FE')
-    altered_grid = [row for row in grid if any(cell != 'FE' for cell in row)]
-    
-    # Remove empty columns (columns that only contain 'FE' in each row)
-    # Transpose the grid, filter columns, then transpose back
-    altered_grid = list(zip(*altered_grid))  # Transpose the grid
-    altered_grid = [col for col in altered_grid if any(cell != 'FE' for cell in col)]
-    altered_grid = list(zip(*altered_grid))  # Transpose back to the original orientation
-    
-    # Convert tuples back to lists
-    altered_grid = [list(row) for row in altered_grid]
-    # --------------------------------------------------------------------
-
-    # Write grid data to file
-    with open(file_path, 'w') as file:
-        # First write x/y dimensions to file
-        file.write(str(len(altered_grid)) + '\n') # x
-        file.write(str(len(altered_grid[0])) + '\n') # y
-
-        for row in altered_grid:
-            file.write(' '.join(row) + '\n')
+    write_grid_to_file(codes_to_hex_grid(grid_model.frame()), file_path)
 
 async def handle_toolbar_click(pos):
     # Check if the click was within a button's area
@@ -72,13 +136,10 @@ async def handle_toolbar_click(pos):
         if 10 <= pos[0] <= 110:  # Button 1 (e.g., Reset Grid)
             reset_grid()
         elif 120 <= pos[0] <= 220:  # Button 2 (e.g., another action)
-            await send_config()
+            send_config()
         elif 230 <= pos[0] <= 330:  # Button 3 (Save File)
             # Open file save dialog
-            root = tk.Tk()
-            root.withdraw()  # Hide the main Tkinter window
-            file_path = filedialog.asksaveasfilename(defaultextension=".lcf", filetypes=[("Lights creation file", "*.lcf"), ("All files", "*.*")])
-            root.destroy()
+            file_path = ask_save_path(defaultextension=".lcf", filetypes=[("Lights creation file", "*.lcf"), ("All files", "*.*")])
             if file_path:
                 save_grid_to_file(file_path)  # You would define this function to save the grid to the file
 
@@ -92,97 +153,211 @@ def draw_rounded_rect(screen, color, rect, radius=10):
     pygame.draw.circle(screen, color, (x + radius, y + height - radius), radius)
     pygame.draw.circle(screen, color, (x + width - radius, y + height - radius), radius)
 
-def draw_toolbar(screen, mouse_pos):
+# Toolbar buttons: (rect, label, color); hovered buttons use hover_color
+BUTTONS = [
+    (pygame.Rect(10, 10, 100, 30), "Reset Grid", (200, 0, 0)),
+    (pygame.Rect(120, 10, 100, 30), "Send Config", (0, 200, 0)),
+    (pygame.Rect(230, 10, 100, 30), "Save File", (0, 200, 0)),
+]
+hover_color = (255, 50, 50)
+toolbar_rect = pygame.Rect(0, 0, WIDTH, toolbar_height)
+
+def render_buttons():
+    """Pre-render every button, normal and hovered, so drawing the toolbar is just blits"""
+    font = pygame.font.Font(None, 24)  # Created once, not every frame
+    surfaces = []
+    for rect, label, color in BUTTONS:
+        states = []
+        for fill in (color, hover_color):
+            surface = pygame.Surface(rect.size, pygame.SRCALPHA)
+            draw_rounded_rect(surface, fill, (0, 0, rect.width, rect.height))
+            # Add text label on button, centered
+            text = font.render(label, True, (255, 255, 255))
+            surface.blit(text, text.get_rect(center=(rect.width // 2, rect.height // 2)))
+            states.append(surface)
+        surfaces.append(states)
+    return surfaces
+
+def button_at(pos):
+    # Index of the button under pos, or None
+    for i, (rect, _, _) in enumerate(BUTTONS):
+        if rect.collidepoint(pos):
+            return i
+    return None
+
+def draw_toolbar(screen, hovered):
     # Draw the toolbar background
-    pygame.draw.rect(screen, (100, 100, 100), (0, 0, WIDTH, toolbar_height))  # Background of toolbar
-    
+    pygame.draw.rect(screen, (100, 100, 100), toolbar_rect)  # Background of toolbar
+
     # Draw buttons with rounded corners
-    button_color = (200, 0, 0)
-    hover_color = (255, 50, 50)
-    
-    button1_rect = pygame.Rect(10, 10, 100, 30)
-    button2_rect = pygame.Rect(120, 10, 100, 30)
-    button3_rect = pygame.Rect(230, 10, 100, 30)
-    
-    if button1_rect.collidepoint(mouse_pos):
-        draw_rounded_rect(screen, hover_color, button1_rect)
-    else:
-        draw_rounded_rect(screen, button_color, button1_rect)
+    for i, (rect, _, _) in enumerate(BUTTONS):
+        screen.blit(button_surfaces[i][i == hovered], rect)
 
-    if button2_rect.collidepoint(mouse_pos):
-        draw_rounded_rect(screen, hover_color, button2_rect)
-    else:
-        draw_rounded_rect(screen, (0, 200, 0), button2_rect)
+    # Controller connection state, at the right end, and why autosave is failing, if it is
+    status = controller_worker.status
+    text = stats_font.render(f"Controller: {status}", True, (0, 255, 0) if status == CONNECTED else (255, 200, 0))
+    text_rect = screen.blit(text, text.get_rect(midright=(WIDTH - 10, toolbar_height // 2)))
+    if journal_error() is not None:
+        text = stats_font.render(f"Autosave failed: {journal_error()}", True, (255, 80, 80))
+        screen.blit(text, text.get_rect(midright=(text_rect.left - 15, toolbar_height // 2)))
 
-    if button3_rect.collidepoint(mouse_pos):
-        draw_rounded_rect(screen, hover_color, button3_rect)
-    else:
-        draw_rounded_rect(screen, (0, 200, 0), button3_rect)
-    
-    # Add text labels on buttons, centered
-    font = pygame.font.Font(None, 24)
-    
-    # Button 1 text
-    text = font.render("Reset Grid", True, (255, 255, 255))
-    text_rect = text.get_rect(center=button1_rect.center)  # Center the text
-    screen.blit(text, text_rect)
-
-    # Button 2 text
-    text = font.render("Send Config", True, (255, 255, 255))
-    text_rect = text.get_rect(center=button2_rect.center)  # Center the text
-    screen.blit(text, text_rect)
-
-    # Button 3 text
-    text = font.render("Save File", True, (255, 255, 255))
-    text_rect = text.get_rect(center=button3_rect.center)  # Center the text
-    screen.blit(text, text_rect)
+def make_bulb_mask():
+    """Background with a transparent circle over every cell, laid over the scaled grid"""
+    cell = pygame.Surface((cell_size, cell_size), pygame.SRCALPHA)
+    cell.fill(background_color)
+    pygame.draw.circle(cell, (0, 0, 0, 0), (cell_size // 2, cell_size // 2), cell_size // 2 - 1)
+
+    mask = pygame.Surface(grid_rect.size, pygame.SRCALPHA)
+    for x in range(GRID_SIZE):
+        for y in range(GRID_SIZE):
+            mask.blit(cell, (x * cell_size, y * cell_size))
+    return mask
+
+def draw_grid(screen):
+    # One pixel per bulb in a palette-indexed surface, scaled up, with the bulb mask on top
+    with metrics.span("ui.draw_grid"):
+        pygame.surfarray.blit_array(grid_surface, grid_model.frame())  # Surfaces are indexed [x][y] too
+        screen.blit(pygame.transform.scale(grid_surface, grid_rect.size), grid_rect)
+        screen.blit(bulb_mask, grid_rect)
+    if show_stats:
+        draw_stats(screen)
+
+def cells_rect(bounds):
+    # Screen rectangle covering the cells in (top, left, bottom, right) bounds
+    top, left, bottom, right = bounds
+    return pygame.Rect(
+        grid_rect.left + left * cell_size, grid_rect.top + top * cell_size,
+        (right - left) * cell_size, (bottom - top) * cell_size
+    )
+
+def draw_stats(screen):
+    # Latency percentiles, frame rates and counters, over the top of the grid
+    y = grid_rect.top + 5
+    for line in metrics.report():
+        text = stats_font.render(line, True, (255, 255, 255), (0, 0, 0))
+        screen.blit(text, (grid_rect.left + 5, y))
+        y += text.get_height()
+
+def toggle_stats():
+    # F3 shows the stats overlay and records while it is shown
+    global show_stats, grid_dirty
+    show_stats = not show_stats
+    metrics.enabled = show_stats
+    grid_dirty = True
+
+def export_stats():
+    # F4 writes the recorded metrics to a JSON file
+    file_path = ask_save_path(defaultextension=".json", filetypes=[("JSON", "*.json"), ("All files", "*.*")])
+    if file_path:
+        metrics.export(file_path)
 
 async def main():
-    global grid
+    global grid_dirty, grid_surface, bulb_mask, button_surfaces, stats_font, show_stats
 
     # Initialize pygame
     pygame.init()
 
-    # Create the initial 2D array (20x20) with random 2-digit hex values
-    grid = [[f"{random.randint(0, 255):02X}" for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
+    # Create the initial 2D array (20x20) with random palette codes
+    grid_model.set_codes(np.random.choice(PALETTE_CODES, (GRID_SIZE, GRID_SIZE)))
+    if autosave_path:
+        start_journal()
 
     # Create the game window
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption("Dynamic Grid Color Display")
 
-    # Main game loop
+    # Everything that does not change between frames is built once
+    button_surfaces = render_buttons()
+    bulb_mask = make_bulb_mask()
+    grid_surface = pygame.Surface((GRID_SIZE, GRID_SIZE), depth=8)
+    grid_surface.set_palette([tuple(rgb) for rgb in CODE_RGB.tolist()])
+    stats_font = pygame.font.Font(None, 20)
+    show_stats = metrics.enabled
+    stats_drawn_at = 0
+    shown_status = controller_worker.status
+    shown_journal_error = journal_error()
+
+    # Clear screen and draw everything once
+    screen.fill(background_color) # Dark gray bg color
+    hovered = button_at(pygame.mouse.get_pos())
+    draw_toolbar(screen, hovered)
+    draw_grid(screen)
+    pygame.display.flip()
+    grid_dirty = False  # Set when the whole grid area needs redrawing; edits are tracked by grid_model
+    grid_model.take_dirty()
+
+    # Only start connecting once the window is showing; sends wait until it is up
+    controller_worker.connect(run_simul_on_fail=False)
+
+    # Main loop: sleep until something happens, then redraw only what changed
     running = True
-    clock = pygame.time.Clock()
-    
     while running:
-        mouse_pos = pygame.mouse.get_pos()
+        event = pygame.event.wait(IDLE_TIMEOUT_MS)
+        events = [event] + pygame.event.get() if event.type != pygame.NOEVENT else []
+        toolbar_dirty = False
 
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type == pygame.MOUSEMOTION:
+                # Draw toolbar with hover effect
+                if button_at(event.pos) != hovered:
+                    hovered = button_at(event.pos)
+                    toolbar_dirty = True
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_F3:
+                    toggle_stats()
+                elif event.key == pygame.K_F4:
+                    export_stats()
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if event.pos[1] <= toolbar_height:
                     await handle_toolbar_click(event.pos)  # Handle toolbar button clicks
                 else:
-                    bulb_pos = handle_click(event.pos, grid_origin)
-                    print(bulb_pos)
-                    bulb_clicked(bulb_pos)
-        
-        # Clear screen
-        screen.fill((30, 30, 30)) # Dark gray bg color
-        
-        # Draw toolbar with hover effect
-        draw_toolbar(screen, mouse_pos)
-
-        # Draw updated grid
-        draw_grid(screen, grid, grid_origin)
-        
-        # Update the display
-        pygame.display.flip()
-        
-        # Cap the frame rate
-        clock.tick(FPS)
-    
+                    bulb_pos = handle_click(event.pos)
+                    if bulb_pos is not None:
+                        bulb_clicked(bulb_pos)
+
+        if recovery is not None and recovery.done():
+            finish_recovery()
+
+        # Finished sends need no handling here, but the connection state and autosave failures are shown
+        while not controller_worker.results.empty():
+            controller_worker.results.get()
+        if controller_worker.status != shown_status:
+            shown_status = controller_worker.status
+            toolbar_dirty = True
+        if journal_error() != shown_journal_error:
+            shown_journal_error = journal_error()
+            toolbar_dirty = True
+
+        # The stats overlay sits on the grid, so refreshing it redraws the grid
+        if show_stats and pygame.time.get_ticks() - stats_drawn_at >= STATS_REFRESH_MS:
+            grid_dirty = True
+
+        # Update only the parts of the display that changed
+        dirty_rects = []
+        if toolbar_dirty:
+            draw_toolbar(screen, hovered)
+            dirty_rects.append(toolbar_rect)
+        edited = grid_model.take_dirty()
+        if grid_dirty or edited is not None:
+            draw_grid(screen)
+            # With no overlay to refresh, only the edited cells go to the display
+            dirty_rects.append(grid_rect if grid_dirty or show_stats else cells_rect(edited))
+            grid_dirty = False
+            stats_drawn_at = pygame.time.get_ticks()
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+            metrics.tick("display")
+
+        # Let other tasks on the event loop run
+        await asyncio.sleep(0)
+
+    controller_worker.stop()
+    if journal is not None:
+        journal.close()
+    if record_path:
+        controller.close()
     pygame.quit()
 
 asyncio.run(main())
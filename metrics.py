@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class _NullSpan:
+    # Shared do-nothing span handed out while metrics are off
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """
+    Low-overhead timing of the capture -> quantize -> send pipeline.
+
+    Stages are timed with `with metrics.span("name"):`. The most recent
+    durations of each span are kept in a fixed-size window, from which
+    latency percentiles are computed on demand. Counters track events such
+    as dropped frames, and ticks give a frames-per-second rate.
+
+    While disabled, span() returns a shared no-op object and every other
+    recording method returns immediately, so instrumented code costs a
+    method call per stage.
+
+    Safe to record from several threads, e.g. the UI and a controller worker.
+
+    Args:
+        enabled (bool): Start recording straight away.
+        window (int): How many recent samples to keep per span.
+    """
+
+    def __init__(self, enabled=False, window=1024):
+        self.enabled = enabled
+        self.window = window
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.spans = {}  # Name -> deque of recent durations, in seconds
+            self.span_counts = {}  # Name -> samples recorded in total
+            self.counters = {}
+            self.ticks = {}  # Name -> deque of recent tick times
+
+    def span(self, name):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            samples = self.spans.get(name)
+            if samples is None:
+                samples = self.spans[name] = deque(maxlen=self.window)
+            samples.append(seconds)
+            self.span_counts[name] = self.span_counts.get(name, 0) + 1
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def tick(self, name):
+        # Mark one frame shown, for the frames-per-second rate
+        if not self.enabled:
+            return
+        with self._lock:
+            times = self.ticks.get(name)
+            if times is None:
+                times = self.ticks[name] = deque(maxlen=self.window)
+            times.append(time.perf_counter())
+
+    def summary(self):
+        """
+        Latency percentiles, counters and frame rates recorded so far.
+
+        Returns:
+            dict: "spans" maps each span to its count, mean, p50, p95, p99 and
+            max in milliseconds over the recent window; "counters" holds the
+            counters; "fps" maps each tick name to its recent rate.
+        """
+        with self._lock:
+            spans = {name: np.array(samples) for name, samples in self.spans.items()}
+            span_counts = dict(self.span_counts)
+            counters = dict(self.counters)
+            ticks = {name: list(times) for name, times in self.ticks.items()}
+
+        span_stats = {}
+        for name, samples in spans.items():
+            p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1000
+            span_stats[name] = {
+                "count": span_counts[name],
+                "mean_ms": float(samples.mean() * 1000),
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "max_ms": float(samples.max() * 1000),
+            }
+
+        fps = {}
+        for name, times in ticks.items():
+            elapsed = times[-1] - times[0]
+            fps[name] = (len(times) - 1) / elapsed if len(times) > 1 and elapsed > 0 else 0.0
+
+        return {"spans": span_stats, "counters": counters, "fps": fps}
+
+    def report(self):
+        # The summary as short lines of text, for showing in the app
+        summary = self.summary()
+        lines = [
+            f"{name}: p50 {stats['p50_ms']:.2f} / p95 {stats['p95_ms']:.2f} / p99 {stats['p99_ms']:.2f} ms (n={stats['count']})"
+            for name, stats in sorted(summary["spans"].items())
+        ]
+        lines += [f"{name}: {rate:.1f} fps" for name, rate in sorted(summary["fps"].items())]
+        lines += [f"{name}: {value}" for name, value in sorted(summary["counters"].items())]
+        return lines or ["No samples yet"]
+
+    def export(self, path):
+        """
+        Write the summary and the raw recent samples to a JSON file.
+        """
+        summary = self.summary()
+        with self._lock:
+            summary["samples_ms"] = {name: [seconds * 1000 for seconds in samples] for name, samples in self.spans.items()}
+        summary["timestamp"] = time.time()
+        with open(path, "w") as file:
+            json.dump(summary, file, indent=2)
+
+
+# Shared by every module; set DESIGNTOOL_METRICS=1 to record from startup
+metrics = Metrics(enabled=os.environ.get("DESIGNTOOL_METRICS") == "1")
@@ -0,0 +1,156 @@
+import math
+import time
+from collections import OrderedDict
+
+from designtool.metrics import metrics
+
+
+class Player:
+    """
+    Real-time playback of a timeline.
+
+    Frames are scheduled against a monotonic clock: frame n of a run is due
+    at start + n / fps, so timer jitter never accumulates into drift. When a
+    tick arrives late enough that frames were missed, playback jumps to the
+    frame that is due now and counts the skipped ones as dropped.
+
+    After each frame is shown, the next few frames are rendered ahead of
+    time so the work for a tick is already done when it fires.
+
+    Args:
+        scheduler: Anything with Tk's after(ms, callback) / after_cancel(id),
+            usually the root window.
+        render (callable): Takes a frame number and returns the rendered frame.
+        on_frame (callable): Called with (frame number, rendered frame) on each tick.
+        total_frames (int): Length of the timeline.
+        fps (float): Playback rate.
+        loop (bool): Start over after the last frame.
+        render_ahead (int): How many upcoming frames to keep rendered.
+        on_stop (callable): Called with no arguments whenever playback
+            stops, whether paused or at the end of a timeline that does not loop.
+    """
+
+    def __init__(self, scheduler, render, on_frame, total_frames, fps=30, loop=True, render_ahead=8, clock=time.monotonic, on_stop=None):
+        self.scheduler = scheduler
+        self.render = render
+        self.on_frame = on_frame
+        self.on_stop = on_stop
+        self.total_frames = total_frames
+        self.fps = fps
+        self.loop = loop
+        self.render_ahead = render_ahead
+        self.clock = clock
+
+        self.playing = False
+        self.current_frame = 0
+        self.frames_shown = 0
+        self.frames_dropped = 0
+
+        self._rendered = OrderedDict()  # Frame number -> rendered frame
+        self._timer = None
+        self._start_time = None
+        self._start_frame = 0
+        self._ticks = 0  # Frames of the current run accounted for so far
+
+    def set_fps(self, fps):
+        # Restart the schedule from the current frame at the new rate
+        self.fps = fps
+        if self.playing:
+            self._restart_schedule()
+
+    def play(self):
+        if self.playing:
+            return
+        self.playing = True
+        self._restart_schedule()
+        self._tick()
+
+    def pause(self):
+        was_playing, self.playing = self.playing, False
+        if self._timer is not None:
+            self.scheduler.after_cancel(self._timer)
+            self._timer = None
+        if was_playing and self.on_stop is not None:
+            self.on_stop()
+
+    def toggle(self):
+        if self.playing:
+            self.pause()
+        else:
+            self.play()
+
+    def seek(self, frame_num):
+        self.current_frame = frame_num
+        if self.playing:
+            self._restart_schedule()
+
+    def invalidate(self):
+        # Drop pre-rendered frames, e.g. after a keyframe was edited
+        self._rendered.clear()
+
+    def _restart_schedule(self):
+        self._start_time = self.clock()
+        self._start_frame = self.current_frame
+        self._ticks = 0
+
+    def _frame_for_tick(self, tick):
+        frame_num = self._start_frame + tick
+        if frame_num < self.total_frames:
+            return frame_num
+        if self.loop and self.total_frames > 0:
+            return frame_num % self.total_frames
+        return None
+
+    def _get_rendered(self, frame_num):
+        rendered = self._rendered.pop(frame_num, None)
+        if rendered is None:
+            rendered = self.render(frame_num)
+        return rendered
+
+    def _render_upcoming(self, tick):
+        # Keep only the frames coming up next
+        upcoming = []
+        for ahead in range(1, self.render_ahead + 1):
+            frame_num = self._frame_for_tick(tick + ahead)
+            if frame_num is None:
+                break
+            upcoming.append(frame_num)
+        for frame_num in list(self._rendered):
+            if frame_num not in upcoming:
+                del self._rendered[frame_num]
+        for frame_num in upcoming:
+            if frame_num not in self._rendered:
+                self._rendered[frame_num] = self.render(frame_num)
+
+    def _tick(self):
+        self._timer = None
+        if not self.playing:
+            return
+
+        period = 1 / self.fps
+        # The frame due right now, based on when this run started
+        due = int((self.clock() - self._start_time) / period)
+        if due > self._ticks:
+            self.frames_dropped += due - self._ticks
+            metrics.count("playback.dropped", due - self._ticks)
+        tick = max(due, self._ticks)
+
+        frame_num = self._frame_for_tick(tick)
+        if frame_num is None:
+            # Reached the end without looping
+            self.current_frame = self.total_frames - 1
+            self.pause()
+            return
+
+        self.current_frame = frame_num
+        with metrics.span("playback.frame"):
+            self.on_frame(frame_num, self._get_rendered(frame_num))
+        self.frames_shown += 1
+        metrics.tick("playback")
+        self._ticks = tick + 1
+
+        self._render_upcoming(tick)
+
+        # Schedule the next frame against its absolute due time
+        delay = self._start_time + self._ticks * period - self.clock()
+        self._timer = self.scheduler.after(max(0, math.ceil(delay * 1000)), self._tick)
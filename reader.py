@@ -0,0 +1,154 @@
+import asyncio
+import queue
+import threading
+import time
+
+from designtool.colorconversion import codes_to_hex_grid
+from designtool.filesave import load_animation
+
+# Marks the end of the stream in the prefetch queue
+_END = object()
+
+
+def iter_frames(file_path, start=0, stop=None):
+    """
+    Yield the frames of a saved animation one timeline frame at a time.
+
+    Frames are decoded lazily from the memory-mapped file. Frames between
+    keyframes repeat the previous keyframe without decoding anything.
+
+    Args:
+        file_path (str): An animation file written by filesave.save_animation.
+        start (int): First timeline frame to yield.
+        stop (int): Timeline frame to stop before. Defaults to the end of the timeline.
+
+    Yields:
+        tuple: (frame number, x by y uint8 array of palette codes, or None
+        before the first keyframe).
+    """
+    animation = load_animation(file_path)
+    if stop is None:
+        stop = animation.total_frames
+
+    position = animation.position_of(start)
+    frame = None if position is None else animation.read(position)
+    next_position = 0 if position is None else position + 1
+
+    for frame_num in range(start, stop):
+        # Only decode when the timeline reaches the next keyframe
+        if next_position < len(animation) and animation.keyframe_numbers[next_position] <= frame_num:
+            frame = animation.read(next_position)
+            next_position += 1
+        yield frame_num, frame
+
+
+class PrefetchReader:
+    """
+    Read frames on a background thread, a few frames ahead of playback.
+
+    Only up to prefetch decoded frames are held at once, so memory stays
+    constant however long the animation is. Iterate it normally, or with
+    "async for" from an asyncio loop. Once the end is reached, every further
+    call stops again right away.
+
+    Args:
+        file_path (str): An animation file written by filesave.save_animation.
+        prefetch (int): How many frames to read ahead.
+        loop (bool): Start again from the first frame after the last one.
+        poll_interval (float): How often "async for" checks for the next
+            frame while the queue is empty, in seconds.
+    """
+
+    def __init__(self, file_path, prefetch=8, loop=False, poll_interval=0.002):
+        self.file_path = file_path
+        self.loop = loop
+        self.poll_interval = poll_interval
+        self.queue = queue.Queue(maxsize=prefetch)
+        self.ended = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        try:
+            while not self.stopped.is_set():
+                empty = True
+                for item in iter_frames(self.file_path):
+                    empty = False
+                    if not self._put(item):
+                        return
+                if not self.loop or empty:
+                    break
+        finally:
+            self._put(_END)
+
+    def _put(self, item):
+        # Block while the queue is full, but give up once the reader is closed
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.ended:
+            raise StopIteration
+        item = self.queue.get()
+        if item is _END:
+            self.ended = True
+            raise StopIteration
+        return item
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        # Poll rather than wait on another thread, so a cancelled call leaves
+        # nothing behind that could take the next frame
+        while not self.ended:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            if item is _END:
+                self.ended = True
+                break
+            return item
+        raise StopAsyncIteration
+
+
+async def stream_to_controller(controller, file_path, fps=30, prefetch=8, loop=False):
+    """
+    Play a saved animation on a controller, decoding each frame just before it is sent.
+
+    Sends are paced against a monotonic clock; frames are only sent when
+    they differ from the previous one.
+    """
+    period = 1 / fps
+    next_time = time.monotonic()
+    last_frame = None
+
+    with PrefetchReader(file_path, prefetch=prefetch, loop=loop) as reader:
+        async for frame_num, frame in reader:
+            if frame is not None and frame is not last_frame:
+                await controller.drawFrame(codes_to_hex_grid(frame))
+                last_frame = frame
+
+            next_time += period
+            await asyncio.sleep(max(0, next_time - time.monotonic()))
@@ -0,0 +1,229 @@
+"""
+A stand-in controller that records frames instead of lighting bulbs.
+
+It has the same async connect/drawFrame interface as LightsController, so
+either front end or any sending code can run against it with no hardware
+or display. Every frame is kept with the time it arrived, in memory or
+streamed to a compact log file, and the link to the controller can be
+slowed down to a given latency and bandwidth.
+
+Recordings can be summarized or rendered to PNG files:
+
+    python -m designtool.recorder stats run.lcfr
+    python -m designtool.recorder render run.lcfr frames/ --cell-size 16
+"""
+import argparse
+import asyncio
+import os
+import struct
+import time
+
+import numpy as np
+
+from designtool.sender import to_codes
+
+# Recording log layout, little endian:
+#   magic "LCFR", version, x/y dimensions
+# followed by one record per frame: arrival time (float64 seconds since
+# connect) and x * y bytes, one palette code per bulb, in grid[x][y] order.
+RECORDING_MAGIC = b"LCFR"
+RECORDING_VERSION = 1
+RECORDING_HEADER = struct.Struct("<4sHHH")
+
+
+def recording_dtype(shape):
+    return np.dtype([('time', '<f8'), ('frame', 'u1', shape)])
+
+
+class RecordingController:
+    """
+    Records every frame it is sent, with its arrival time.
+
+    Args:
+        path (str): Stream frames to this log file as they arrive. Without a
+            path, frames are kept in memory.
+        latency (float): Simulated one-way link delay per frame, in seconds.
+        bandwidth (float): Simulated link speed in bytes per second, or None
+            for unlimited. Frames share the link, so they queue behind each
+            other while they are transmitted; the latency of one overlaps
+            with the next.
+        bytes_per_cell (int): Bytes a cell takes on the link; drawFrame
+            sends 2-digit hex strings.
+        fail_connect (bool): Make connect() fail, to exercise reconnects.
+    """
+
+    def __init__(self, path=None, latency=0.0, bandwidth=None, bytes_per_cell=2, fail_connect=False):
+        self.path = path
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.bytes_per_cell = bytes_per_cell
+        self.fail_connect = fail_connect
+
+        self.shape = None
+        self.times = []
+        self.frames = []
+        self.frame_count = 0
+        self._file = None
+        self._start = None
+        self._link = None
+
+    async def connect(self, *args, **kwargs):
+        if self.fail_connect:
+            raise ConnectionError("Recording controller set to fail")
+        self._link = asyncio.Lock()
+        if self._start is None:
+            self._start = time.perf_counter()
+
+    async def drawFrame(self, grid):
+        if self._start is None:
+            raise ConnectionError("Not connected")
+        # Copy now: the caller may reuse the array while the frame is "in flight"
+        frame = np.array(to_codes(grid), dtype=np.uint8)
+
+        # Frames take turns on the link while they are transmitted, then travel
+        # for the latency side by side, so they still arrive in order
+        if self.bandwidth:
+            async with self._link:
+                await asyncio.sleep(frame.size * self.bytes_per_cell / self.bandwidth)
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        self._record(time.perf_counter() - self._start, frame)
+
+    def _record(self, arrived, frame):
+        if self.shape is None:
+            self.shape = frame.shape
+            if self.path is not None:
+                self._file = open(self.path, "wb")
+                self._file.write(RECORDING_HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION, *self.shape))
+        elif frame.shape != self.shape:
+            raise ValueError(f"Frame shape {frame.shape} does not match the recording's {self.shape}")
+
+        self.frame_count += 1
+        if self._file is not None:
+            record = np.empty(1, dtype=recording_dtype(self.shape))
+            record['time'] = arrived
+            record['frame'] = frame
+            self._file.write(record.tobytes())
+        else:
+            self.times.append(arrived)
+            self.frames.append(frame)
+
+    def recording(self):
+        """
+        Returns:
+            tuple: (times, frames) arrays of everything recorded so far.
+        """
+        if self.path is not None and self.shape is not None:
+            if self._file is not None:
+                self._file.flush()
+            return load_recording(self.path)
+        if not self.frames:
+            # Nothing recorded yet; a log file is only created with the first frame
+            return np.empty(0), np.empty((0, 0, 0), dtype=np.uint8)
+        return np.array(self.times), np.stack(self.frames)
+
+    def save(self, path):
+        # Write an in-memory recording out as a log file
+        times, frames = self.recording()
+        records = np.empty(len(times), dtype=recording_dtype(frames.shape[1:]))
+        records['time'] = times
+        records['frame'] = frames
+        with open(path, "wb") as file:
+            file.write(RECORDING_HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION, *frames.shape[1:]))
+            file.write(records.tobytes())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def load_recording(path):
+    """
+    Read a recording log, mapping the frames from disk.
+
+    Returns:
+        tuple: (times, frames), a float64 array of arrival times in seconds
+        and a (count, x, y) uint8 array of frames.
+    """
+    with open(path, "rb") as file:
+        magic, version, x, y = RECORDING_HEADER.unpack(file.read(RECORDING_HEADER.size))
+    if magic != RECORDING_MAGIC:
+        raise ValueError(f"{path} is not a recording")
+    if version != RECORDING_VERSION:
+        raise ValueError(f"Unsupported recording version {version}")
+
+    dtype = recording_dtype((x, y))
+    count = (os.path.getsize(path) - RECORDING_HEADER.size) // dtype.itemsize
+    if count == 0:
+        return np.empty(0), np.empty((0, x, y), dtype=np.uint8)
+    records = np.memmap(path, dtype=dtype, mode='r', offset=RECORDING_HEADER.size, shape=(count,))
+    return records['time'], records['frame']
+
+
+def cadence(times):
+    """
+    Summarize how steadily frames arrived.
+
+    Returns:
+        dict: Frame count, average frames per second and the p50/p95/max
+        interval between frames in milliseconds.
+    """
+    times = np.asarray(times)
+    if len(times) < 2:
+        return {"frames": len(times)}
+    intervals = np.diff(times) * 1000
+    p50, p95 = np.percentile(intervals, [50, 95])
+    return {
+        "frames": len(times),
+        "fps": float((len(times) - 1) / (times[-1] - times[0])) if times[-1] > times[0] else 0.0,
+        "interval_p50_ms": float(p50),
+        "interval_p95_ms": float(p95),
+        "interval_max_ms": float(intervals.max()),
+    }
+
+
+def render_png_sequence(frames, directory, cell_size=16, prefix="frame"):
+    """
+    Write frames out as numbered PNG files, drawn like the exporter draws them.
+
+    Returns:
+        list of str: The paths written.
+    """
+    # Rendering needs PIL, which recording itself does not
+    from PIL import Image
+
+    from designtool.exporter import bulb_tiles, render_frame
+
+    os.makedirs(directory, exist_ok=True)
+    tiles = bulb_tiles(cell_size)
+    digits = max(4, len(str(len(frames) - 1)))
+    paths = []
+    for i, frame in enumerate(frames):
+        path = os.path.join(directory, f"{prefix}{i:0{digits}d}.png")
+        Image.fromarray(render_frame(frame, tiles)).save(path)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect recordings made by RecordingController")
+    commands = parser.add_subparsers(dest="command", required=True)
+    stats = commands.add_parser("stats", help="Print the frame cadence of a recording")
+    stats.add_argument("recording")
+    render = commands.add_parser("render", help="Render a recording to PNG files")
+    render.add_argument("recording")
+    render.add_argument("directory")
+    render.add_argument("--cell-size", type=int, default=16)
+    args = parser.parse_args()
+
+    times, frames = load_recording(args.recording)
+    if args.command == "stats":
+        for key, value in cadence(times).items():
+            print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+    else:
+        print(f"Wrote {len(render_png_sequence(frames, args.directory, args.cell_size))} frames")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Whole-region grid operations: flood fill, rectangles, lines and moving,
+copying, mirroring or rotating a selection.
+
+Everything works on 2D NumPy arrays indexed [row][col], of any dtype
+(palette codes, color ids, ...), and returns a new array or a boolean
+mask, so the caller can diff the result against the grid and push every
+changed cell to the UI in one batch.
+
+Regions are given as half-open bounds (top, left, bottom, right).
+"""
+import numpy as np
+
+from designtool.stroke import line_cells
+
+
+def bounds_from_cells(start, end):
+    # Half-open bounds of the rectangle with two (row, col) cells as opposite corners
+    (row0, col0), (row1, col1) = start, end
+    return min(row0, row1), min(col0, col1), max(row0, row1) + 1, max(col0, col1) + 1
+
+
+def clip_bounds(bounds, shape):
+    top, left, bottom, right = bounds
+    return max(top, 0), max(left, 0), min(bottom, shape[0]), min(right, shape[1])
+
+
+def _row_runs(match):
+    """
+    Label every horizontal run of True cells.
+
+    Returns:
+        tuple: (labels, starts, stops, rows): labels is the run id of each
+        cell (-1 outside runs); the other arrays give each run's column
+        span [start, stop) and its row.
+    """
+    padded = np.zeros((match.shape[0], match.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = match
+    edges = np.diff(padded, axis=1)
+    run_rows, starts = np.nonzero(edges == 1)
+    _, stops = np.nonzero(edges == -1)
+
+    # np.nonzero scans row by row, so starts and stops pair up in order
+    labels = np.full(match.shape, -1, dtype=np.int64)
+    run_ids = np.cumsum(edges[:, :-1] == 1).reshape(match.shape) - 1
+    labels[match] = run_ids[match]
+    return labels, starts, stops, run_rows
+
+
+def flood_fill_mask(grid, row, col):
+    """
+    Scanline flood fill: the cells 4-connected to (row, col) that have the same value.
+
+    The grid is cut into horizontal runs of matching cells, and the fill
+    spreads from run to run, to the overlapping runs in the rows above and
+    below, so the work grows with the number of runs, not cells.
+
+    Returns:
+        numpy.ndarray: Boolean mask of the region.
+    """
+    grid = np.asarray(grid)
+    labels, starts, stops, run_rows = _row_runs(grid == grid[row, col])
+
+    seen = np.zeros(len(starts), dtype=bool)
+    pending = [labels[row, col]]
+    seen[pending[0]] = True
+    while pending:
+        run = pending.pop()
+        run_row, start, stop = run_rows[run], starts[run], stops[run]
+        for neighbour_row in (run_row - 1, run_row + 1):
+            if 0 <= neighbour_row < grid.shape[0]:
+                neighbours = np.unique(labels[neighbour_row, start:stop])
+                for neighbour in neighbours[neighbours >= 0]:
+                    if not seen[neighbour]:
+                        seen[neighbour] = True
+                        pending.append(neighbour)
+
+    return (labels >= 0) & seen[labels]
+
+
+def rect_mask(shape, bounds, filled=True):
+    # Mask of a rectangle, or of just its outline
+    mask = np.zeros(shape, dtype=bool)
+    top, left, bottom, right = clip_bounds(bounds, shape)
+    if top >= bottom or left >= right:
+        return mask
+    mask[top:bottom, left:right] = True
+    if not filled:
+        mask[top + 1:bottom - 1, left + 1:right - 1] = False
+    return mask
+
+
+def line_mask(shape, start, end):
+    # Mask of the cells on the line between two (row, col) cells
+    mask = np.zeros(shape, dtype=bool)
+    cells = np.array(line_cells(start, end))
+    inside = (cells[:, 0] >= 0) & (cells[:, 0] < shape[0]) & (cells[:, 1] >= 0) & (cells[:, 1] < shape[1])
+    mask[cells[inside, 0], cells[inside, 1]] = True
+    return mask
+
+
+def fill_mask(grid, mask, value):
+    # A copy of grid with every masked cell set to value
+    result = np.array(grid, copy=True)
+    result[mask] = value
+    return result
+
+
+def extract(grid, bounds):
+    # A copy of the cells inside bounds
+    top, left, bottom, right = clip_bounds(bounds, grid.shape)
+    return np.array(grid[top:bottom, left:right], copy=True)
+
+
+def paste(grid, block, top_left):
+    """
+    A copy of grid with block placed at top_left; whatever falls outside the grid is dropped.
+    """
+    result = np.array(grid, copy=True)
+    top, left = top_left
+    dest = clip_bounds((top, left, top + block.shape[0], left + block.shape[1]), grid.shape)
+    if dest[0] < dest[2] and dest[1] < dest[3]:
+        result[dest[0]:dest[2], dest[1]:dest[3]] = block[dest[0] - top:dest[2] - top, dest[1] - left:dest[3] - left]
+    return result
+
+
+def move(grid, bounds, offset, fill_value, copy=False):
+    """
+    Move (or copy) the cells inside bounds by offset (rows, cols).
+
+    The cells left behind by a move are set to fill_value.
+
+    Returns:
+        tuple: (new grid, bounds of the region at its new place).
+    """
+    top, left, bottom, right = clip_bounds(bounds, grid.shape)
+    block = extract(grid, (top, left, bottom, right))
+    result = grid if copy else fill_mask(grid, rect_mask(grid.shape, (top, left, bottom, right)), fill_value)
+    d_row, d_col = offset
+    moved = (top + d_row, left + d_col, bottom + d_row, right + d_col)
+    return paste(result, block, moved[:2]), moved
+
+
+def transform(grid, bounds, operation, fill_value):
+    """
+    Replace the cells inside bounds with operation(block), anchored at the
+    same top left corner. Used for mirroring and rotating a selection; when
+    the result has a different shape, uncovered cells are set to fill_value.
+
+    Returns:
+        tuple: (new grid, bounds of the transformed region).
+    """
+    top, left, bottom, right = clip_bounds(bounds, grid.shape)
+    block = operation(extract(grid, (top, left, bottom, right)))
+    result = fill_mask(grid, rect_mask(grid.shape, (top, left, bottom, right)), fill_value)
+    return paste(result, block, (top, left)), (top, left, top + block.shape[0], left + block.shape[1])
+
+
+def mirror(block):
+    # Left-right mirror image
+    return block[:, ::-1]
+
+
+def flip(block):
+    # Upside down
+    return block[::-1, :]
+
+
+def rotate(block):
+    # A quarter turn clockwise
+    return np.rot90(block, -1)
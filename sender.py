@@ -0,0 +1,305 @@
+import asyncio
+import queue
+import threading
+import time
+
+import numpy as np
+
+from designtool.colorconversion import HEX_STRINGS, codes_to_hex_grid, hex_grid_to_codes
+from designtool.metrics import metrics
+
+
+def to_codes(grid):
+    # Accept a uint8 code array or a list-of-lists of 2-digit hex strings
+    if isinstance(grid, np.ndarray) and grid.dtype == np.uint8:
+        return grid
+    return hex_grid_to_codes(grid)
+
+
+class FrameSender:
+    """
+    Send frames to controllers, transmitting only what changed.
+
+    The last frame sent to each controller is remembered. When a controller
+    has a drawCells(cells) method, taking a list of (x, y, hex) tuples, and
+    only a few cells changed, just those cells are sent. Otherwise the whole
+    grid goes through drawFrame as before, as hex strings, or as the code
+    array itself for controllers with a true takes_codes attribute. Frames
+    identical to the last one sent are skipped.
+
+    Args:
+        max_delta_fraction (float): Send a full frame once more than this
+            fraction of the cells changed, since the cell list would then be
+            bigger than the frame.
+    """
+
+    def __init__(self, max_delta_fraction=0.25):
+        self.max_delta_fraction = max_delta_fraction
+        self.last_frames = {}  # Controller -> last frame sent, in grid[x][y] order
+
+    def changed_cells(self, controller, frame):
+        """
+        Find the cells that differ from the last frame sent to a controller.
+
+        Returns:
+            numpy.ndarray: A (count, 2) array of (x, y) indices, or None if
+            there is no comparable previous frame.
+        """
+        last = self.last_frames.get(controller)
+        if last is None or last.shape != frame.shape:
+            return None
+        return np.argwhere(frame != last)
+
+    async def send(self, controller, grid, force=False):
+        """
+        Send a grid (grid[x][y] order) to a controller.
+
+        Args:
+            force (bool): Send the full frame even if nothing changed.
+
+        Returns:
+            int: Number of cells transmitted.
+        """
+        with metrics.span("send.diff"):
+            frame = to_codes(grid)
+            changed = None if force else self.changed_cells(controller, frame)
+
+        if changed is not None:
+            if len(changed) == 0:
+                metrics.count("send.unchanged")
+                return 0
+            if hasattr(controller, "drawCells") and len(changed) <= self.max_delta_fraction * frame.size:
+                xs, ys = changed[:, 0], changed[:, 1]
+                cells = list(zip(xs.tolist(), ys.tolist(), HEX_STRINGS[frame[xs, ys]].tolist()))
+                with metrics.span("send.drawCells"):
+                    await controller.drawCells(cells)
+                self.last_frames[controller] = frame.copy()
+                return len(cells)
+
+        if getattr(controller, "takes_codes", False):
+            grid = frame
+        else:
+            with metrics.span("send.hex"):
+                grid = codes_to_hex_grid(frame)
+        with metrics.span("send.drawFrame"):
+            await controller.drawFrame(grid)
+        self.last_frames[controller] = frame.copy()
+        return frame.size
+
+    def reset(self, controller=None):
+        # Forget what a controller (or every controller) is showing, e.g. after a reconnect
+        if controller is None:
+            self.last_frames.clear()
+        else:
+            self.last_frames.pop(controller, None)
+
+
+# Connection states of a ControllerWorker
+DISCONNECTED = "disconnected"
+CONNECTING = "connecting"
+CONNECTED = "connected"
+
+
+class ControllerWorker:
+    """
+    Own a controller on one long-lived asyncio loop running on a worker thread.
+
+    UI code hands frames over with submit(), which never blocks. Only one
+    frame waits at a time: if a new frame is submitted before the pending
+    one went out, the pending one is replaced, so a slow controller always
+    gets the newest frame instead of a backlog. Each finished send is
+    reported on the results queue as (frame id, cells sent, error) for the
+    UI thread to poll.
+
+    connect() starts connecting in the background and returns at once. The
+    worker keeps retrying, with growing delays, until the controller is
+    connected, and starts over when a send fails. Until then the newest
+    frame is held and sent as soon as the connection is up, or, with
+    queue_while_disconnected off, frames are dropped and reported as failed.
+    The current state is in status.
+
+    Args:
+        controller: A LightsController, or anything with the same async interface.
+        frame_sender (FrameSender): Used for the actual sends.
+        queue_while_disconnected (bool): Hold the newest frame while
+            disconnected instead of dropping it.
+    """
+
+    def __init__(self, controller, frame_sender=None, queue_while_disconnected=True):
+        self.controller = controller
+        self.frame_sender = frame_sender or FrameSender()
+        self.queue_while_disconnected = queue_while_disconnected
+        self.results = queue.Queue()
+
+        self.sent_count = 0
+        self.coalesced_count = 0  # Frames replaced by a newer one before they were sent
+        self.dropped_count = 0  # Frames dropped because the controller was not connected
+
+        self.status = DISCONNECTED
+        self.last_error = None  # Why the last connection attempt or send failed
+        self._managed = False  # Whether connect() looks after the connection
+        self._connect_task = None
+
+        self._lock = threading.Lock()
+        self._pending = None
+        self._next_id = 0
+
+        self.loop = asyncio.new_event_loop()
+        self._wakeup = None
+        self._lost = None
+        self._ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        self._ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self._wakeup = asyncio.Event()
+        self._lost = asyncio.Event()
+        self._send_task = self.loop.create_task(self._send_loop())
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+        self.loop.close()
+
+    def run_coroutine(self, coro):
+        """
+        Run a coroutine on the worker loop.
+
+        Returns:
+            concurrent.futures.Future: Its result.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def connect(self, *args, timeout=10.0, retry_delay=1.0, max_retry_delay=30.0, **kwargs):
+        """
+        Start connecting the controller in the background; returns immediately.
+
+        Extra arguments are passed on to controller.connect().
+
+        Args:
+            timeout (float): Give up on a connection attempt after this many seconds.
+            retry_delay (float): Wait before the first retry; doubled after
+                each failure up to max_retry_delay.
+        """
+        if self._managed:
+            return
+        self._managed = True
+        self.status = CONNECTING
+
+        def start():
+            self._connect_task = self.loop.create_task(
+                self._connect_loop(args, kwargs, timeout, retry_delay, max_retry_delay)
+            )
+        self.loop.call_soon_threadsafe(start)
+
+    @property
+    def connected(self):
+        return self.status == CONNECTED
+
+    @property
+    def _can_send(self):
+        # Sends go straight out when the connection is not managed by connect()
+        return self.status == CONNECTED or not self._managed
+
+    async def _connect_loop(self, args, kwargs, timeout, retry_delay, max_retry_delay):
+        delay = retry_delay
+        while True:
+            self.status = CONNECTING
+            try:
+                await asyncio.wait_for(self.controller.connect(*args, **kwargs), timeout)
+            except Exception as error:
+                self.status = DISCONNECTED
+                self.last_error = error
+                metrics.count("controller.connect_failed")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, max_retry_delay)
+                continue
+
+            delay = retry_delay
+            self._lost.clear()
+            # The controller shows nothing we know of after a (re)connect
+            self.frame_sender.reset(self.controller)
+            self.status = CONNECTED
+            self._wakeup.set()  # Send anything held while disconnected
+
+            await self._lost.wait()
+            self.status = DISCONNECTED
+            metrics.count("controller.disconnected")
+
+    def submit(self, grid, force=False):
+        """
+        Queue a grid (grid[x][y] order) to be sent. Safe to call from any thread.
+
+        Args:
+            force (bool): Send the whole frame even if the controller should
+                already be showing it, e.g. when the user asks for a send to
+                resync the lights. A forced frame that is replaced before it
+                went out passes the force on to the newer one.
+
+        Returns:
+            int: An id for the frame, reported back on the results queue.
+        """
+        with self._lock:
+            frame_id = self._next_id
+            self._next_id += 1
+            if not self._can_send and not self.queue_while_disconnected:
+                self.dropped_count += 1
+                metrics.count("send.dropped")
+                self.results.put((frame_id, 0, ConnectionError(f"Controller {self.status}")))
+                return frame_id
+            if self._pending is not None:
+                self.coalesced_count += 1
+                metrics.count("send.coalesced")
+                force = force or self._pending[3]
+            self._pending = (frame_id, grid, time.perf_counter(), force, False)
+        self.loop.call_soon_threadsafe(self._wakeup.set)
+        return frame_id
+
+    async def _send_loop(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            # Held frames are sent once the connection is up
+            if not self._can_send:
+                continue
+            with self._lock:
+                pending, self._pending = self._pending, None
+            if pending is None:
+                continue
+
+            frame_id, grid, submitted, force, retried = pending
+            metrics.record("send.queued", time.perf_counter() - submitted)
+            try:
+                cells = await self.frame_sender.send(self.controller, grid, force=force)
+                self.sent_count += 1
+                # Submit to done, as seen by the UI
+                metrics.record("send.total", time.perf_counter() - submitted)
+                metrics.tick("send")
+                self.results.put((frame_id, cells, None))
+            except Exception as error:
+                metrics.count("send.errors")
+                self.last_error = error
+                self.results.put((frame_id, 0, error))
+                if self._managed:
+                    self._connection_lost(pending if not retried else None)
+
+    def _connection_lost(self, failed):
+        # Reconnect, sending the failed frame again afterwards unless a newer one arrives
+        if failed is not None:
+            with self._lock:
+                if self._pending is None:
+                    self._pending = failed[:4] + (True,)
+        self.status = DISCONNECTED
+        self._lost.set()
+
+    def _shutdown(self):
+        # Let the tasks see their cancellation before the loop stops
+        self._send_task.cancel()
+        if self._connect_task is not None:
+            self._connect_task.cancel()
+        self.loop.call_soon(self.loop.stop)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self._shutdown)
+        self.thread.join()
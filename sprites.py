@@ -0,0 +1,111 @@
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image, ImageColor, ImageTk
+
+from designtool.colorconversion import PREVIEW_COLORS
+
+
+class SpriteAtlas:
+    """
+    Tinted circle sprites for every color the grid can show.
+
+    Sprites for the bulb palette are tinted once, in a single NumPy pass,
+    when the atlas is created; each is turned into a PhotoImage the first
+    time it is shown, so startup does not pay for colors not on screen.
+    Any other color (e.g. picked with the color
+    chooser) is tinted on demand and kept in a small LRU cache, so the
+    number of sprites stays bounded however many colors get picked.
+
+    Tk blanks an image once the last Python reference to it is gone, so the
+    atlas is the only owner of the sprites: the grid reports with show() and
+    hide() which colors its cells show, and those sprites are pinned until
+    no cell shows them. Only sprites that are off screen are evicted, so the
+    atlas holds at most max_extra_sprites of them besides those on screen.
+
+    Args:
+        base_circle (PIL.Image.Image): RGBA circle; its alpha channel is the shape.
+        max_extra_sprites (int): How many non-palette sprites to keep off screen.
+    """
+
+    def __init__(self, base_circle, max_extra_sprites=128):
+        self.alpha = np.asarray(base_circle.split()[3], dtype=np.float32) / 255
+        self.max_extra_sprites = max_extra_sprites
+
+        # Tint every palette color at once: color * alpha, like ImageOps.colorize from black
+        palette_colors = sorted(set(PREVIEW_COLORS.tolist()))
+        rgb = np.array([ImageColor.getrgb(color) for color in palette_colors], dtype=np.float32)
+        tinted = np.rint(self.alpha[None, :, :, None] * rgb[:, None, None, :]).astype(np.uint8)
+        self.palette_tints = dict(zip(palette_colors, tinted))
+        self.palette_sprites = {}  # Color -> sprite, for the palette colors shown so far
+
+        self.extra_sprites = OrderedDict()  # Color -> sprite no cell shows, least recently used first
+        self.pinned_sprites = {}  # Color -> [sprite, number of cells showing it]
+
+    def tints(self, rgb):
+        """
+        The sprites of a whole grid of colors at once, pixel for pixel what
+        sprite() gives for each color.
+
+        Args:
+            rgb (numpy.ndarray): A rows x cols x 3 array of RGB colors.
+
+        Returns:
+            numpy.ndarray: A (rows, height, cols, width, 3) uint8 array.
+        """
+        rgb = np.asarray(rgb, dtype=np.float32)
+        return np.rint(self.alpha[None, :, None, :, None] * rgb[:, None, :, None, :]).astype(np.uint8)
+
+    def _tint(self, color):
+        rgb = np.array(ImageColor.getrgb(color)[:3], dtype=np.float32)
+        return ImageTk.PhotoImage(Image.fromarray(np.rint(self.alpha[:, :, None] * rgb).astype(np.uint8)))
+
+    def sprite(self, color):
+        # Sprite for a color string, tinting and caching it if it is not in the palette
+        sprite = self.palette_sprites.get(color)
+        if sprite is not None:
+            return sprite
+
+        tint = self.palette_tints.get(color)
+        if tint is not None:
+            sprite = self.palette_sprites[color] = ImageTk.PhotoImage(Image.fromarray(tint))
+            return sprite
+
+        pinned = self.pinned_sprites.get(color)
+        if pinned is not None:
+            return pinned[0]
+
+        sprite = self.extra_sprites.get(color)
+        if sprite is not None:
+            self.extra_sprites.move_to_end(color)
+            return sprite
+
+        sprite = self.extra_sprites[color] = self._tint(color)
+        self._evict()
+        return sprite
+
+    def show(self, color):
+        # Sprite for a cell that starts showing color; it stays pinned until the cell hides it
+        sprite = self.sprite(color)
+        if color not in self.palette_tints:
+            pinned = self.pinned_sprites.get(color)
+            if pinned is None:
+                self.pinned_sprites[color] = [self.extra_sprites.pop(color), 1]
+            else:
+                pinned[1] += 1
+        return sprite
+
+    def hide(self, color):
+        # A cell stopped showing color; once no cell does, its sprite may be evicted
+        pinned = self.pinned_sprites.get(color)
+        if pinned is None:
+            return
+        pinned[1] -= 1
+        if pinned[1] == 0:
+            del self.pinned_sprites[color]
+            self.extra_sprites[color] = pinned[0]
+            self._evict()
+
+    def _evict(self):
+        while len(self.extra_sprites) > self.max_extra_sprites:
+            self.extra_sprites.popitem(last=False)
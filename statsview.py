@@ -0,0 +1,46 @@
+import tkinter as tk
+from tkinter import filedialog
+
+from designtool.metrics import metrics
+
+
+class StatsWindow(tk.Toplevel):
+    """
+    Live view of the pipeline metrics: latency percentiles, frame rates and
+    counters, refreshed while the window is open.
+
+    Args:
+        master: Parent widget.
+        refresh_ms (int): How often the figures are redrawn.
+    """
+
+    def __init__(self, master, refresh_ms=500):
+        super().__init__(master)
+        self.title("Pipeline Stats")
+        self.refresh_ms = refresh_ms
+
+        buttons = tk.Frame(self)
+        buttons.pack(fill=tk.X)
+        self.enabled_var = tk.BooleanVar(value=metrics.enabled)
+        tk.Checkbutton(buttons, text="Record", variable=self.enabled_var, command=self.toggle_recording).pack(side=tk.LEFT)
+        tk.Button(buttons, text="Reset", command=metrics.reset).pack(side=tk.LEFT, padx=5)
+        tk.Button(buttons, text="Export...", command=self.export).pack(side=tk.LEFT)
+
+        self.text = tk.Label(self, justify=tk.LEFT, anchor="nw", font=("Courier", 10))
+        self.text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        self.refresh()
+
+    def toggle_recording(self):
+        metrics.enabled = self.enabled_var.get()
+
+    def export(self):
+        file_path = filedialog.asksaveasfilename(parent=self, defaultextension=".json", filetypes=[("JSON", "*.json"), ("All files", "*.*")])
+        if file_path:
+            metrics.export(file_path)
+
+    def refresh(self):
+        if not self.winfo_exists():
+            return
+        self.text.config(text="\n".join(metrics.report()) if metrics.enabled else "Recording is off")
+        self.after(self.refresh_ms, self.refresh)
@@ -0,0 +1,117 @@
+def point_to_cell(x, y, cell_size, origin=(0, 0)):
+    """
+    Map a pointer position to the (row, col) cell under it, arithmetically.
+
+    The result may lie outside the grid; callers check the bounds.
+    """
+    return int((y - origin[1]) // cell_size), int((x - origin[0]) // cell_size)
+
+
+def line_cells(start, end):
+    """
+    Every cell on the line between two cells, Bresenham style, including both ends.
+
+    Args:
+        start (tuple): (row, col) of the first cell.
+        end (tuple): (row, col) of the last cell.
+
+    Returns:
+        list of tuple: (row, col) cells, in order from start to end.
+    """
+    row, col = start
+    end_row, end_col = end
+    d_row, d_col = abs(end_row - row), -abs(end_col - col)
+    step_row = 1 if row < end_row else -1
+    step_col = 1 if col < end_col else -1
+    error = d_row + d_col
+
+    cells = [(row, col)]
+    while (row, col) != (end_row, end_col):
+        doubled = 2 * error
+        if doubled >= d_col:
+            error += d_col
+            row += step_row
+        if doubled <= d_row:
+            error += d_row
+            col += step_col
+        cells.append((row, col))
+    return cells
+
+
+class Stroke:
+    """
+    Paint a drag gesture onto a grid.
+
+    Pointer positions are turned into cells arithmetically, and every cell
+    on the segment since the previous motion event is filled in, so fast
+    strokes never skip cells. Each segment is handed to apply_cells as one
+    batch of (row, col, color) tuples.
+
+    With a radius, like the original brush, the cell the pointer is at only
+    gets painted when the pointer is on its bulb rather than in the gap
+    between bulbs. Cells the stroke passes through between two events are
+    always painted.
+
+    Args:
+        apply_cells (callable): Takes a list of (row, col, color) tuples.
+        rows (int): Number of grid rows.
+        cols (int): Number of grid columns.
+        cell_size (int): Distance between neighbouring cells, in pixels.
+        origin (tuple): (x, y) position of the grid's top left corner.
+        radius (float): Radius of a bulb around its cell's center, or None
+            to paint wherever in the cell the pointer is.
+    """
+
+    def __init__(self, apply_cells, rows, cols, cell_size, origin=(0, 0), radius=None):
+        self.apply_cells = apply_cells
+        self.rows = rows
+        self.cols = cols
+        self.cell_size = cell_size
+        self.origin = origin
+        self.radius = radius
+
+        self.color = None
+        self.last_cell = None
+
+    @property
+    def active(self):
+        return self.color is not None
+
+    def _paint(self, cells):
+        cells = [
+            (row, col, self.color) for row, col in cells
+            if 0 <= row < self.rows and 0 <= col < self.cols
+        ]
+        if cells:
+            self.apply_cells(cells)
+
+    def _on_bulb(self, x, y, cell):
+        # Whether (x, y) is within radius of the cell's center
+        if self.radius is None:
+            return True
+        row, col = cell
+        dx = x - self.origin[0] - (col + 0.5) * self.cell_size
+        dy = y - self.origin[1] - (row + 0.5) * self.cell_size
+        return dx * dx + dy * dy <= self.radius * self.radius
+
+    def begin(self, x, y, color):
+        self.color = color
+        self.last_cell = point_to_cell(x, y, self.cell_size, self.origin)
+        if self._on_bulb(x, y, self.last_cell):
+            self._paint([self.last_cell])
+
+    def move(self, x, y):
+        if not self.active:
+            return
+        cell = point_to_cell(x, y, self.cell_size, self.origin)
+        if cell != self.last_cell:
+            # The first cell of the segment was dealt with by the previous event
+            cells = line_cells(self.last_cell, cell)[1:]
+            if not self._on_bulb(x, y, cell):
+                cells.pop()
+            self._paint(cells)
+            self.last_cell = cell
+
+    def end(self):
+        self.color = None
+        self.last_cell = None
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+
+from designtool.filesave import (
+    ANIMATION_HEADER, DELTA_FRAME, FULL_FRAME, decode_rle, encode_rle, is_animation_file, load_animation, save_animation,
+)
+
+
+def keyframes(count, shape=(7, 5), seed=0):
+    rng = np.random.default_rng(seed)
+    frames = {}
+    frame = np.full(shape, 0xFE, dtype=np.uint8)
+    for i in range(count):
+        frame = frame.copy()
+        frame[rng.integers(shape[0]), rng.integers(shape[1])] = rng.integers(0, 256)
+        frames[i * 3] = frame
+    return frames
+
+
+@pytest.mark.parametrize("values", [
+    [],
+    [7],
+    [1, 1, 1, 2, 2, 3],
+    [0xFE] * 70000 + [1] + [0xFE] * 131071,  # Runs longer than one count holds
+])
+def test_rle_round_trip(values):
+    values = np.array(values, dtype=np.uint8)
+    np.testing.assert_array_equal(decode_rle(encode_rle(values)), values)
+
+
+def test_rle_compresses_runs():
+    assert len(encode_rle(np.full(1000, 0xFE, dtype=np.uint8))) == 3
+
+
+def test_round_trip_with_deltas(tmp_path):
+    path = str(tmp_path / "show.lcfa")
+    frames = keyframes(40)
+    save_animation(frames, path, total_frames=200, key_interval=16)
+
+    assert is_animation_file(path)
+    animation = load_animation(path)
+    assert len(animation) == 40
+    assert animation.total_frames == 200
+    assert animation.shape == (7, 5)
+    kinds = animation.index['kind'].tolist()
+    assert kinds[0] == kinds[16] == kinds[32] == FULL_FRAME
+    assert kinds[1] == kinds[17] == DELTA_FRAME
+
+    # Out of order reads decode from the nearest full frame
+    for position in [39, 3, 17, 16, 0, 38]:
+        np.testing.assert_array_equal(animation.read(position), frames[position * 3])
+    decoded = animation.keyframes()
+    assert list(decoded) == list(frames)
+
+
+def test_frame_at_holds_the_previous_keyframe(tmp_path):
+    path = str(tmp_path / "show.lcfa")
+    frames = {5: np.zeros((2, 2), dtype=np.uint8), 9: np.ones((2, 2), dtype=np.uint8)}
+    save_animation(frames, path)
+
+    animation = load_animation(path)
+    assert animation.total_frames == 10
+    assert animation.frame_at(4) is None
+    np.testing.assert_array_equal(animation.frame_at(8), frames[5])
+    np.testing.assert_array_equal(animation.frame_at(100), frames[9])
+    assert not animation.frame_at(9).flags.writeable
+
+
+def test_frames_may_be_hex_strings(tmp_path):
+    path = str(tmp_path / "show.lcfa")
+    save_animation({0: [["00", "FE"], ["FF", "10"]]}, path)
+    np.testing.assert_array_equal(load_animation(path).read(0), [[0x00, 0xFE], [0xFF, 0x10]])
+
+
+def test_empty_animation(tmp_path):
+    path = str(tmp_path / "empty.lcfa")
+    save_animation({}, path)
+    animation = load_animation(path)
+    assert len(animation) == 0
+    assert animation.frame_at(0) is None
+
+
+@pytest.mark.parametrize("count", [0, 5])
+def test_settings_round_trip(tmp_path, count):
+    path = str(tmp_path / "show.lcfa")
+    settings = {"interpolation": "linear", "effects": [["wipe", 2, 4, 30, {"direction": "up"}]]}
+    save_animation(keyframes(count), path, settings=settings)
+    animation = load_animation(path)
+    assert animation.settings == settings
+    assert len(animation) == count
+
+
+def test_files_without_settings_have_none(tmp_path):
+    path = str(tmp_path / "show.lcfa")
+    save_animation(keyframes(3), path)
+    assert load_animation(path).settings == {}
+
+
+def test_mismatched_frame_sizes_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        save_animation({0: np.zeros((2, 2), np.uint8), 1: np.zeros((3, 2), np.uint8)}, str(tmp_path / "bad.lcfa"))
+
+
+def test_key_interval_must_be_positive(tmp_path):
+    with pytest.raises(ValueError):
+        save_animation(keyframes(2), str(tmp_path / "bad.lcfa"), key_interval=0)
+
+
+def test_damaged_key_interval_is_rejected(tmp_path):
+    path = str(tmp_path / "show.lcfa")
+    save_animation(keyframes(2), path)
+    with open(path, "r+b") as file:
+        header = list(ANIMATION_HEADER.unpack(file.read(ANIMATION_HEADER.size)))
+        header[-1] = 0
+        file.seek(0)
+        file.write(ANIMATION_HEADER.pack(*header))
+    with pytest.raises(ValueError):
+        load_animation(path)
@@ -0,0 +1,73 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from designtool.colorconversion import PALETTE, rgb_array_to_codes, rgb_to_code, rgb_to_hex
+
+
+def baseline_rgb_to_hex(color_code):
+    # The original nearest-color search, copied as it was, to check the array versions against
+    if isinstance(color_code, str):
+        color_code = tuple(int(color_code.lstrip('#')[i:i+2], 16) for i in (0, 2, 4))
+
+    if color_code == (0, 0, 0):  # "off"
+        return "FE"
+    if color_code == (255, 255, 255):  # "white"
+        return "FF"
+
+    data_points = {
+        0x00: (255, 0, 0), 0x07: (252, 136, 59), 0x10: (251, 250, 110),
+        0x17: (218, 240, 91), 0x20: (178, 240, 83), 0x27: (139, 243, 69),
+        0x30: (18, 245, 79), 0x37: (0, 247, 78), 0x40: (0, 255, 182),
+        0x47: (0, 255, 255), 0x50: (0, 196, 250), 0x57: (0, 174, 254),
+        0x60: (0, 137, 251), 0x67: (0, 117, 253), 0x70: (0, 64, 253),
+        0x77: (0, 1, 255), 0x80: (91, 0, 255), 0x87: (103, 0, 255),
+        0x90: (146, 0, 255), 0x97: (164, 0, 254), 0xA0: (190, 0, 254),
+        0xA7: (255, 0, 253), 0xB0: (255, 0, 191), 0xB7: (255, 80, 14),
+        0xC0: (250, 198, 85), 0xC7: (245, 237, 91), 0xD0: (203, 236, 83),
+        0xD7: (168, 239, 93), 0xE0: (106, 242, 95), 0xE7: (14, 245, 93),
+        0xF0: (0, 249, 85), 0xF7: (0, 242, 211), 0xFC: (0, 234, 243),
+        0xFD: (252, 181, 141), 0xFE: (0, 0, 0), 0xFF: (255, 255, 255),
+    }
+
+    closest_key = min(
+        data_points,
+        key=lambda k: sum((a - b) ** 2 for a, b in zip(data_points[k], color_code))
+    )
+    return f"{closest_key:02X}"
+
+
+def halfway_colors():
+    # Colors exactly halfway between two palette entries, where the search has to break a tie
+    colors = []
+    for first, second in itertools.combinations(PALETTE.values(), 2):
+        if all((a + b) % 2 == 0 for a, b in zip(first, second)):
+            colors.append(tuple((a + b) // 2 for a, b in zip(first, second)))
+    return colors
+
+
+def random_colors(count=2000, seed=0):
+    return [tuple(color) for color in np.random.default_rng(seed).integers(0, 256, (count, 3)).tolist()]
+
+
+@pytest.mark.parametrize("colors", [random_colors(), halfway_colors()], ids=["random", "halfway"])
+def test_matches_the_baseline_search(colors):
+    expected = [int(baseline_rgb_to_hex(color), 16) for color in colors]
+    assert [rgb_to_code(color) for color in colors] == expected
+    assert [rgb_to_hex(color) for color in colors] == [f"{code:02X}" for code in expected]
+    codes = rgb_array_to_codes(np.array(colors, dtype=np.uint8).reshape(1, -1, 3))
+    assert codes.reshape(-1).tolist() == expected
+
+
+def test_halfway_colors_include_real_ties():
+    def distances(color):
+        return sorted(sum((a - b) ** 2 for a, b in zip(rgb, color)) for rgb in PALETTE.values())
+
+    assert any(distances(color)[0] == distances(color)[1] for color in halfway_colors())
+
+
+def test_hex_strings_match_tuples():
+    for color in random_colors(200, seed=1):
+        text = "#%02x%02x%02x" % color
+        assert rgb_to_code(text) == int(baseline_rgb_to_hex(text), 16)
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from designtool.colorconversion import PREVIEW_RGB, rgb_to_code
+from designtool.effects import EFFECTS, EffectClip, EffectTrack, LazyFrames
+from designtool.filesave import load_animation, save_animation
+
+ROWS, COLS = 4, 6
+RED, BLUE = (255, 0, 0), (0, 0, 255)
+
+
+def wipe(start, length, **params):
+    return EffectClip("wipe", start, length, ROWS, COLS, start_color=RED, end_color=BLUE, **params)
+
+
+@pytest.mark.parametrize("effect", sorted(EFFECTS))
+def test_every_effect_gives_palette_codes(effect):
+    clip = EffectClip(effect, 0, 10, ROWS, COLS)
+    for _, frame in clip.frames():
+        assert frame.shape == (ROWS, COLS) and frame.dtype == np.uint8
+        assert np.all(frame < len(PREVIEW_RGB))
+
+
+def test_wipe_sweeps_across_the_clip():
+    clip = wipe(10, 5)
+    first, last = clip.frame(10), clip.frame(14)
+    np.testing.assert_array_equal(first[:, 0], rgb_to_code(BLUE))
+    np.testing.assert_array_equal(first[:, 1:], rgb_to_code(RED))
+    np.testing.assert_array_equal(last, np.full((ROWS, COLS), rgb_to_code(BLUE)))
+    assert 10 in clip and 14 in clip and 15 not in clip
+
+
+def test_frames_are_the_same_in_any_order():
+    clip = EffectClip("plasma", 0, 20, ROWS, COLS)
+    later = clip.frame(15).copy()
+    fresh = EffectClip("plasma", 0, 20, ROWS, COLS)
+    list(fresh.frames())
+    np.testing.assert_array_equal(fresh.frame(15), later)
+
+
+def test_added_clip_replaces_the_clips_it_overlaps():
+    track = EffectTrack()
+    track.add(wipe(0, 10))
+    track.add(wipe(20, 10))
+    track.add(wipe(30, 5))
+    track.add(wipe(8, 14))  # Overlaps the first two, not the third
+    assert [(clip.start, clip.stop) for clip in track] == [(8, 22), (30, 35)]
+    assert track.clip_at(7) is None
+    assert track.clip_at(8).start == 8 and track.clip_at(21).start == 8
+    assert track.clip_at(22) is None and track.clip_at(34).start == 30
+    assert track.stop == 35
+
+
+def test_adjacent_clips_both_stay():
+    track = EffectTrack()
+    track.add(wipe(0, 10))
+    track.add(wipe(10, 10))
+    assert len(track) == 2 and track.clip_at(9).start == 0 and track.clip_at(10).start == 10
+    covered, after = track.baked_frames(40)
+    assert covered == set(range(20)) and after == {20}
+
+
+def test_specs_rebuild_the_clips():
+    track = EffectTrack()
+    track.add(wipe(3, 4, direction="down"))
+    rebuilt = EffectTrack()
+    rebuilt.add_specs(track.specs(), ROWS, COLS)
+    assert rebuilt.specs() == track.specs()
+    np.testing.assert_array_equal(rebuilt.clip_at(5).frame(5), track.clip_at(5).frame(5))
+
+
+def shown(frame_num, track, keyframes):
+    # What the app shows at a frame: the clip covering it, else the last keyframe held
+    clip = track.clip_at(frame_num)
+    if clip is not None:
+        return clip.frame(frame_num)
+    previous = [key for key in keyframes if key <= frame_num]
+    return keyframes[max(previous)] if previous else np.full((ROWS, COLS), 0xFE, dtype=np.uint8)
+
+
+def test_saved_clip_ends_where_it_ends(tmp_path):
+    # Saved and loaded the way the editor does it, across the end of a clip
+    path = str(tmp_path / "show.lcfa")
+    total_frames = 30
+    keyframes = {0: np.full((ROWS, COLS), rgb_to_code(RED), dtype=np.uint8), 20: np.zeros((ROWS, COLS), dtype=np.uint8)}
+    track = EffectTrack()
+    track.add(wipe(5, 5))
+
+    covered, after = track.baked_frames(total_frames)
+    clip_ends = after - set(keyframes)
+    assert clip_ends == {10}
+    frames = LazyFrames(set(keyframes) | covered | clip_ends, lambda f: shown(f, track, keyframes).T)
+    save_animation(frames, path, total_frames=total_frames,
+                   settings={"effects": track.specs(), "clip_end_frames": sorted(clip_ends)})
+
+    animation = load_animation(path)
+    # A player that only holds the stored frames sees the keyframe again once the clip is over
+    for frame_num in range(total_frames):
+        np.testing.assert_array_equal(animation.frame_at(frame_num).T, shown(frame_num, track, keyframes))
+
+    # The editor gets back the clip and the real keyframes only
+    loaded = EffectTrack()
+    loaded.add_specs(animation.settings["effects"], ROWS, COLS)
+    ends = set(animation.settings["clip_end_frames"])
+    loaded_keyframes = {
+        frame_num: animation.read(position).T
+        for position, frame_num in enumerate(animation.keyframe_numbers.tolist())
+        if frame_num not in ends and loaded.clip_at(frame_num) is None
+    }
+    assert sorted(loaded_keyframes) == [0, 20]
+    for frame_num in range(total_frames):
+        np.testing.assert_array_equal(shown(frame_num, loaded, loaded_keyframes), shown(frame_num, track, keyframes))
@@ -0,0 +1,126 @@
+import os
+
+import numpy as np
+import pytest
+
+from designtool import exporter
+from designtool.colorconversion import PREVIEW_RGB
+from designtool.filesave import save_animation
+from designtool.recorder import render_png_sequence
+from designtool.tween import Tweener
+
+RED, BLUE, OFF = 0x00, 0x77, 0xFE
+SHAPE = (3, 2)  # grid[x][y]
+
+
+def solid(code):
+    return np.full(SHAPE, code, dtype=np.uint8)
+
+
+@pytest.fixture
+def animation(tmp_path):
+    path = str(tmp_path / "show.lcfa")
+    save_animation({2: solid(RED), 6: solid(BLUE)}, path, total_frames=10)
+    return path
+
+
+def test_render_frame_lays_tiles_out_row_by_row():
+    tiles = exporter.bulb_tiles(cell_size=4)
+    frame = solid(OFF)
+    frame[2, 1] = RED
+    image = exporter.render_frame(frame, tiles)
+    assert image.shape == (2 * 4, 3 * 4, 3)
+    np.testing.assert_array_equal(image[4:, 8:], tiles[RED])
+    np.testing.assert_array_equal(image[:4, :4], tiles[OFF])
+    assert tuple(image[6, 10]) == tuple(tiles[RED][2, 2]) and tiles[RED][2, 2, 0] > 0
+    assert tiles[OFF].max() <= PREVIEW_RGB[OFF].max()
+
+
+def test_held_keyframes_are_runs(animation):
+    total, runs = exporter.timeline_runs(animation)
+    runs = [(start, stop, int(frame[0, 0])) for start, stop, frame in runs]
+    assert total == 10
+    assert runs == [(0, 2, OFF), (2, 6, RED), (6, 10, BLUE)]
+
+
+def test_tweened_frames_are_baked_in(animation):
+    _, runs = exporter.timeline_runs(animation, tween="linear")
+    runs = list(runs)
+    assert [(start, stop) for start, stop, _ in runs] == [(0, 2), (2, 3), (3, 4), (4, 5), (5, 6), (6, 10)]
+    blended = [frame for start, _, frame in runs if 2 < start < 6]
+    assert all(frame.shape == SHAPE for frame in blended)
+    assert any(not np.array_equal(frame, solid(RED)) and not np.array_equal(frame, solid(BLUE)) for frame in blended)
+
+
+def test_saved_interpolation_mode_is_the_default(tmp_path):
+    path = str(tmp_path / "show.lcfa")
+    save_animation({2: solid(RED), 6: solid(BLUE)}, path, total_frames=10, settings={"interpolation": "linear"})
+    _, runs = exporter.timeline_runs(path)
+    assert len(list(runs)) == 6
+    _, runs = exporter.timeline_runs(path, tween="hold")
+    assert len(list(runs)) == 3
+
+
+def test_baked_effect_frames_are_not_blended(tmp_path):
+    # A two frame clip at 3-4 between keyframes at 0 and 8, ended by a stored frame at 5
+    path = str(tmp_path / "show.lcfa")
+    clip_frame, clip_end = solid(0x33), solid(0x44)
+    settings = {"interpolation": "linear", "effects": [["wipe", 3, 2, 30, {}]], "clip_end_frames": [5]}
+    frames = {0: solid(RED), 3: clip_frame, 4: clip_frame, 5: clip_end, 8: solid(BLUE)}
+    save_animation(frames, path, total_frames=10, settings=settings)
+
+    _, runs = exporter.timeline_runs(path)
+    runs = list(runs)
+    assert [(start, stop) for start, stop, _ in runs] == [
+        (0, 1), (1, 2), (2, 3), (3, 4), (4, 5), (5, 6), (6, 7), (7, 8), (8, 10),
+    ]
+    frames_at = {start: frame for start, _, frame in runs}
+    np.testing.assert_array_equal(frames_at[3], clip_frame)
+    np.testing.assert_array_equal(frames_at[5], clip_end)
+    # Elsewhere frames are blended between the real keyframes, across the clip
+    tweener = Tweener("linear")
+    tweener.set_keyframe(0, solid(RED))
+    tweener.set_keyframe(8, solid(BLUE))
+    for frame_num in (1, 2, 6, 7):
+        np.testing.assert_array_equal(frames_at[frame_num], tweener.frame(frame_num))
+
+
+@pytest.mark.parametrize("path, expected", [
+    ("out.gif", "gif"), ("out.MP4", "video"), ("out.rgb", "raw"), ("frames", "png"), ("frames/", "png"),
+])
+def test_output_format_from_path(path, expected):
+    assert exporter.output_format(path) == expected
+
+
+def test_unknown_extension_needs_a_format(tmp_path):
+    with pytest.raises(ValueError):
+        exporter.output_format(str(tmp_path / "out.png"))
+    assert exporter.output_format(str(tmp_path / "out.png"), "png") == "png"
+    os.makedirs(tmp_path / "frames.v2")
+    assert exporter.output_format(str(tmp_path / "frames.v2")) == "png"
+    with pytest.raises(ValueError):
+        exporter.output_format("out", "tiff")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_export_png_sequence(animation, tmp_path, workers):
+    output = str(tmp_path / "frames")
+    result = exporter.export(animation, output, cell_size=4, workers=workers)
+    assert result == {"format": "png", "frames": 10, "rendered": 3, "size": (12, 8)}
+    assert len(os.listdir(output)) == 10
+
+
+def test_export_raw_video_with_tweens(animation, tmp_path):
+    output = str(tmp_path / "show.rgb")
+    result = exporter.export(animation, output, cell_size=4, workers=1, tween="ease")
+    assert result["rendered"] == 6
+    assert os.path.getsize(output) == 10 * 8 * 12 * 3
+
+
+def test_recorder_renders_with_the_exporter_tiles(tmp_path):
+    from PIL import Image
+
+    paths = render_png_sequence(np.stack([solid(RED), solid(BLUE)]), str(tmp_path), cell_size=4)
+    assert len(paths) == 2
+    image = np.asarray(Image.open(paths[0]).convert("RGB"))
+    np.testing.assert_array_equal(image, exporter.render_frame(solid(RED), exporter.bulb_tiles(4)))
@@ -0,0 +1,46 @@
+import numpy as np
+
+from designtool.colorconversion import codes_to_hex_grid
+from designtool.filesave import load_lcf, save_frames_to_binary, save_grid_to_file
+
+
+def design(shape=(6, 5)):
+    frame = np.full(shape, 0xFE, dtype=np.uint8)
+    frame[2:4, 1:3] = [[0x00, 0x10], [0x20, 0xFF]]
+    return frame
+
+
+def test_binary_round_trip_is_cropped_with_origin(tmp_path):
+    path = str(tmp_path / "design.lcfb")
+    frames = [design(), np.roll(design(), 1, axis=0)]
+    save_frames_to_binary(frames, path)
+
+    lcf = load_lcf(path)
+    assert lcf.version == 2
+    assert len(lcf) == 2
+    assert lcf.origin == (2, 1)
+    assert lcf.frames.shape == (2, 3, 2)
+    for i, frame in enumerate(frames):
+        restored = np.full(frame.shape, 0xFE, dtype=np.uint8)
+        restored[2:5, 1:3] = lcf.frame(i)
+        np.testing.assert_array_equal(restored, frame)
+
+
+def test_binary_all_off_frames(tmp_path):
+    path = str(tmp_path / "empty.lcfb")
+    save_frames_to_binary([np.full((4, 4), 0xFE, dtype=np.uint8)], path)
+
+    lcf = load_lcf(path)
+    assert len(lcf) == 1
+    assert lcf.frames.shape == (1, 0, 0)
+
+
+def test_text_file_loads_as_version_1(tmp_path):
+    path = str(tmp_path / "design.lcf")
+    save_grid_to_file(codes_to_hex_grid(design()), path)
+
+    lcf = load_lcf(path)
+    assert lcf.version == 1
+    assert lcf.origin == (0, 0)
+    np.testing.assert_array_equal(lcf.frame(0), design()[2:4, 1:3])
+    assert lcf.hex_grid() == [["00", "10"], ["20", "FF"]]
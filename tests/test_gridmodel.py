@@ -0,0 +1,50 @@
+import numpy as np
+
+from designtool import gridmodel
+from designtool.gridmodel import GridModel
+
+
+def test_set_values_writes_only_changed_cells():
+    model = GridModel(3, 4, fill="#1a1a1a", keep_rgb=True)
+    changed = []
+    model.listeners.append(lambda rows, cols: changed.append(list(zip(rows.tolist(), cols.tolist()))))
+
+    values = model.values()
+    values[1, 2] = model.value_of("#123456")
+    assert model.set_values(values) == [(1, 2, "#1a1a1a", "#123456")]
+    assert changed == [[(1, 2)]]
+    assert model.set_values(values) == []
+
+
+def test_set_codes_replaces_picked_colors_with_the_same_code():
+    model = GridModel(2, 2, keep_rgb=True)
+    model.set_cells([(0, 0, "#fe0102")])
+    code = int(model.codes[0, 0])
+    changes = model.set_codes(np.full((2, 2), code, dtype=np.uint8))
+    assert (0, 0) in [(row, col) for row, col, _, _ in changes]
+    assert np.all(model.codes == code)
+
+
+def test_code_only_model():
+    model = GridModel(2, 3)
+    assert model.set_codes(np.zeros((2, 3), dtype=np.uint8))
+    assert model.set_codes(np.zeros((2, 3), dtype=np.uint8)) == []
+    assert model.color(0, 0) == model.color(1, 2)
+
+
+def test_color_caches_are_bounded():
+    model = GridModel(1, 1, keep_rgb=True)
+    for value in range(gridmodel._COLOR_CACHE_SIZE + 10):
+        model.value_of(f"#{value:06x}")
+    assert gridmodel._resolve.cache_info().currsize <= gridmodel._COLOR_CACHE_SIZE
+
+
+def test_preview_rgb_is_what_the_cells_show():
+    for keep_rgb in (False, True):
+        model = GridModel(2, 3, keep_rgb=keep_rgb)
+        model.set_cells([(1, 2, "#fe0102")])
+        rgb = model.preview_rgb()
+        assert rgb.shape == (2, 3, 3) and rgb.dtype == np.uint8
+        for row in range(2):
+            for col in range(3):
+                assert "#%02x%02x%02x" % tuple(rgb[row, col].tolist()) == model.color(row, col)
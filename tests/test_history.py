@@ -0,0 +1,171 @@
+import pytest
+
+from designtool.history import CellEdit, EditHistory
+
+OFF, RED, BLUE = "#1a1a1a", "#ff0000", "#0000ff"
+ROWS, COLS = 3, 4
+
+
+class Design:
+    # A grid and keyframes that the history edits, like the design tool's own
+    def __init__(self, max_bytes=8 * 1024 * 1024):
+        self.grid = [[OFF] * COLS for _ in range(ROWS)]
+        self.keyframes = {}
+        self.history = EditHistory(self.set_cells, self.set_keyframe, self.keyframes.get, ROWS, COLS, OFF, max_bytes)
+
+    def set_cells(self, cells):
+        changes = []
+        for row, col, color in cells:
+            if self.grid[row][col] != color:
+                changes.append((row, col, self.grid[row][col], color))
+                self.grid[row][col] = color
+        return changes
+
+    def set_keyframe(self, frame_num, color_grid):
+        if color_grid is None:
+            self.keyframes.pop(frame_num, None)
+        else:
+            self.keyframes[frame_num] = color_grid
+
+    def paint(self, cells, kind="paint"):
+        self.history.record_cells(kind, self.set_cells(cells))
+
+    def store_keyframe(self, frame_num, color_grid):
+        self.history.record_keyframe(frame_num, self.keyframes.get(frame_num), color_grid)
+        self.set_keyframe(frame_num, color_grid)
+
+
+def solid(color):
+    return [[color] * COLS for _ in range(ROWS)]
+
+
+def test_undo_and_redo_cells():
+    design = Design()
+    design.paint([(0, 0, RED), (1, 2, BLUE)])
+    design.paint([(0, 0, BLUE)])
+
+    assert design.history.undo().kind == "paint"
+    assert design.grid[0][0] == RED and design.grid[1][2] == BLUE
+    design.history.undo()
+    assert design.grid == solid(OFF)
+    assert design.history.undo() is None
+
+    design.history.redo()
+    design.history.redo()
+    assert design.grid[0][0] == BLUE and design.grid[1][2] == BLUE
+    assert design.history.redo() is None
+
+
+def test_group_is_one_entry_and_keeps_first_and_last_colors():
+    design = Design()
+    design.history.begin_group("stroke")
+    design.paint([(0, 0, RED)])
+    design.paint([(0, 0, BLUE), (0, 1, RED)])
+    design.paint([(0, 1, OFF)])  # Back where it started, so not recorded
+    design.history.end_group()
+
+    assert len(design.history.undo_stack) == 1
+    entry = design.history.undo_stack[0]
+    assert entry.cells_for(entry.before) == [(0, 0, OFF)]
+    assert entry.cells_for(entry.after) == [(0, 0, BLUE)]
+
+    design.history.undo()
+    assert design.grid == solid(OFF)
+
+
+def test_new_edit_clears_redo():
+    design = Design()
+    design.paint([(0, 0, RED)])
+    design.history.undo()
+    design.paint([(1, 1, BLUE)])
+    assert design.history.redo() is None
+    assert design.grid[0][0] == OFF
+
+
+def test_keyframe_add_overwrite_and_remove():
+    design = Design()
+    first = solid(OFF)
+    first[0][0] = RED
+    second = [list(colors) for colors in first]
+    second[2][3] = BLUE
+
+    design.store_keyframe(5, first)
+    design.store_keyframe(5, second)
+    design.history.record_keyframe(5, second, None)
+    design.set_keyframe(5, None)
+
+    design.history.undo()
+    assert design.keyframes[5] == second
+    design.history.undo()
+    assert design.keyframes[5] == first
+    design.history.undo()
+    assert 5 not in design.keyframes
+
+    design.history.redo()
+    assert design.keyframes[5] == first
+    design.history.redo()
+    assert design.keyframes[5] == second
+    design.history.redo()
+    assert 5 not in design.keyframes
+
+
+def test_keyframe_overwrite_stores_only_changed_cells():
+    design = Design()
+    base = solid(RED)
+    changed = [list(colors) for colors in base]
+    changed[1][1] = BLUE
+    design.store_keyframe(0, base)
+    design.store_keyframe(0, changed)
+
+    overwrite = design.history.undo_stack[-1]
+    assert len(overwrite.cells) == 1
+    assert overwrite.nbytes < design.history.undo_stack[0].nbytes
+
+
+def test_keyframe_overwrite_with_same_contents_is_not_recorded():
+    design = Design()
+    design.store_keyframe(0, solid(RED))
+    design.store_keyframe(0, solid(RED))
+    assert len(design.history.undo_stack) == 1
+
+
+def test_nbytes_counts_the_stored_arrays():
+    edit = CellEdit("paint", [(0, 0, OFF, RED), (2, 3, OFF, BLUE)])
+    edit.close()
+    # Row, column, before and after: four bytes each per cell
+    assert edit.nbytes == 2 * 4 * 4
+
+
+def test_oldest_entries_are_dropped_over_budget():
+    design = Design(max_bytes=40)
+    for col in range(COLS):
+        design.paint([(0, col, RED)])  # 16 bytes each
+
+    assert len(design.history.undo_stack) == 2
+    assert design.history.size == 32
+    design.history.undo()
+    design.history.undo()
+    assert design.history.undo() is None
+    assert design.grid[0] == [RED, RED, OFF, OFF]
+
+
+def test_clear_forgets_everything():
+    design = Design()
+    design.paint([(0, 0, RED)])
+    design.history.undo()
+    design.history.begin_group("stroke")
+    design.paint([(1, 1, RED)])
+    design.history.clear()
+
+    assert design.history.size == 0
+    assert design.history.undo() is None
+    assert design.history.redo() is None
+
+
+@pytest.mark.parametrize("color", ["#000000", "#ffffff", "#0a0b0c"])
+def test_colors_round_trip(color):
+    design = Design()
+    design.paint([(0, 0, color)])
+    design.paint([(0, 0, RED)])
+    design.history.undo()
+    assert design.grid[0][0] == color
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from designtool.colorconversion import PALETTE_CODES
+from designtool.imageimport import import_frames
+
+ROWS, COLS = 4, 6
+
+
+@pytest.fixture
+def gif(tmp_path):
+    # Three frames of noise, larger than the grid so they get downscaled
+    rng = np.random.default_rng(0)
+    frames = [Image.fromarray(rng.integers(0, 256, (20, 30, 3), dtype=np.uint8)) for _ in range(3)]
+    path = str(tmp_path / "noise.gif")
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=100, loop=0)
+    return path
+
+
+@pytest.mark.parametrize("dither", [False, True])
+def test_gif_frames_become_palette_grids(gif, dither):
+    frames = list(import_frames(gif, ROWS, COLS, dither=dither))
+    assert len(frames) == 3
+    for frame in frames:
+        assert frame.shape == (ROWS, COLS) and frame.dtype == np.uint8
+        assert np.isin(frame, PALETTE_CODES).all()
+
+
+def test_directory_is_read_in_name_order(tmp_path):
+    for name, color in (("b.png", (0, 0, 255)), ("a.png", (255, 0, 0))):
+        Image.new("RGB", (8, 8), color).save(tmp_path / name)
+    red, blue = import_frames(str(tmp_path), ROWS, COLS)
+    assert len(np.unique(red)) == 1 and len(np.unique(blue)) == 1
+    assert red[0, 0] != blue[0, 0]
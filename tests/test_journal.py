@@ -0,0 +1,136 @@
+import os
+import time
+
+import numpy as np
+
+from designtool.journal import (
+    CELLS, JOURNAL_HEADER, Journal, JournalState, RECORD_HEADER, read_records, recover, recover_in_background,
+)
+
+SHAPE = (3, 4)
+
+
+def write_journal(path, edits, **kwargs):
+    journal = Journal(str(path), SHAPE, interval=0, **kwargs)
+    journal.start()
+    edits(journal)
+    journal.close()
+    return journal
+
+
+def grid(value):
+    return np.full(SHAPE, value, dtype=np.uint32)
+
+
+def test_edits_are_recovered(tmp_path):
+    path = tmp_path / "autosave.lcfj"
+
+    def edits(journal):
+        journal.cells(np.array([0, 2]), np.array([1, 3]), np.array([7, 9]))
+        journal.cells(np.array([0]), np.array([1]), np.array([8]))  # Same cell again: last value wins
+        journal.keyframe(5, grid(3))
+        journal.keyframe(6, grid(4))
+        journal.keyframes({7: grid(5), 8: grid(6)})
+        journal.remove_keyframe(8)
+        journal.remove_keyframe(6)
+        journal.settings(total_frames=120)
+        journal.settings(interpolation="linear")
+
+    write_journal(path, edits)
+    state = recover(str(path), SHAPE)
+    assert state.grid[0, 1] == 8 and state.grid[2, 3] == 9
+    assert sorted(state.keyframes) == [5, 7]
+    np.testing.assert_array_equal(state.keyframes[7], grid(5))
+    np.testing.assert_array_equal(state.keyframes[5], grid(3))
+    assert state.settings == {"total_frames": 120, "interpolation": "linear"}
+
+
+def test_truncated_record_keeps_what_came_before(tmp_path):
+    path = tmp_path / "autosave.lcfj"
+
+    def edits(journal):
+        journal.grid(grid(1))
+        journal.close()  # Written on its own, before the record that gets cut short
+        journal.start(JournalState(SHAPE, grid(1)))
+        journal.keyframe(2, grid(5))
+
+    write_journal(path, edits)
+    size = os.path.getsize(path)
+    with open(path, "r+b") as file:
+        file.truncate(size - 3)  # A crash in the middle of the last write
+
+    _, records = read_records(str(path))
+    assert records
+    state = recover(str(path), SHAPE)
+    np.testing.assert_array_equal(state.grid, grid(1))
+    assert state.keyframes == {}
+
+
+def test_damaged_record_ends_recovery(tmp_path):
+    path = tmp_path / "autosave.lcfj"
+    write_journal(path, lambda journal: journal.grid(grid(1)))
+    with open(path, "ab") as file:
+        file.write(RECORD_HEADER.pack(CELLS, 3) + b"bad")  # Not a whole cell
+        file.write(RECORD_HEADER.pack(CELLS, 0))
+    state = recover(str(path), SHAPE)
+    np.testing.assert_array_equal(state.grid, grid(1))
+
+
+def test_unusable_journals_are_not_recovered(tmp_path):
+    assert recover(str(tmp_path / "missing.lcfj")) is None
+    path = tmp_path / "other.lcfj"
+    write_journal(path, lambda journal: None)
+    assert recover(str(path), (5, 5)) is None
+    path.write_bytes(b"nope" + bytes(JOURNAL_HEADER.size))
+    assert recover(str(path)) is None
+
+
+def test_compaction_keeps_the_state(tmp_path):
+    path = tmp_path / "autosave.lcfj"
+
+    def edits(journal):
+        for value in range(20):
+            journal.keyframe(value, grid(value))
+
+    journal = write_journal(path, edits, compact_bytes=1)
+    assert journal.snapshots >= 2
+    state = recover(str(path), SHAPE)
+    assert sorted(state.keyframes) == list(range(20))
+    np.testing.assert_array_equal(state.keyframes[19], grid(19))
+
+
+def test_compaction_after_a_while_of_small_edits(tmp_path):
+    path = tmp_path / "autosave.lcfj"
+
+    def edits(journal):
+        journal.cells(np.array([0]), np.array([0]), np.array([1]))
+        time.sleep(0.05)
+        journal.cells(np.array([1]), np.array([1]), np.array([2]))
+
+    journal = write_journal(path, edits, compact_bytes=1 << 30, compact_seconds=0)
+    assert journal.snapshots >= 2
+    assert recover(str(path), SHAPE).grid[1, 1] == 2
+
+
+def test_recovery_in_the_background(tmp_path):
+    path = tmp_path / "autosave.lcfj"
+    write_journal(path, lambda journal: journal.keyframe(4, grid(2)))
+    state = recover_in_background(str(path), SHAPE).result(timeout=5)
+    assert list(state.keyframes) == [4]
+    assert recover_in_background(str(tmp_path / "missing.lcfj")).result(timeout=5) is None
+
+
+def test_writer_survives_errors_and_keeps_draining(tmp_path):
+    path = tmp_path / "autosave.lcfj"
+
+    def edits(journal):
+        journal.cells(np.array([0]), np.array([0]), "not values")  # Fails to encode
+        deadline = time.monotonic() + 5
+        while journal.error is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert journal.error is not None
+        journal.cells(np.array([1]), np.array([1]), np.array([6]))
+
+    journal = write_journal(path, edits)
+    assert journal.error is None
+    assert recover(str(path), SHAPE).grid[1, 1] == 6
@@ -0,0 +1,67 @@
+import bisect
+import random
+
+import pytest
+
+from designtool.keyframes import KeyframeIndex
+
+
+def test_empty_index():
+    index = KeyframeIndex()
+    assert len(index) == 0
+    assert list(index) == []
+    assert 3 not in index
+    assert index.previous(3) is None
+    assert index.next(3) is None
+    assert index.between(0, 10) == []
+    index.remove(3)
+
+
+def test_lookups():
+    index = KeyframeIndex([30, 10, 20, 10])
+    assert list(index) == [10, 20, 30]
+    assert index.previous(9) is None
+    assert index.previous(10) == 10
+    assert index.previous(29) == 20
+    assert index.previous(1000) == 30
+    assert index.next(9) == 10
+    assert index.next(10) == 20
+    assert index.next(30) is None
+    assert index.between(10, 30) == [10, 20]
+    assert index.between(11, 11) == []
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 512])
+def test_matches_a_sorted_list_under_random_edits(chunk_size):
+    rng = random.Random(chunk_size)
+    index = KeyframeIndex(rng.sample(range(500), 50), chunk_size=chunk_size)
+    expected = sorted(index)
+    for _ in range(3000):
+        frame_num = rng.randrange(-5, 505)
+        if rng.random() < 0.55:
+            index.add(frame_num)
+            if frame_num not in expected:
+                bisect.insort(expected, frame_num)
+        else:
+            index.remove(frame_num)
+            if frame_num in expected:
+                expected.remove(frame_num)
+
+        probe = rng.randrange(-10, 510)
+        i = bisect.bisect_right(expected, probe)
+        assert index.previous(probe) == (expected[i - 1] if i else None)
+        assert index.next(probe) == (expected[i] if i < len(expected) else None)
+        assert (probe in index) == (probe in expected)
+        stop = probe + rng.randrange(0, 100)
+        assert index.between(probe, stop) == [n for n in expected if probe <= n < stop]
+    assert list(index) == expected
+    assert len(index) == len(expected)
+    assert all(0 < len(chunk) < 2 * chunk_size for chunk in index.chunks)
+
+
+def test_clear():
+    index = KeyframeIndex(range(2000))
+    index.clear()
+    assert len(index) == 0
+    index.add(5)
+    assert list(index) == [5]
@@ -0,0 +1,71 @@
+import json
+import threading
+
+import pytest
+
+from designtool import statsview
+from designtool.metrics import Metrics
+
+
+def test_spans_are_aggregated_over_the_window():
+    metrics = Metrics(enabled=True, window=4)
+    for ms in (1, 2, 3, 4, 100, 5):
+        metrics.record("send", ms / 1000)
+    stats = metrics.summary()["spans"]["send"]
+    assert stats["count"] == 6  # Counted in total, but only the last 4 are kept
+    assert stats["max_ms"] == pytest.approx(100)
+    assert stats["mean_ms"] == pytest.approx((3 + 4 + 100 + 5) / 4)
+    assert stats["p50_ms"] == pytest.approx(4.5)
+
+
+def test_span_times_its_block():
+    metrics = Metrics(enabled=True)
+    with metrics.span("quantize"):
+        pass
+    with metrics.span("quantize"):
+        pass
+    stats = metrics.summary()["spans"]["quantize"]
+    assert stats["count"] == 2 and stats["max_ms"] >= 0
+
+
+def test_nothing_is_recorded_while_disabled():
+    metrics = Metrics()
+    with metrics.span("send"):
+        pass
+    metrics.record("send", 1.0)
+    metrics.count("dropped")
+    metrics.tick("shown")
+    assert metrics.summary() == {"spans": {}, "counters": {}, "fps": {}}
+    assert metrics.report() == ["No samples yet"]
+
+
+def test_counters_from_several_threads():
+    metrics = Metrics(enabled=True)
+
+    def count():
+        for _ in range(1000):
+            metrics.count("dropped")
+
+    threads = [threading.Thread(target=count) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert metrics.summary()["counters"] == {"dropped": 4000}
+
+
+def test_stats_window_exports_the_summary_and_samples(tmp_path, monkeypatch):
+    metrics = Metrics(enabled=True)
+    metrics.record("send", 0.002)
+    metrics.record("send", 0.004)
+    metrics.count("dropped", 3)
+    path = tmp_path / "stats.json"
+    monkeypatch.setattr(statsview, "metrics", metrics)
+    monkeypatch.setattr(statsview.filedialog, "asksaveasfilename", lambda **kwargs: str(path))
+
+    statsview.StatsWindow.export(None)  # Only the dialog is needed, not a window
+    exported = json.loads(path.read_text())
+    assert exported["counters"] == {"dropped": 3}
+    assert exported["spans"]["send"]["count"] == 2
+    assert exported["samples_ms"]["send"] == pytest.approx([2, 4])
+    assert "timestamp" in exported
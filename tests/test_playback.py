@@ -0,0 +1,74 @@
+from designtool.playback import Player
+
+
+class FakeScheduler:
+    # Runs after() callbacks by hand, against a fake clock
+    def __init__(self):
+        self.now = 0.0
+        self.pending = []
+
+    def clock(self):
+        return self.now
+
+    def after(self, ms, callback):
+        self.pending.append(callback)
+        return len(self.pending)
+
+    def after_cancel(self, timer):
+        self.pending.clear()
+
+    def run(self, step):
+        while self.pending:
+            self.now += step
+            self.pending.pop(0)()
+
+
+def make_player(scheduler, total_frames=5, **kwargs):
+    shown, stops = [], []
+    player = Player(
+        scheduler, lambda frame_num: frame_num * 10, lambda frame_num, rendered: shown.append((frame_num, rendered)),
+        total_frames, fps=10, clock=scheduler.clock, on_stop=lambda: stops.append(True), **kwargs
+    )
+    return player, shown, stops
+
+
+def test_plays_to_the_end_and_reports_the_stop():
+    scheduler = FakeScheduler()
+    player, shown, stops = make_player(scheduler, loop=False)
+    player.play()
+    scheduler.run(0.1)
+    assert shown == [(n, n * 10) for n in range(5)]
+    assert not player.playing
+    assert stops == [True]
+    assert player.current_frame == 4
+
+
+def test_late_ticks_drop_frames_instead_of_drifting():
+    scheduler = FakeScheduler()
+    player, shown, _ = make_player(scheduler, total_frames=100, loop=False)
+    player.play()
+    scheduler.run(0.25)
+    frame_nums = [frame_num for frame_num, _ in shown]
+    assert frame_nums == sorted(set(frame_nums))
+    assert player.frames_dropped > 0
+    assert len(shown) + player.frames_dropped >= 99
+
+
+def test_pause_reports_the_stop_once():
+    scheduler = FakeScheduler()
+    player, _, stops = make_player(scheduler)
+    player.play()
+    player.pause()
+    player.pause()
+    assert stops == [True]
+
+
+def test_looping_wraps_around():
+    scheduler = FakeScheduler()
+    player, shown, _ = make_player(scheduler, total_frames=3, loop=True)
+    player.play()
+    for _ in range(6):
+        scheduler.now += 0.1
+        scheduler.pending.pop(0)()
+    player.pause()
+    assert [frame_num for frame_num, _ in shown] == [0, 1, 2, 0, 1, 2, 0]
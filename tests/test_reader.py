@@ -0,0 +1,47 @@
+import asyncio
+
+import numpy as np
+
+from designtool.filesave import save_animation
+from designtool.reader import PrefetchReader, iter_frames
+
+
+def write_animation(tmp_path):
+    path = str(tmp_path / "show.lcfa")
+    save_animation({2: np.zeros((3, 3), np.uint8), 5: np.ones((3, 3), np.uint8)}, path, total_frames=8)
+    return path
+
+
+def test_iter_frames_holds_keyframes(tmp_path):
+    frames = list(iter_frames(write_animation(tmp_path), start=1))
+    assert [frame_num for frame_num, _ in frames] == list(range(1, 8))
+    assert frames[0][1] is None
+    assert [int(frame[0, 0]) for _, frame in frames[1:]] == [0, 0, 0, 1, 1, 1]
+
+
+def test_prefetch_reader_stays_ended(tmp_path):
+    with PrefetchReader(write_animation(tmp_path), prefetch=2) as reader:
+        assert len(list(reader)) == 8
+        assert list(reader) == []
+        assert next(reader, None) is None
+
+
+def test_async_iteration_survives_a_cancelled_call(tmp_path):
+    async def read(reader):
+        # A cancelled wait must not take a frame with it
+        waiting = asyncio.ensure_future(reader.__anext__())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        try:
+            first = await waiting
+        except asyncio.CancelledError:
+            first = None
+        rest = [frame_num async for frame_num, _ in reader]
+        again = [frame_num async for frame_num, _ in reader]
+        return first, rest, again
+
+    with PrefetchReader(write_animation(tmp_path), prefetch=2) as reader:
+        first, rest, again = asyncio.run(read(reader))
+    frame_nums = ([first[0]] if first else []) + rest
+    assert frame_nums == list(range(8))
+    assert again == []
@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+import numpy as np
+
+from designtool.recorder import RecordingController, load_recording
+
+
+def frame(code, shape=(4, 3)):
+    return np.full(shape, code, dtype=np.uint8)
+
+
+def record(controller, frames):
+    async def run():
+        await controller.connect()
+        for grid in frames:
+            await controller.drawFrame(grid)
+    asyncio.run(run())
+
+
+def test_recording_to_a_file_before_any_frame_is_empty(tmp_path):
+    controller = RecordingController(str(tmp_path / "run.lcfr"))
+    times, frames = controller.recording()
+    assert len(times) == 0 and len(frames) == 0
+
+
+def test_file_recording_round_trips(tmp_path):
+    path = str(tmp_path / "run.lcfr")
+    controller = RecordingController(path)
+    record(controller, [frame(0x00), frame(0x11)])
+    controller.close()
+
+    times, frames = load_recording(path)
+    assert np.all(np.diff(times) >= 0)
+    np.testing.assert_array_equal(frames, np.stack([frame(0x00), frame(0x11)]))
+    np.testing.assert_array_equal(controller.recording()[1], frames)
+
+
+def test_latency_overlaps_between_frames():
+    controller = RecordingController(latency=0.1)
+
+    async def run():
+        await controller.connect()
+        started = time.perf_counter()
+        await asyncio.gather(*(controller.drawFrame(frame(code)) for code in range(4)))
+        return time.perf_counter() - started
+
+    assert asyncio.run(run()) < 0.3
+    times, frames = controller.recording()
+    assert [int(grid[0, 0]) for grid in frames] == [0, 1, 2, 3]
+
+
+def test_bandwidth_serializes_frames():
+    # 12 cells * 2 bytes at 480 bytes/s: 50 ms per frame
+    controller = RecordingController(bandwidth=480)
+
+    async def run():
+        await controller.connect()
+        await asyncio.gather(*(controller.drawFrame(frame(code)) for code in range(3)))
+
+    asyncio.run(run())
+    times, _ = controller.recording()
+    assert times[-1] - times[0] >= 0.09
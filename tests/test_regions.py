@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from designtool import regions
+
+
+def reference_fill(grid, row, col):
+    # Cell by cell flood fill to check the scanline one against
+    mask = np.zeros(grid.shape, dtype=bool)
+    pending = [(row, col)]
+    while pending:
+        r, c = pending.pop()
+        if 0 <= r < grid.shape[0] and 0 <= c < grid.shape[1] and not mask[r, c] and grid[r, c] == grid[row, col]:
+            mask[r, c] = True
+            pending.extend(((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)))
+    return mask
+
+
+def test_fill_stays_inside_walls():
+    grid = np.array([
+        [0, 0, 1, 0],
+        [0, 1, 0, 0],
+        [1, 0, 0, 1],
+    ])
+    expected = np.array([
+        [True, True, False, False],
+        [True, False, False, False],
+        [False, False, False, False],
+    ])
+    np.testing.assert_array_equal(regions.flood_fill_mask(grid, 0, 0), expected)
+
+
+def test_fill_does_not_cross_diagonals():
+    grid = np.array([
+        [1, 0],
+        [0, 1],
+    ])
+    assert regions.flood_fill_mask(grid, 0, 0).sum() == 1
+
+
+def test_fill_winds_through_a_spiral():
+    grid = np.array([
+        [0, 0, 0, 0, 0],
+        [1, 1, 1, 1, 0],
+        [0, 0, 0, 1, 0],
+        [0, 1, 1, 1, 0],
+        [0, 0, 0, 0, 0],
+    ])
+    mask = regions.flood_fill_mask(grid, 2, 0)
+    np.testing.assert_array_equal(mask, grid == 0)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_fill_matches_cell_by_cell_fill(seed):
+    rng = np.random.default_rng(seed)
+    grid = rng.integers(0, 3, (17, 23))
+    for row, col in rng.integers(0, (17, 23), (10, 2)):
+        np.testing.assert_array_equal(regions.flood_fill_mask(grid, row, col), reference_fill(grid, row, col))
+
+
+def test_rect_outline_and_clipping():
+    outline = regions.rect_mask((4, 4), (0, 0, 3, 3), filled=False)
+    assert outline.sum() == 8 and not outline[1, 1]
+    assert regions.rect_mask((4, 4), (2, 2, 10, 10)).sum() == 4
+
+
+def test_paste_drops_what_falls_outside():
+    grid = np.zeros((3, 3), dtype=np.uint8)
+    result = regions.paste(grid, np.ones((2, 2), dtype=np.uint8), (2, -1))
+    assert result.sum() == 1 and result[2, 0] == 1
+    assert grid.sum() == 0
+
+
+def test_move_fills_the_cells_left_behind():
+    grid = np.arange(9).reshape(3, 3)
+    result, bounds = regions.move(grid, (0, 0, 1, 2), (1, 1), -1)
+    assert bounds == (1, 1, 2, 3)
+    np.testing.assert_array_equal(result[0, :2], [-1, -1])
+    np.testing.assert_array_equal(result[1, 1:], [0, 1])
+
+
+def test_rotate_selection_changes_its_bounds():
+    grid = np.arange(12).reshape(3, 4)
+    result, bounds = regions.transform(grid, (0, 0, 1, 3), regions.rotate, -1)
+    assert bounds == (0, 0, 3, 1)
+    np.testing.assert_array_equal(result[:, 0], [0, 1, 2])
+    np.testing.assert_array_equal(result[0, 1:3], [-1, -1])
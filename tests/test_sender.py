@@ -0,0 +1,117 @@
+import asyncio
+
+import numpy as np
+
+from designtool.sender import ControllerWorker, FrameSender
+
+
+class FakeController:
+    def __init__(self, cells=True, takes_codes=False):
+        self.frames = []
+        self.cells = []
+        self.takes_codes = takes_codes
+        if cells:
+            self.drawCells = self._draw_cells
+
+    async def connect(self, *args, **kwargs):
+        pass
+
+    async def drawFrame(self, grid):
+        self.frames.append(grid)
+
+    async def _draw_cells(self, cells):
+        self.cells.append(cells)
+
+
+def frame(shape=(8, 8)):
+    return np.full(shape, 0xFE, dtype=np.uint8)
+
+
+def send(sender, controller, grid, force=False):
+    return asyncio.run(sender.send(controller, grid, force=force))
+
+
+def test_first_frame_is_sent_whole_as_hex():
+    controller = FakeController()
+    assert send(FrameSender(), controller, frame()) == 64
+    assert controller.frames[0][0][0] == "FE"
+
+
+def test_controllers_taking_codes_get_the_array():
+    controller = FakeController(takes_codes=True)
+    send(FrameSender(), controller, frame())
+    assert isinstance(controller.frames[0], np.ndarray)
+
+
+def test_unchanged_frame_is_skipped_unless_forced():
+    sender, controller = FrameSender(), FakeController()
+    send(sender, controller, frame())
+    assert send(sender, controller, frame()) == 0
+    assert send(sender, controller, frame(), force=True) == 64
+    assert len(controller.frames) == 2
+
+
+def test_small_changes_go_out_as_cells():
+    sender, controller = FrameSender(), FakeController()
+    send(sender, controller, frame())
+    grid = frame()
+    grid[2, 3] = 0x00
+    grid[5, 1] = 0xFF
+    assert send(sender, controller, grid) == 2
+    assert sorted(controller.cells[0]) == [(2, 3, "00"), (5, 1, "FF")]
+    assert len(controller.frames) == 1
+
+
+def test_large_changes_and_no_draw_cells_send_full_frames():
+    sender, controller = FrameSender(max_delta_fraction=0.25), FakeController()
+    send(sender, controller, frame())
+    grid = frame()
+    grid[:3] = 0x00  # 24 of 64 cells
+    assert send(sender, controller, grid) == 64
+
+    plain = FakeController(cells=False)
+    send(sender, plain, frame())
+    grid = frame()
+    grid[0, 0] = 0x00
+    assert send(sender, plain, grid) == 64
+
+
+def test_new_shape_or_reset_sends_the_whole_frame():
+    sender, controller = FrameSender(), FakeController()
+    send(sender, controller, frame())
+    assert send(sender, controller, frame((4, 4))) == 16
+    sender.reset(controller)
+    assert send(sender, controller, frame((4, 4))) == 16
+
+
+def test_hex_grids_are_accepted():
+    sender, controller = FrameSender(), FakeController()
+    send(sender, controller, [["FE", "00"], ["FF", "FE"]])
+    assert send(sender, controller, [["FE", "00"], ["FF", "FE"]]) == 0
+
+
+def test_worker_forced_submit_resends_unchanged_frame():
+    controller = FakeController()
+    worker = ControllerWorker(controller)
+    try:
+        for force in (False, False, True):
+            worker.submit(frame(), force=force)
+            _, cells, error = worker.results.get(timeout=5)
+            assert error is None
+        assert len(controller.frames) == 2
+        assert cells == 64
+    finally:
+        worker.stop()
+
+
+def test_worker_is_not_connected_before_connect():
+    worker = ControllerWorker(FakeController())
+    try:
+        assert not worker.connected
+        # Without connect() frames still go straight out
+        worker.submit(frame())
+        _, _, error = worker.results.get(timeout=5)
+        assert error is None
+        assert not worker.connected
+    finally:
+        worker.stop()
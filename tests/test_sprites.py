@@ -0,0 +1,24 @@
+import numpy as np
+from PIL import Image, ImageColor
+
+from designtool.colorconversion import PREVIEW_COLORS
+from designtool.sprites import SpriteAtlas
+
+
+def atlas():
+    circle = Image.new("RGBA", (5, 5))
+    circle.putalpha(Image.fromarray(np.linspace(0, 255, 25).reshape(5, 5).astype(np.uint8)))
+    return SpriteAtlas(circle)
+
+
+def test_grid_tints_match_the_sprites():
+    sprites = atlas()
+    colors = [PREVIEW_COLORS[0x00], PREVIEW_COLORS[0xFE], "#123456"]
+    rgb = np.array([[ImageColor.getrgb(color) for color in colors]], dtype=np.uint8)
+    tints = sprites.tints(rgb)
+    assert tints.shape == (1, 5, 3, 5, 3)
+    for col, color in enumerate(colors):
+        expected = sprites.palette_tints.get(color)
+        if expected is None:
+            expected = np.rint(sprites.alpha[:, :, None] * rgb[0, col].astype(np.float32)).astype(np.uint8)
+        np.testing.assert_array_equal(tints[0, :, col], expected)
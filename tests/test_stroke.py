@@ -0,0 +1,69 @@
+from designtool.stroke import Stroke, line_cells, point_to_cell
+
+CELL = 10
+
+
+def stroke(rows=5, cols=5, **kwargs):
+    painted = []
+    return Stroke(painted.append, rows, cols, CELL, **kwargs), painted
+
+
+def cells(painted):
+    return [(row, col) for batch in painted for row, col, _ in batch]
+
+
+def center(row, col):
+    return col * CELL + CELL / 2, row * CELL + CELL / 2
+
+
+def test_single_click_paints_one_cell():
+    brush, painted = stroke()
+    brush.begin(*center(2, 3), "red")
+    brush.end()
+    assert painted == [[(2, 3, "red")]]
+
+
+def test_fast_diagonal_drag_leaves_no_gaps():
+    brush, painted = stroke(rows=10, cols=10)
+    brush.begin(*center(0, 0), "red")
+    brush.move(*center(9, 9))  # One motion event across the whole grid
+    brush.end()
+    assert cells(painted) == [(i, i) for i in range(10)]
+
+
+def test_every_segment_connects_to_the_last():
+    brush, painted = stroke(rows=10, cols=10)
+    brush.begin(*center(0, 0), "red")
+    for point in (center(3, 7), center(8, 2)):
+        brush.move(*point)
+    painted_cells = cells(painted)
+    assert painted_cells == line_cells((0, 0), (3, 7)) + line_cells((3, 7), (8, 2))[1:]
+    for (row, col), (next_row, next_col) in zip(painted_cells, painted_cells[1:]):
+        assert max(abs(next_row - row), abs(next_col - col)) == 1
+
+
+def test_drag_from_and_off_the_grid_keeps_the_cells_inside():
+    brush, painted = stroke()
+    brush.begin(-25, center(2, 0)[1], "red")  # Starts left of the grid
+    assert painted == []
+    brush.move(*center(2, 2))
+    brush.move(80, center(2, 0)[1])  # Ends right of it
+    brush.end()
+    assert cells(painted) == [(2, 0), (2, 1), (2, 2), (2, 3), (2, 4)]
+
+
+def test_radius_skips_the_gap_between_bulbs():
+    brush, painted = stroke(radius=CELL / 2)
+    brush.begin(1, 1, "red")  # The corner of cell (0, 0), off its bulb
+    assert painted == []
+    brush.move(*center(0, 2))
+    brush.move(29, 9)  # The corner of cell (0, 2) is the same cell: nothing new
+    brush.move(39, 1)  # The corner of cell (0, 3)
+    assert cells(painted) == [(0, 1), (0, 2)]
+
+
+def test_moves_before_begin_are_ignored():
+    brush, painted = stroke()
+    brush.move(*center(1, 1))
+    assert painted == [] and not brush.active
+    assert point_to_cell(-1, -1, CELL) == (-1, -1)
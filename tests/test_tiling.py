@@ -0,0 +1,143 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from designtool.tiling import Tile, TiledOutput, TileError
+
+
+class PanelController:
+    # A double-buffered panel whose uploads can be held up
+    takes_codes = True
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.uploaded = None
+        self.shown = []
+
+    async def connect(self, *args, **kwargs):
+        pass
+
+    async def drawFrame(self, grid):
+        await asyncio.sleep(self.delay)
+        self.uploaded = np.array(grid)
+
+    async def showFrame(self):
+        self.shown.append(self.uploaded)
+
+
+def frame(code, shape=(4, 2)):
+    return np.full(shape, code, dtype=np.uint8)
+
+
+def tiled(slow_delay=0.0):
+    left, right = PanelController(), PanelController(slow_delay)
+    output = TiledOutput([Tile(left, 0, 0, 2, 2), Tile(right, 2, 0, 2, 2)], timeout=0.05)
+    return output, left, right
+
+
+def test_frame_is_split_across_tiles_and_shown():
+    output, left, right = tiled()
+    grid = frame(0xFE)
+    grid[3, 1] = 0x00
+
+    async def run():
+        await output.connect()
+        await output.drawFrame(grid)
+
+    asyncio.run(run())
+    np.testing.assert_array_equal(left.shown[-1], grid[0:2])
+    np.testing.assert_array_equal(right.shown[-1], grid[2:4])
+
+
+def test_late_tile_is_brought_up_to_date_without_a_new_frame():
+    async def run():
+        output, left, right = tiled(slow_delay=0.1)
+        await output.connect()
+        await output.drawFrame(frame(0x00))
+        assert output.tiles[1].busy is not None
+        right.delay = 0
+        await output.drawFrame(frame(0x11))  # Skipped by the slow panel
+        # Nothing else is sent; the panel catches up on its own
+        await asyncio.sleep(0.2)
+        return output, right
+
+    output, right = asyncio.run(run())
+    assert output.tiles[1].busy is None
+    np.testing.assert_array_equal(right.shown[-1], frame(0x11, (2, 2)))
+
+
+def test_failed_send_leaves_the_tile_out_and_others_are_sent():
+    output, left, right = tiled()
+
+    async def broken(grid):
+        raise OSError("unplugged")
+
+    async def run():
+        right.drawFrame = broken
+        await output.connect()
+        await output.drawFrame(frame(0x00))
+        assert not output.tiles[1].connected
+        assert output.tiles[1].reconnecting is not None
+        await output.drawFrame(frame(0x11))
+
+    asyncio.run(run())
+    assert len(left.shown) == 2
+    np.testing.assert_array_equal(left.shown[-1], frame(0x11, (2, 2)))
+
+
+@pytest.mark.parametrize("failure", ["error", "hang"])
+def test_offline_tile_does_not_hold_up_the_others(failure):
+    output, left, right = tiled()
+    output.connect_timeout = 0.05
+    output.retry_delay = 0.01
+
+    async def offline(*args, **kwargs):
+        if failure == "hang":
+            await asyncio.sleep(60)
+        raise OSError("no route to panel")
+
+    async def run():
+        right.connect = offline
+        await output.connect()
+        assert [tile for tile, _ in output.connect_failures] == [output.tiles[1]]
+        assert output.tiles[0].connected and not output.tiles[1].connected
+        for code in (0x00, 0x11):
+            await output.drawFrame(frame(code))
+
+    asyncio.run(run())
+    assert len(left.shown) == 2 and right.shown == []
+
+
+def test_offline_tile_is_reconnected_and_brought_up_to_date():
+    output, left, right = tiled()
+    output.retry_delay = 0.01
+    attempts = []
+
+    async def flaky(*args, **kwargs):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise OSError("not yet")
+
+    async def run():
+        right.connect = flaky
+        await output.connect()
+        await output.drawFrame(frame(0x22))
+        await asyncio.sleep(0.2)
+
+    asyncio.run(run())
+    assert output.tiles[1].connected and output.tiles[1].reconnecting is None
+    np.testing.assert_array_equal(right.shown[-1], frame(0x22, (2, 2)))
+
+
+def test_no_tile_connected_raises():
+    output, left, right = tiled()
+    output.connect_timeout = 0.05
+
+    async def offline(*args, **kwargs):
+        raise OSError("no route to panel")
+
+    left.connect = right.connect = offline
+    with pytest.raises(TileError) as error:
+        asyncio.run(output.connect())
+    assert len(error.value.failures) == 2
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from designtool.colorconversion import CODE_RGB
+from designtool.tween import TweenCache, Tweener, blend, hsv_to_rgb, rgb_to_hsv
+
+RED, BLUE, OFF = 0x00, 0x77, 0xFE
+
+
+def tweener(mode="linear"):
+    result = Tweener(mode)
+    result.set_keyframe(0, np.full((3, 4), RED, dtype=np.uint8))
+    result.set_keyframe(10, np.full((3, 4), BLUE, dtype=np.uint8))
+    return result
+
+
+def test_hold_never_blends():
+    frames = tweener("hold")
+    assert not frames.is_tween(5)
+    np.testing.assert_array_equal(frames.frame(5), np.full((3, 4), RED))
+
+
+def test_frames_before_and_after_keyframes():
+    frames = tweener()
+    assert frames.frame(-1) is None
+    assert not frames.is_tween(0)
+    assert not frames.is_tween(10)
+    assert not frames.is_tween(11)
+    np.testing.assert_array_equal(frames.frame(12), np.full((3, 4), BLUE))
+
+
+@pytest.mark.parametrize("mode", ["linear", "hsv", "ease"])
+def test_tween_frames_are_palette_codes_between_the_keyframes(mode):
+    frames = tweener(mode)
+    assert frames.is_tween(5)
+    middle = frames.frame(5)
+    assert middle.shape == (3, 4) and middle.dtype == np.uint8
+    assert set(np.unique(middle).tolist()) <= set(np.flatnonzero(CODE_RGB.any(axis=1)).tolist()) | {OFF}
+    np.testing.assert_array_equal(frames.frame(1), frames.frame(1))
+
+
+def test_linear_blend_endpoints_and_middle():
+    start = np.array([[[0, 0, 0]]], dtype=np.uint8)
+    end = np.array([[[200, 100, 50]]], dtype=np.uint8)
+    np.testing.assert_allclose(blend(start, end, 0, "linear"), start)
+    np.testing.assert_allclose(blend(start, end, 1, "linear"), end)
+    np.testing.assert_allclose(blend(start, end, 0.5, "linear"), [[[100, 50, 25]]])
+    np.testing.assert_allclose(blend(start, end, 0.5, "ease"), [[[100, 50, 25]]])
+    with pytest.raises(ValueError):
+        blend(start, end, 0.5, "cubic")
+
+
+def test_hsv_round_trip():
+    rgb = np.random.default_rng(1).integers(0, 256, (50, 3)).astype(np.uint8)
+    np.testing.assert_allclose(hsv_to_rgb(rgb_to_hsv(rgb)), rgb, atol=0.01)
+
+
+def test_editing_a_keyframe_invalidates_only_its_neighbours():
+    frames = tweener()
+    frames.set_keyframe(20, np.full((3, 4), RED, dtype=np.uint8))
+    for frame_num in (5, 15):
+        frames.frame(frame_num)
+    assert set(frames.cache.frames) == {5, 15}
+
+    frames.set_keyframe(20, np.full((3, 4), OFF, dtype=np.uint8))
+    assert set(frames.cache.frames) == {5}
+
+    frames.remove_keyframe(10)
+    assert frames.cache.frames == {}
+    assert frames.is_tween(10)
+
+
+def test_mode_change_clears_the_cache():
+    frames = tweener()
+    frames.frame(5)
+    frames.set_mode("hsv")
+    assert frames.cache.frames == {}
+    with pytest.raises(ValueError):
+        frames.set_mode("cubic")
+
+
+def test_cache_stays_under_its_budget():
+    cache = TweenCache(max_bytes=250)
+    for frame_num in range(10):
+        cache.put(frame_num, np.zeros(100, dtype=np.uint8))
+    assert cache.size <= 250
+    assert list(cache.frames) == [8, 9]
+    cache.get(8)
+    cache.put(10, np.zeros(100, dtype=np.uint8))
+    assert list(cache.frames) == [8, 10]
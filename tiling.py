@@ -0,0 +1,264 @@
+import asyncio
+import json
+
+from designtool.metrics import metrics
+from designtool.sender import FrameSender, to_codes
+
+
+class Tile:
+    """
+    One panel of a tiled installation: a rectangular region of the design
+    canvas shown by its own controller.
+
+    Args:
+        controller: A LightsController, or anything with the same async interface.
+        x (int): First canvas column of the region.
+        y (int): First canvas row of the region.
+        width (int): Number of columns.
+        height (int): Number of rows.
+    """
+
+    def __init__(self, controller, x, y, width, height):
+        self.controller = controller
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+        self.connected = False
+        self.busy = None  # Send still running after it timed out
+        self.reconnecting = None  # Background task reconnecting this panel on its own
+        self.timeouts = 0
+        self.errors = 0
+
+    def view(self, frame):
+        # The tile's part of a grid[x][y] frame, as a view sharing its memory
+        return frame[self.x:self.x + self.width, self.y:self.y + self.height]
+
+
+class TileError(ConnectionError):
+    """
+    Raised when no tile could be connected or sent to.
+
+    Attributes:
+        failures (list of tuple): (tile, exception) for each failed tile.
+    """
+
+    def __init__(self, failures):
+        super().__init__(f"{len(failures)} tile(s) failed: " + ", ".join(repr(error) for _, error in failures))
+        self.failures = failures
+
+
+class TiledOutput:
+    """
+    Show one large design canvas across several controllers.
+
+    Each frame is sliced into per-tile views without copying, and the tiles
+    are sent concurrently, each through a FrameSender so unchanged panels
+    are skipped and small changes go out as cells.
+
+    Frames act as a barrier: every tile's send for a frame has finished, or
+    timed out, before the next frame starts, so panels never drift apart.
+    Controllers with a showFrame() coroutine are treated as double-buffered;
+    once all tiles are uploaded their showFrame() calls go out together, so
+    those panels switch at the same moment.
+
+    A send that takes longer than timeout is left running in the background
+    rather than holding up the other panels. That panel skips frames until
+    it catches up, and is then brought up to date: the newest frame is sent
+    to it in full and shown, even if no new frame arrives.
+
+    A panel that fails to connect, or fails a send, is left out of the
+    frames that follow and reconnected on its own in the background, with
+    growing delays between attempts; the other panels keep playing. Once it
+    is back it is sent the newest frame in full. Only when no panel is
+    connected at all do connect() and drawFrame() raise, so the
+    ControllerWorker driving it sees the whole output as down.
+
+    It has the controller interface (connect, drawFrame), so a
+    ControllerWorker can drive it like a single controller.
+
+    Args:
+        tiles (list of Tile): The panels; regions must not overlap.
+        timeout (float): Longest a frame waits for one panel, in seconds.
+        frame_sender (FrameSender): Used for the per-tile sends.
+        connect_timeout (float): Longest one panel's connection attempt may take.
+        retry_delay (float): Wait before reconnecting a failed panel; doubled
+            after each failed attempt up to max_retry_delay.
+    """
+
+    takes_codes = True  # drawFrame takes code arrays, so FrameSender skips the hex conversion
+
+    def __init__(self, tiles, timeout=0.1, frame_sender=None, connect_timeout=5.0, retry_delay=1.0, max_retry_delay=30.0):
+        self.tiles = list(tiles)
+        self.timeout = timeout
+        self.frame_sender = frame_sender or FrameSender()
+        self.connect_timeout = connect_timeout
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.last_results = []  # Per tile: cells sent, an exception, or None if skipped
+        self.connect_failures = []  # (tile, exception) for each panel the last connect() could not reach
+        self.frame = None  # Newest frame, for panels catching up after a late send or a reconnect
+        self._connect_args = ((), {})
+
+    @classmethod
+    def from_layout(cls, layout, make_controller, **kwargs):
+        """
+        Build a TiledOutput from a layout dict, as read by load_layout().
+
+        Args:
+            layout (dict): {"tiles": [{"x", "y", "width", "height",
+                "controller": {...}}, ...]}, plus an optional "timeout".
+            make_controller (callable): Called with each tile's "controller"
+                options as keyword arguments, e.g. LightsController.
+        """
+        tiles = [
+            Tile(make_controller(**tile.get("controller", {})), tile["x"], tile["y"], tile["width"], tile["height"])
+            for tile in layout["tiles"]
+        ]
+        if "timeout" in layout:
+            kwargs.setdefault("timeout", layout["timeout"])
+        return cls(tiles, **kwargs)
+
+    async def connect(self, *args, **kwargs):
+        """
+        Connect every controller that is not connected yet, concurrently.
+
+        Panels that fail, or take longer than connect_timeout, are listed in
+        connect_failures and reconnected in the background.
+
+        Raises:
+            TileError: If no panel at all is connected.
+        """
+        self._connect_args = (args, kwargs)
+        tiles = [tile for tile in self.tiles if not tile.connected and tile.reconnecting is None]
+        results = await asyncio.gather(*(self._connect_tile(tile) for tile in tiles), return_exceptions=True)
+        failures = [(tile, result) for tile, result in zip(tiles, results) if isinstance(result, Exception)]
+        self.connect_failures = failures
+        for tile, _ in failures:
+            self._tile_failed(tile)
+        if not any(tile.connected for tile in self.tiles):
+            raise TileError(failures)
+
+    async def _connect_tile(self, tile):
+        args, kwargs = self._connect_args
+        await asyncio.wait_for(tile.controller.connect(*args, **kwargs), self.connect_timeout)
+        tile.connected = True
+        # A reconnected panel shows nothing we know of
+        self.frame_sender.reset(tile.controller)
+
+    async def _reconnect(self, tile):
+        # Retry one panel until it is back, then bring it up to date
+        delay = self.retry_delay
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await self._connect_tile(tile)
+                break
+            except Exception:
+                metrics.count("tiles.connect_failed")
+                delay = min(delay * 2, self.max_retry_delay)
+        tile.reconnecting = None
+        metrics.count("tiles.reconnected")
+        if self.frame is not None and tile.busy is None:
+            tile.busy = asyncio.ensure_future(self._resync(tile))
+
+    async def _send_tile(self, tile, view):
+        if not tile.connected:
+            metrics.count("tiles.skipped_disconnected")
+            return None
+        if tile.busy is not None:
+            metrics.count("tiles.skipped_busy")
+            return None
+        task = asyncio.ensure_future(self.frame_sender.send(tile.controller, view))
+        done, _ = await asyncio.wait([task], timeout=self.timeout)
+        if not done:
+            # Let it finish in the background; the panel skips frames until then
+            tile.timeouts += 1
+            metrics.count("tiles.timeout")
+            tile.busy = task
+            task.add_done_callback(lambda task, tile=tile: self._late_send_done(tile, task))
+            return None
+        return task.result()
+
+    def _late_send_done(self, tile, task):
+        tile.busy = None
+        if task.cancelled() or task.exception() is not None:
+            self._tile_failed(tile)
+            return
+        # The late upload is not shown, and newer frames skipped this panel
+        tile.busy = asyncio.ensure_future(self._resync(tile))
+
+    async def _resync(self, tile):
+        # Send the newest frame to a panel in full; it skips frames until this is done
+        metrics.count("tiles.resync")
+        try:
+            await self.frame_sender.send(tile.controller, tile.view(self.frame), force=True)
+            if hasattr(tile.controller, "showFrame"):
+                await tile.controller.showFrame()
+        except Exception:
+            self._tile_failed(tile)
+        finally:
+            tile.busy = None
+
+    def _tile_failed(self, tile):
+        # Leave the panel out of the frames that follow until it is reconnected
+        tile.errors += 1
+        tile.connected = False
+        self.frame_sender.reset(tile.controller)
+        if tile.reconnecting is None:
+            tile.reconnecting = asyncio.ensure_future(self._reconnect(tile))
+
+    async def drawFrame(self, grid):
+        """
+        Send one frame (grid[x][y] order, codes or hex strings) to every
+        connected tile. Tiles that fail are reconnected in the background.
+
+        Raises:
+            TileError: If no tile is connected any more.
+        """
+        frame = to_codes(grid)
+        self.frame = frame.copy()
+        with metrics.span("tiles.send"):
+            results = await asyncio.gather(
+                *(self._send_tile(tile, tile.view(frame)) for tile in self.tiles), return_exceptions=True
+            )
+
+            shown = [
+                tile for tile, result in zip(self.tiles, results)
+                if result and not isinstance(result, Exception) and hasattr(tile.controller, "showFrame")
+            ]
+            if shown:
+                shown_results = await asyncio.gather(
+                    *(asyncio.wait_for(tile.controller.showFrame(), self.timeout) for tile in shown),
+                    return_exceptions=True,
+                )
+                for tile, result in zip(shown, shown_results):
+                    if isinstance(result, Exception):
+                        results[self.tiles.index(tile)] = result
+
+        self.last_results = results
+        failures = [(tile, result) for tile, result in zip(self.tiles, results) if isinstance(result, Exception)]
+        for tile, _ in failures:
+            self._tile_failed(tile)
+        if not any(tile.connected for tile in self.tiles):
+            raise TileError(failures)
+
+
+def layout_shape(layout):
+    # (columns, rows) of the canvas a layout's tiles cover
+    return (
+        max(tile["x"] + tile["width"] for tile in layout["tiles"]),
+        max(tile["y"] + tile["height"] for tile in layout["tiles"]),
+    )
+
+
+def load_layout(path):
+    """
+    Read a tile layout from a JSON file.
+
+    Returns:
+        dict: The layout, for TiledOutput.from_layout().
+    """
+    with open(path) as file:
+        return json.load(file)
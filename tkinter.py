@@ -1,93 +1,258 @@
 import tkinter as tk
-from tkinter import colorchooser, filedialog
-from PIL import Image, ImageTk, ImageOps
+from tkinter import colorchooser, filedialog, messagebox
+from PIL import Image, ImageTk
+import os
 import random
-import math
-import asyncio
 
 from designtool.filesave import *
 from designtool.colorconversion import *
+from designtool import colorconversion
 from designtool.animation import Timeline
-from lightslib.LightsController import LightsController
-
-controller = LightsController()
-asyncio.run(controller.connect(run_simul_on_fail=False))
-
-keyframe_data = {}
+from designtool.history import EditHistory
+from designtool.imageimport import import_frames
+from designtool.keyframes import KeyframeIndex
+from designtool.metrics import metrics
+from designtool.statsview import StatsWindow
+from designtool.gridview import GridCanvas
+from designtool.gridmodel import GridModel
+from designtool.journal import Journal, JournalState, recover_in_background
+from designtool.sprites import SpriteAtlas
+from designtool.stroke import Stroke, point_to_cell
+from designtool import regions
+from designtool.playback import Player
+from designtool.tween import INTERPOLATION_MODES, Tweener
+from designtool.effects import EFFECTS, EffectClip, EffectTrack, LazyFrames
+from designtool.sender import CONNECTED, ControllerWorker
+from designtool.tiling import TiledOutput, layout_shape, load_layout
+
+# The controller lives on a background event loop so sends never block the UI;
+# it connects once the window is up. DESIGNTOOL_LAYOUT names a tile layout
+# file for installations made of several panels, each with its own controller.
+# DESIGNTOOL_RECORD records every frame of the whole grid to a log file instead.
+layout_path = os.environ.get("DESIGNTOOL_LAYOUT")
+layout = load_layout(layout_path) if layout_path else None
+record_path = os.environ.get("DESIGNTOOL_RECORD")
+if record_path:
+    from designtool.recorder import RecordingController
+    controller = RecordingController(record_path)
+else:
+    from lightslib.LightsController import LightsController
+    controller = TiledOutput.from_layout(layout, LightsController) if layout else LightsController()
+controller_worker = ControllerWorker(controller)
+
+# Every edit is journaled on a background thread, and the last session is
+# recovered from the journal at start. DESIGNTOOL_AUTOSAVE names the journal
+# file; set it to an empty string to turn autosave off.
+autosave_path = os.environ.get("DESIGNTOOL_AUTOSAVE", os.path.join(os.path.expanduser("~"), ".designtool", "autosave_tk.lcfj"))
+journal = None  # Started once the last session has been recovered
+recovery = None  # Future of the recovered session while it is being read
+RECOVERY_POLL_MS = 50
+journal_grid_stale = False  # Set when the grid shows a frame rather than the last edit
+
+keyframe_data = {}  # Frame number -> color grid, or a rows x cols array of palette codes for imported and loaded frames
+keyframe_index = KeyframeIndex()  # Sorted keyframe numbers of keyframe_data
 frame_data_temp = None # This will act as the "clipboard" for when the user copies frame data to paste elsewhere
 
-# Load the circle sprite and prepare colored versions
-def load_circle_sprites(sprite_path, colors, scale_factor=0.5):
+# Load the circle sprite, scaled to the size of a bulb on screen
+def load_base_circle(sprite_path, scale_factor=0.5):
     base_circle = Image.open(sprite_path).convert("RGBA")
-    resized_circle = base_circle.resize(
+    return base_circle.resize(
         (int(base_circle.width * scale_factor), int(base_circle.height * scale_factor)),
         Image.Resampling.LANCZOS  # High-quality resizing
     )
-    sprites = {}
-    for color in colors:
-        tinted_circle = ImageOps.colorize(resized_circle.split()[3], black="black", white=color)
-        sprites[color] = ImageTk.PhotoImage(tinted_circle)
-    return sprites, resized_circle
-
-# Dynamically add a new sprite for a color
-def add_sprite_for_color(color):
-    if color not in circle_sprites:
-        tinted_circle = ImageOps.colorize(base_circle.split()[3], black="black", white=color)
-        circle_sprites[color] = ImageTk.PhotoImage(tinted_circle)
-
-# Calculate the distance from the cursor to the center of the circle in the widget
-def distance_to_circle_center(widget, event):
-    widget_x, widget_y = widget.winfo_rootx(), widget.winfo_rooty()
-    cursor_x, cursor_y = event.x_root, event.y_root
-    circle_center_x = widget_x + widget.winfo_width() / 2
-    circle_center_y = widget_y + widget.winfo_height() / 2
-    return math.sqrt((cursor_x - circle_center_x) ** 2 + (cursor_y - circle_center_y) ** 2)
-
-# Handle erasing on mouse hover with proximity check
-def on_mouse_drag_erase(event):
-    if erase_mode and mouse_down:
-        widget = root.winfo_containing(event.x_root, event.y_root)
-        if isinstance(widget, tk.Label):
-            distance = distance_to_circle_center(widget, event)
-            if distance <= circle_radius:
-                widget.config(image=circle_sprites["#1a1a1a"])  # Erase the color
-                widget.color = "#1a1a1a"
-
-# Handle painting on mouse hover with proximity check
-def on_mouse_drag_paint(event):
-    if paint_mode and mouse_down:
-        widget = root.winfo_containing(event.x_root, event.y_root)
-        if isinstance(widget, tk.Label):
-            distance = distance_to_circle_center(widget, event)
-            if distance <= circle_radius:
-                add_sprite_for_color(selected_color)
-                widget.config(image=circle_sprites[selected_color])
-                widget.color = selected_color
-
-# Updated on_mouse_drag function to handle erase mode
-def on_mouse_drag(event):
+
+# Color the current tool paints with, or None if no tool is active
+def stroke_color():
     if paint_mode:
-        on_mouse_drag_paint(event)
-    elif erase_mode:
-        on_mouse_drag_erase(event)
+        return selected_color
+    if erase_mode:
+        return "#1a1a1a"  # Erase the color
+    return None
 
-# Handle mouse click for starting the paint mode
+# Handle mouse click for starting a stroke; the first circle is painted immediately
 def on_mouse_press(event):
-    global mouse_down
+    global mouse_down, shape_start
     mouse_down = True
-    on_mouse_drag(event)  # Paint the first circle immediately on press
+    tool = tool_var.get()
+    if tool == "select":
+        begin_selection(event)
+        return
+
+    color = stroke_color()
+    if color is None:
+        return
+    if tool == "brush":
+        history.begin_group("stroke")  # The whole stroke is undone as one edit
+        stroke.begin(event.x, event.y, color)
+    elif tool == "fill":
+        cell = grid_view.cell_at(event.x, event.y)
+        if cell is not None:
+            values = grid_model.values()
+            mask = regions.flood_fill_mask(values, *cell)
+            apply_values(regions.fill_mask(values, mask, grid_model.value_of(color)), "fill")
+    else:
+        shape_start = clamped_cell(event)
+
+# Paint every cell between the previous and current pointer position
+def on_mouse_drag(event):
+    if not mouse_down:
+        return
+    tool = tool_var.get()
+    if tool == "brush":
+        stroke.move(event.x, event.y)
+    elif tool == "select":
+        drag_selection(event)
+    elif shape_start is not None:
+        draw_shape_preview(tool, shape_start, clamped_cell(event))
 
 # Handle mouse release to stop painting
 def on_mouse_release(event):
-    global mouse_down
+    global mouse_down, shape_start
     mouse_down = False
+    stroke.end()
+    history.end_group()
+
+    tool = tool_var.get()
+    if tool == "select":
+        end_selection(event)
+    elif shape_start is not None and stroke_color() is not None:
+        # Lines and rectangles are drawn in one batch when the button is released
+        grid_view.delete("preview")
+        end = clamped_cell(event)
+        values = grid_model.values()
+        if tool == "line":
+            mask = regions.line_mask(values.shape, shape_start, end)
+        else:
+            mask = regions.rect_mask(values.shape, regions.bounds_from_cells(shape_start, end), filled=tool == "rect")
+        apply_values(regions.fill_mask(values, mask, grid_model.value_of(stroke_color())), tool)
+    shape_start = None
+
+# Apply a batch of (row, col, color) cells as an undoable edit
+def edit_cells(cells, kind="stroke"):
+    record_edit(kind, grid_model.set_cells(cells))
+
+# Region tools work on grid_model.values(), one integer per cell
+def apply_values(values, kind):
+    # Push every cell that changed to the grid as one edit
+    record_edit(kind, grid_model.set_values(values))
+
+# Every grid edit goes through here, so it can be undone and is autosaved
+def record_edit(kind, changes):
+    history.record_cells(kind, changes)
+    journal_edit(changes)
+
+# Undo and redo put cells back; they are edits too
+def apply_history_cells(cells):
+    changes = grid_model.set_cells(cells)
+    journal_edit(changes)
+    return changes
+
+def clamped_cell(event):
+    # The (row, col) under the pointer, kept inside the grid
+    row, col = point_to_cell(event.x, event.y, grid_view.cell_size)
+    return min(max(row, 0), rows - 1), min(max(col, 0), cols - 1)
+
+def cell_center(cell):
+    return (cell[1] + 0.5) * grid_view.cell_size, (cell[0] + 0.5) * grid_view.cell_size
+
+def draw_shape_preview(tool, start, end):
+    grid_view.delete("preview")
+    if tool == "line":
+        grid_view.create_line(*cell_center(start), *cell_center(end), fill="white", dash=(4, 2), tags="preview")
+    else:
+        draw_bounds_outline(regions.bounds_from_cells(start, end), "preview")
+
+def draw_bounds_outline(bounds, tag):
+    top, left, bottom, right = bounds
+    size = grid_view.cell_size
+    grid_view.create_rectangle(left * size, top * size, right * size, bottom * size, outline="white", dash=(4, 2), width=2, tags=tag)
+
+# Selections: drag to select, drag inside a selection to move it (Shift copies)
+selection = None  # Bounds of the selected region, or None
+selection_drag = None  # ("select", start cell) or ("move", start cell, copy)
+selection_clipboard = None  # Block of grid values copied with Ctrl+C
+shape_start = None  # First cell of a line or rectangle being drawn
+
+def set_selection(bounds):
+    global selection
+    selection = bounds
+    grid_view.delete("selection")
+    if bounds is not None:
+        draw_bounds_outline(bounds, "selection")
+
+def begin_selection(event):
+    global selection_drag
+    cell = clamped_cell(event)
+    top, left, bottom, right = selection or (0, 0, 0, 0)
+    if top <= cell[0] < bottom and left <= cell[1] < right:
+        selection_drag = ("move", cell, bool(event.state & 0x0001))
+    else:
+        selection_drag = ("select", cell)
+        set_selection(regions.bounds_from_cells(cell, cell))
+
+def drag_selection(event):
+    if selection_drag is None:
+        return
+    cell = clamped_cell(event)
+    if selection_drag[0] == "select":
+        set_selection(regions.bounds_from_cells(selection_drag[1], cell))
+    else:
+        d_row, d_col = cell[0] - selection_drag[1][0], cell[1] - selection_drag[1][1]
+        top, left, bottom, right = selection
+        grid_view.delete("preview")
+        draw_bounds_outline((top + d_row, left + d_col, bottom + d_row, right + d_col), "preview")
+
+def end_selection(event):
+    global selection_drag
+    drag, selection_drag = selection_drag, None
+    grid_view.delete("preview")
+    if drag is None or drag[0] != "move":
+        return
+    cell = clamped_cell(event)
+    offset = (cell[0] - drag[1][0], cell[1] - drag[1][1])
+    if offset != (0, 0):
+        values = grid_model.values()
+        moved, bounds = regions.move(values, selection, offset, grid_model.value_of("#1a1a1a"), copy=drag[2])
+        apply_values(moved, "copy" if drag[2] else "move")
+        set_selection(regions.clip_bounds(bounds, values.shape))
+
+def transform_selection(operation, kind):
+    # Mirror, flip or rotate the selection, or the whole grid when nothing is selected
+    values = grid_model.values()
+    bounds = selection or (0, 0, rows, cols)
+    transformed, new_bounds = regions.transform(values, bounds, operation, grid_model.value_of("#1a1a1a"))
+    apply_values(transformed, kind)
+    if selection is not None:
+        set_selection(regions.clip_bounds(new_bounds, values.shape))
+
+def copy_selection(event=None):
+    global selection_clipboard
+    if selection is not None:
+        selection_clipboard = regions.extract(grid_model.values(), selection)
+
+def paste_selection(event=None):
+    # Paste at the selection's corner, or the grid's, and select what was pasted
+    if selection_clipboard is None:
+        return
+    block = selection_clipboard
+    values = grid_model.values()
+    top, left = selection[:2] if selection is not None else (0, 0)
+    apply_values(regions.paste(values, block, (top, left)), "paste")
+    set_selection(regions.clip_bounds((top, left, top + block.shape[0], left + block.shape[1]), values.shape))
+
+def delete_selection(event=None):
+    if selection is not None:
+        values = grid_model.values()
+        mask = regions.rect_mask(values.shape, selection)
+        apply_values(regions.fill_mask(values, mask, grid_model.value_of("#1a1a1a")), "delete")
+
+def tool_changed(tool):
+    if tool != "select":
+        set_selection(None)
 
 # Clear all circles on the grid
 def clear_grid():
-    for row in range(rows):
-        for col in range(cols):
-            labels[row][col].config(image=circle_sprites["#1a1a1a"])
-            labels[row][col].color = "#1a1a1a"
+    record_edit("clear", grid_model.fill("#1a1a1a"))
 
 
 # Launch a color picker tool
@@ -96,7 +261,6 @@ def choose_color():
     color_code = colorchooser.askcolor(title="Choose Color")[1]  # Returns a tuple (rgb, hex)
     if color_code:
         selected_color = color_code
-        add_sprite_for_color(selected_color)
         color_picker_button.config(bg=selected_color)
 
 # Toggle paint mode
@@ -107,6 +271,13 @@ def toggle_paint_mode():
     erase_button.config(relief=tk.RAISED)  # Reset erase button
     paint_bucket_button.config(relief=tk.SUNKEN if paint_mode else tk.RAISED)
 
+# Pick the fill tool, painting with the selected color unless erasing
+def select_fill_tool():
+    tool_var.set("fill")
+    tool_changed("fill")
+    if not paint_mode and not erase_mode:
+        toggle_paint_mode()
+
 # Toggle erase mode
 def toggle_erase_mode():
     global erase_mode, paint_mode
@@ -116,37 +287,106 @@ def toggle_erase_mode():
     erase_button.config(relief=tk.SUNKEN if erase_mode else tk.RAISED)
 
 def add_keyframe_event(frame_num):
-    keyframe_data[frame_num] = get_label_colors(labels)
+    color_grid = grid_model.color_grid()
+    history.record_keyframe(frame_num, keyframe_color_grid(frame_num), color_grid)
+    keyframe_data[frame_num] = color_grid
+    keyframe_edited(frame_num)
+
+def keyframe_edited(frame_num):
+    # Forget anything rendered from the old contents of a keyframe
+    keyframe_index.add(frame_num)
+    playback_codes.pop(frame_num, None)
+    tweener.set_keyframe(frame_num, color_grid_to_codes(keyframe_data[frame_num]))
+    player.invalidate()
+    if journal is not None:
+        journal.keyframe(frame_num, grid_model.to_values(keyframe_data[frame_num]))
+
+def previous_keyframe(frame_num):
+    # The most recent keyframe at or before frame_num, or None
+    return keyframe_index.previous(frame_num)
+
+def remove_keyframe_event(frame_num):
+    if frame_num in keyframe_data:
+        history.record_keyframe(frame_num, keyframe_color_grid(frame_num), None)
+        delete_keyframe(frame_num)
+
+def delete_keyframe(frame_num):
+    if frame_num in keyframe_data:
+        del keyframe_data[frame_num]
+        keyframe_index.remove(frame_num)
+        playback_codes.pop(frame_num, None)
+        tweener.remove_keyframe(frame_num)
+        player.invalidate()
+        if journal is not None:
+            journal.remove_keyframe(frame_num)
+
+def show_grid(grid):
+    # Show a color grid (keyframes) or an array of palette codes (generated frames)
+    # Only cells that change are redrawn
+    global journal_grid_stale
+    if isinstance(grid, np.ndarray):
+        changes = grid_model.set_codes(grid)
+    else:
+        changes = grid_model.set_grid(grid)
+    if changes:
+        journal_grid_stale = True
 
 def select_keyframe_event(frame_num):
-    last_keyframe = None
+    # Frames covered by an effect show the effect
+    clip = effect_track.clip_at(frame_num)
+    if clip is not None:
+        show_grid(clip.frame(frame_num))
+        return
+
+    # Frames between keyframes are blended when an interpolation mode is selected
+    if tweener.is_tween(frame_num):
+        show_grid(tweener.frame(frame_num))
+        return
+
+    last_keyframe = previous_keyframe(frame_num)
 
-    for key in sorted(keyframe_data.keys(), reverse=True):
-        if key <= frame_num:
-            last_keyframe = key
-            break
-    
     # Set grid to last_keyframe
     if last_keyframe is not None:
-        color_grid = keyframe_data[last_keyframe] # Grab the previously stored color grid
-        for i, row in enumerate(labels):          # Modify the existing labels using this grid
-            for j, label in enumerate(row):
-                label.config(image=circle_sprites[color_grid[i][j]])
-                label.color = color_grid[i][j]
+        show_grid(keyframe_data[last_keyframe]) # The stored keyframe: a color grid, or palette codes if it was imported or loaded
 
 def copy_frame_event():
     global frame_data_temp
-    frame_data_temp = get_label_colors(labels)
+    frame_data_temp = grid_model.color_grid()
 
 def paste_frame_event():
     global frame_data_temp
 
     # Set current grid to frame_data_temp
     if frame_data_temp is not None:
-        for i, row in enumerate(labels):          # Modify the existing labels using this grid
-            for j, label in enumerate(row):
-                label.config(image=circle_sprites[frame_data_temp[i][j]])
-                label.color = frame_data_temp[i][j]
+        record_edit("paste", grid_model.set_grid(frame_data_temp))
+
+# Undo/redo put a keyframe back the way it was (None removes it)
+def restore_keyframe(frame_num, color_grid):
+    if color_grid is None:
+        delete_keyframe(frame_num)
+        timeline.remove_keyframe_ui(frame_num)
+    else:
+        keyframe_data[frame_num] = color_grid
+        keyframe_edited(frame_num)
+        timeline.add_keyframe_ui(frame_num)
+
+    # Show the result if it affects the selected frame
+    if timeline.selected_frame is not None:
+        select_keyframe_event(timeline.selected_frame)
+
+def grid_shortcut(handler):
+    # Window-wide key binding for a grid edit that leaves keys typed into text fields alone
+    def on_key(event):
+        if isinstance(event.widget, (tk.Entry, tk.Spinbox, tk.Text)):
+            return
+        handler(event)
+    return on_key
+
+def undo(event=None):
+    history.undo()
+
+def redo(event=None):
+    history.redo()
 
 # Create the main window
 root = tk.Tk()
@@ -154,17 +394,18 @@ root = tk.Tk()
 root.title("Lights Design Tool")
 
 # Parameters for the grid
-rows, cols = 20, 20
+# A tiled installation's grid covers all of its panels
+cols, rows = layout_shape(layout) if layout else (20, 20)
 circle_padding = 0  # Removed padding
 colors = ['#1a1a1a'] # This list of colors will expand as we draw circles of different colors
-selected_color = "white"  # Default selected color
+selected_color = "#ffffff"  # Default selected color (white)
 paint_mode = False
 erase_mode = False  # Track whether erase mode is active
 mouse_down = False  # Track whether the mouse button is pressed
 
 # Load circle sprites
-circle_sprites, base_circle = load_circle_sprites("designtool/circle.png", colors)
-circle_radius = base_circle.width / 2  # Calculate the radius of the circles
+base_circle = load_base_circle("designtool/circle.png")
+circle_sprites = SpriteAtlas(base_circle)
 
 # Create a frame for the toolbar
 toolbar = tk.Frame(root, bg="lightgray", padx=5, pady=5)
@@ -174,14 +415,51 @@ toolbar.pack(fill=tk.X)
 clear_button = tk.Button(toolbar, text="Clear Grid", command=clear_grid)
 clear_button.pack(side=tk.LEFT, padx=5)
 
+# Add "Undo" and "Redo" buttons
+undo_button = tk.Button(toolbar, text="Undo", command=undo)
+undo_button.pack(side=tk.LEFT, padx=5)
+redo_button = tk.Button(toolbar, text="Redo", command=redo)
+redo_button.pack(side=tk.LEFT, padx=5)
+
 # Add "Send Config" button
 send_button = tk.Button(toolbar, text="Send Config")
 send_button.pack(side=tk.LEFT, padx=5)
 
+# Add "Stats" button, showing pipeline latencies and frame rates
+stats_button = tk.Button(toolbar, text="Stats", command=lambda: StatsWindow(root))
+stats_button.pack(side=tk.RIGHT, padx=5)
+
+# Status of the last send
+send_status = tk.Label(toolbar, text="", bg="lightgray")
+send_status.pack(side=tk.RIGHT, padx=5)
+
+# Controller connection state
+controller_status = tk.Label(toolbar, text="", bg="lightgray")
+controller_status.pack(side=tk.RIGHT, padx=5)
+
+# Shows why autosave is failing, while it is
+autosave_status = tk.Label(toolbar, text="", bg="lightgray", fg="darkred")
+autosave_status.pack(side=tk.RIGHT, padx=5)
+
 # Add "Save to File" button
 save_button = tk.Button(toolbar, text="Save to File")
 save_button.pack(side=tk.LEFT, padx=5)
 
+# Add "Save Animation" button
+save_animation_button = tk.Button(toolbar, text="Save Animation")
+save_animation_button.pack(side=tk.LEFT, padx=5)
+
+# Add "Load File" button
+load_button = tk.Button(toolbar, text="Load File")
+load_button.pack(side=tk.LEFT, padx=5)
+
+# Add "Import Image" button, with a toggle for dithering imported images
+import_button = tk.Button(toolbar, text="Import Image")
+import_button.pack(side=tk.LEFT, padx=5)
+dither_var = tk.BooleanVar(value=False)
+dither_check = tk.Checkbutton(toolbar, text="Dither", variable=dither_var, bg="lightgray")
+dither_check.pack(side=tk.LEFT)
+
 # Add colored square icon (color picker)
 color_picker_button = tk.Button(
     toolbar, text="  ", bg=selected_color, width=3, command=choose_color
@@ -198,6 +476,17 @@ erase_icon = ImageTk.PhotoImage(Image.open("designtool/erase_icon.png").resize((
 erase_button = tk.Button(toolbar, image=erase_icon, command=toggle_erase_mode)
 erase_button.pack(side=tk.LEFT, padx=5)
 
+# Second toolbar row: drawing tool and selection operations
+tool_bar = tk.Frame(root, bg="lightgray", padx=5, pady=2)
+tool_bar.pack(fill=tk.X)
+tk.Label(tool_bar, text="Tool", bg="lightgray").pack(side=tk.LEFT)
+tool_var = tk.StringVar(value="brush")
+tk.OptionMenu(tool_bar, tool_var, "brush", "fill", "line", "rect", "outline", "select", command=tool_changed).pack(side=tk.LEFT, padx=5)
+tk.Button(tool_bar, text="Fill", command=select_fill_tool).pack(side=tk.LEFT, padx=2)
+tk.Button(tool_bar, text="Mirror", command=lambda: transform_selection(regions.mirror, "mirror")).pack(side=tk.LEFT, padx=2)
+tk.Button(tool_bar, text="Flip", command=lambda: transform_selection(regions.flip, "flip")).pack(side=tk.LEFT, padx=2)
+tk.Button(tool_bar, text="Rotate", command=lambda: transform_selection(regions.rotate, "rotate")).pack(side=tk.LEFT, padx=2)
+
 # Create a frame to hold the grid
 frame = tk.Frame(root, bg="white")
 frame.pack()
@@ -205,81 +494,384 @@ frame.pack()
 # Add the timeline element
 timeline = Timeline(root)
 timeline.add_keyframe_handler.append(add_keyframe_event)
+timeline.remove_keyframe_handler.append(remove_keyframe_event)
 timeline.select_frame_handler.append(select_keyframe_event)
 timeline.copy_frame_handler.append(copy_frame_event)
 timeline.paste_frame_handler.append(paste_frame_event)
 
-# Store references to the Labels
-labels = [[None for _ in range(cols)] for _ in range(rows)]
-
-# Create the grid of labels with sprites
-for row in range(rows):
-    for col in range(cols):
-        color = random.choice(colors)
-        label = tk.Label(frame, image=circle_sprites[color], bg="white", borderwidth=0)
-        label.color = color  # Track the current color
-        label.grid(row=row, column=col, padx=circle_padding, pady=circle_padding)
-        label.bind("<Button-1>", on_mouse_press)
-        label.bind("<B1-Motion>", on_mouse_drag)
-        label.bind("<ButtonRelease-1>", on_mouse_release)
-        labels[row][col] = label
-
-def get_label_colors(labels):
-    color_grid = [[None for _ in range(len(labels))] for _ in range(len(labels[0]))]
-
-    for i, row in enumerate(labels):
-        for j, label in enumerate(row):
-            # Get the color of the label (assuming it is stored as an RGB tuple)
-            color_code = label.color  # label.color is expected to be an RGB tuple
-            if not color_code.startswith('#'):
-                color_code = root.winfo_rgb(label.color)
-            color_grid[i][j] = color_code
-
-    return color_grid
-
-def labels_to_grid(labels):
-    """
-    Convert a 2D array of labels into a grid of hexadecimal values.
-
-    Args:
-        labels (list of list of tk.Label): A 2D array of tkinter Label widgets.
-
-    Returns:
-        list of list of str: A 2D array of 2-digit hexadecimal strings.
-    """
-    # Initialize an empty grid with dimensions transposed
-    grid = [[None for _ in range(len(labels))] for _ in range(len(labels[0]))]
-
-    for i, row in enumerate(labels):
-        for j, label in enumerate(row):
-            # Get the color of the label (assuming it is stored as an RGB tuple)
-            color_code = label.color  # label.color is expected to be an RGB tuple
-            if not color_code.startswith('#'):
-                color_code = root.winfo_rgb(label.color)
-
-            # Convert the RGB color to a 2-digit hexadecimal value
-            hex_value = rgb_to_hex(color_code)
-
-            # Assign the transposed value
-            grid[j][i] = hex_value
-
-    return grid
-
-# Placeholder function for sending the grid configuration
-async def send_config():
-    print("Send Config: Current grid configuration sent!")  # Replace with actual functionality
-    await controller.drawFrame(labels_to_grid(labels))
+# The grid's state lives in grid_model, which keeps the exact color each bulb was
+# painted with for the preview; the canvas draws it, one circle per bulb
+grid_model = GridModel(rows, cols, fill=random.choice(colors), keep_rgb=True)
+grid_view = GridCanvas(
+    frame, grid_model, circle_sprites, base_circle.width + 2 * circle_padding, bg="white"
+)
+grid_view.pack()
+stroke = Stroke(edit_cells, rows, cols, grid_view.cell_size, radius=base_circle.width / 2)
+history = EditHistory(apply_history_cells, restore_keyframe, keyframe_color_grid, rows, cols, "#1a1a1a")
+for sequence, handler in (
+    ("<Control-z>", undo), ("<Control-y>", redo),
+    ("<Control-c>", copy_selection), ("<Control-v>", paste_selection), ("<Delete>", delete_selection),
+):
+    root.bind(sequence, grid_shortcut(handler))
+grid_view.bind("<Button-1>", on_mouse_press)
+grid_view.bind("<B1-Motion>", on_mouse_drag)
+grid_view.bind("<ButtonRelease-1>", on_mouse_release)
+
+# Hand the current grid to the controller worker; it is sent in the background.
+# The worker reads the frame on its own thread while the grid keeps changing, so it gets a copy
+def send_config():
+    with metrics.span("ui.send_config"):
+        controller_worker.submit(grid_model.frame().copy(), force=True)
+    send_status.config(text="Sending...")
 
 def send_button_callback():
-    asyncio.run(send_config())
+    send_config()
+
+# Report finished sends, the connection state and autosave failures, polled on the Tk thread
+def poll_send_results():
+    status = controller_worker.status
+    controller_status.config(
+        text=f"Controller: {status}", fg="darkgreen" if status == CONNECTED else "darkred"
+    )
+    journal_error = journal.error if journal is not None else None
+    autosave_status.config(text=f"Autosave failed: {journal_error}" if journal_error is not None else "")
+    while not controller_worker.results.empty():
+        frame_id, cells, error = controller_worker.results.get()
+        if error is not None:
+            send_status.config(text=f"Send failed: {error}")
+        else:
+            send_status.config(text=f"Sent ({cells} bulbs)")
+    root.after(50, poll_send_results)
 
 def save_button_callback():
-    file_path = filedialog.asksaveasfilename(defaultextension=".lcf", filetypes=[("Lights creation file", "*.lcf"), ("All files", "*.*")])
+    # Text .lcf unless the binary format is picked
+    file_path = filedialog.asksaveasfilename(
+        defaultextension=LCF_EXTENSION,
+        filetypes=[("Lights creation file", "*" + LCF_EXTENSION), ("Binary lights creation file", "*" + BINARY_LCF_EXTENSION), ("All files", "*.*")],
+    )
+    if not file_path:
+        return
+    if file_path.lower().endswith(BINARY_LCF_EXTENSION):
+        save_frames_to_binary([grid_model.frame()], file_path)
+    else:
+        save_grid_to_file(codes_to_hex_grid(grid_model.frame()), file_path)
+
+def store_keyframes(frames):
+    # Store rows x cols arrays of palette codes as keyframes on the timeline, e.g. an
+    # import or a loaded file. The arrays are kept as they are rather than turned into
+    # color grids, they go to the journal as one batch, and the timeline is drawn once
+    if not frames:
+        return
+    for frame_num, codes in frames.items():
+        keyframe_data[frame_num] = codes
+        keyframe_index.add(frame_num)
+        playback_codes.pop(frame_num, None)
+        tweener.set_keyframe(frame_num, codes)
+    player.invalidate()
+    if journal is not None:
+        journal.keyframes({frame_num: grid_model.codes_to_values(codes) for frame_num, codes in frames.items()})
+    timeline.set_total_frames(max(frames) + 1)
+    timeline.add_keyframes_ui(frames)
+
+def keyframe_codes(frame_num):
+    # A keyframe as a rows x cols array of palette codes
+    data = keyframe_data[frame_num]
+    return data if isinstance(data, np.ndarray) else color_grid_to_codes(data)
+
+def keyframe_color_grid(frame_num):
+    # A keyframe as a color grid, the form edits and the undo history work with; None if there is none
+    data = keyframe_data.get(frame_num)
+    return codes_to_color_grid(data) if isinstance(data, np.ndarray) else data
+
+def color_grid_to_codes(color_grid):
+    # Convert a grid of label colors back into a rows x cols array of palette codes
+    return colorconversion.color_grid_to_codes(color_grid, root.winfo_rgb)
+
+def save_animation_button_callback():
+    file_path = filedialog.asksaveasfilename(defaultextension=ANIMATION_EXTENSION, filetypes=[("Lights animation", "*" + ANIMATION_EXTENSION), ("All files", "*.*")])
     if file_path:
-        save_grid_to_file(labels_to_grid(labels), file_path)
+        # Animation files store grids in grid[x][y] order, like the other save paths.
+        # Effect frames are stored too, computed one at a time as they are written, so
+        # players that only read frames show them, along with a frame ending each clip.
+        # The clips themselves go in the settings and are rebuilt on load
+        covered, after = effect_track.baked_frames(timeline.total_frames)
+        clip_ends = after - set(keyframe_data)
+        settings = {
+            "interpolation": interpolation_var.get(),
+            "effects": effect_track.specs(),
+            "clip_end_frames": sorted(clip_ends),
+        }
+        save_animation(LazyFrames(set(keyframe_data) | covered | clip_ends, export_frame), file_path,
+                       total_frames=timeline.total_frames, settings=settings)
+
+def export_frame(frame_num):
+    # What the timeline shows at frame_num
+    rendered = render_playback_frame(frame_num)
+    if rendered is None:
+        return np.full((cols, rows), 0xFE, dtype=np.uint8)
+    return rendered[2]
+
+def load_button_callback():
+    file_path = filedialog.askopenfilename(filetypes=[
+        ("Lights creation file", f"*{LCF_EXTENSION} *{BINARY_LCF_EXTENSION} *{ANIMATION_EXTENSION}"), ("All files", "*.*")
+    ])
+    if not file_path:
+        return
+
+    # A loaded file replaces the design
+    clear_design()
+    if is_animation_file(file_path):
+        animation = load_animation(file_path)
+        settings = animation.settings
+        effect_track.add_specs(settings.get("effects", []), rows, cols)
+        # Frames the clips cover, and the ones ending them, come from the rebuilt clips
+        clip_ends = set(settings.get("clip_end_frames", []))
+        store_keyframes({
+            frame_num: animation.read(position).T
+            for position, frame_num in enumerate(animation.keyframe_numbers.tolist())
+            if frame_num not in clip_ends and effect_track.clip_at(frame_num) is None
+        })
+        effects_changed()
+        if "interpolation" in settings:
+            interpolation_var.set(settings["interpolation"])
+            interpolation_changed(settings["interpolation"])
+        timeline.set_total_frames(animation.total_frames)
+        journal_settings()
+        timeline.select_frame(0)
+        return
+
+    lcf = load_lcf(file_path)
+    x0, y0 = lcf.origin
+    if x0 + lcf.frames.shape[1] > cols or y0 + lcf.frames.shape[2] > rows:
+        messagebox.showwarning(
+            "Load File", f"The design in this file does not fit on the {cols} x {rows} grid; the part outside it is cut off."
+        )
+    store_keyframes({i: place_frame(lcf.frame(i), x0, y0).T for i in range(len(lcf))})
+
+    journal_settings()
+    timeline.select_frame(0)
+
+def clear_design():
+    # Forget every keyframe and effect, and their timeline markers
+    keyframe_data.clear()
+    keyframe_index.clear()
+    playback_codes.clear()
+    tweener.clear()
+    effect_track.clear()
+    player.invalidate()
+    timeline.keyframes.clear()
+    timeline.set_ranges([])  # Redraws the timeline
+    if journal is not None:
+        journal.clear_keyframes()
+    history.clear()  # Its entries refer to the design being replaced
+
+def place_frame(frame, x0, y0):
+    # Files hold cropped grids in grid[x][y] order, so place them back on a full grid,
+    # cutting off whatever falls outside it
+    full_grid = np.full((cols, rows), 0xFE, dtype=np.uint8)
+    width, height = min(frame.shape[0], cols - x0), min(frame.shape[1], rows - y0)
+    if width > 0 and height > 0:
+        full_grid[x0:x0 + width, y0:y0 + height] = frame[:width, :height]
+    return full_grid
+
+def import_button_callback():
+    file_paths = filedialog.askopenfilenames(filetypes=[("Images", "*.png *.gif *.jpg *.jpeg *.bmp *.webp"), ("All files", "*.*")])
+    if not file_paths:
+        return
+
+    # Frames land on the timeline starting at the selected frame
+    start_frame = timeline.selected_frame or 0
+    source = file_paths[0] if len(file_paths) == 1 else list(file_paths)
+
+    store_keyframes({start_frame + i: codes for i, codes in enumerate(import_frames(source, rows, cols, dither=dither_var.get()))})
+    # Imports are not undoable, and keyframe edits recorded before them no longer apply
+    history.clear()
+
+    journal_settings()
+    timeline.select_frame(start_frame)
 
 send_button.configure(command=send_button_callback)
 save_button.configure(command=save_button_callback)
+import_button.configure(command=import_button_callback)
+load_button.configure(command=load_button_callback)
+save_animation_button.configure(command=save_animation_button_callback)
+
+# Playback: each timeline frame renders to (id, grid to show, codes in grid[x][y] order)
+# Held frames share their keyframe's id and cached codes, blended frames get their own
+playback_codes = {}  # Keyframe number -> palette codes in grid[x][y] order
+shown_frame = None
+
+def render_playback_frame(frame_num):
+    clip = effect_track.clip_at(frame_num)
+    if clip is not None:
+        codes = clip.frame(frame_num)
+        return ("effect", frame_num), codes, codes.T
+
+    if tweener.is_tween(frame_num):
+        codes = tweener.frame(frame_num)
+        return ("tween", frame_num), codes, codes.T
+
+    key = previous_keyframe(frame_num)
+    if key is None:
+        return None
+    if key not in playback_codes:
+        playback_codes[key] = keyframe_codes(key).T
+    return key, keyframe_data[key], playback_codes[key]
+
+def show_playback_frame(frame_num, rendered):
+    global shown_frame
+    timeline.select_frame_ui(frame_num)
+    # Only touch the grid and the hardware when the frame actually changes
+    if rendered is not None and rendered[0] != shown_frame:
+        frame_id, grid, codes = rendered
+        show_grid(grid)
+        controller_worker.submit(codes)
+        shown_frame = frame_id
+
+def play_button_callback():
+    global shown_frame
+    if not player.playing:
+        player.total_frames = timeline.total_frames
+        player.loop = loop_var.get()
+        player.set_fps(spinbox_value(fps_var, player.fps))
+        player.seek(timeline.selected_frame or 0)
+        shown_frame = None
+    player.toggle()
+    play_button.config(text="Pause" if player.playing else "Play")
+
+def playback_stopped():
+    # Also called when a timeline that does not loop reaches its end
+    play_button.config(text="Play")
+
+def spinbox_value(var, fallback):
+    # A Spinbox's positive number; anything else typed into it is replaced by fallback
+    try:
+        value = var.get()
+    except tk.TclError:
+        value = None
+    if value is None or value <= 0:
+        var.set(fallback)
+        return fallback
+    return value
+
+def interpolation_changed(mode):
+    tweener.set_mode(mode)
+    player.invalidate()
+    journal_settings()
+
+# Effects fill a range of frames starting at the selected one
+def add_effect_callback():
+    start = timeline.selected_frame or 0
+    length = spinbox_value(effect_length_var, 90)
+    clip = EffectClip(effect_var.get(), start, length, rows, cols, fps=spinbox_value(fps_var, player.fps))
+    effect_track.add(clip)
+    effects_changed()
+    timeline.set_total_frames(clip.stop)
+    timeline.select_frame(start)
+
+def remove_effect_callback():
+    clip = effect_track.clip_at(timeline.selected_frame or 0)
+    if clip is not None:
+        effect_track.remove(clip)
+        effects_changed()
+        timeline.select_frame(timeline.selected_frame or 0)
+
+def effects_changed():
+    timeline.set_ranges((clip.start, clip.stop) for clip in effect_track)
+    player.invalidate()
+    journal_settings()
+
+# Autosave: the timeline settings are journaled whenever they change, grid cells with every edit
+def journal_settings():
+    if journal is not None:
+        journal.settings(
+            total_frames=timeline.total_frames,
+            interpolation=interpolation_var.get(),
+            effects=effect_track.specs(),
+        )
+
+def journal_edit(changes):
+    # Frames shown for playback or selection are not journaled, only edits; the first
+    # edit after one of those journals the whole grid so the two never get mixed
+    global journal_grid_stale
+    if journal is None or not changes:
+        return
+    if journal_grid_stale:
+        journal_grid_stale = False
+        journal.grid(grid_model.values())
+        return
+    changed_rows, changed_cols = np.array([change[:2] for change in changes], dtype=np.intp).T
+    journal.cells(changed_rows, changed_cols, grid_model.values_at(changed_rows, changed_cols))
+
+def restore_session(state):
+    # Put back a design recovered from the journal
+    for frame_num, values in sorted(state.keyframes.items()):
+        keyframe_data[frame_num] = grid_model.to_color_grid(values)
+        keyframe_edited(frame_num)
+        timeline.add_keyframe_ui(frame_num)
+    settings = state.settings
+    effect_track.add_specs(settings.get("effects", []), rows, cols)
+    effects_changed()
+    if "interpolation" in settings:
+        interpolation_var.set(settings["interpolation"])
+        interpolation_changed(settings["interpolation"])
+    timeline.set_total_frames(max(settings.get("total_frames", 0), effect_track.stop, max(keyframe_data, default=-1) + 1))
+    grid_model.set_values(state.grid)
+
+def start_journal():
+    # Recover the last session on a thread, so a long journal does not hold up the window
+    global recovery
+    recovery = recover_in_background(autosave_path, (rows, cols))
+    root.after(RECOVERY_POLL_MS, finish_recovery)
+
+def finish_recovery():
+    # Once recovered, put the last session back, then journal everything from here on
+    global journal
+    if not recovery.done():
+        root.after(RECOVERY_POLL_MS, finish_recovery)
+        return
+    state = recovery.result()
+    if state is not None:
+        restore_session(state)
+    else:
+        state = JournalState((rows, cols), grid_model.values())
+    journal = Journal(autosave_path, (rows, cols))
+    journal.start(state)
+
+effect_track = EffectTrack()
+tweener = Tweener()
+player = Player(root, render_playback_frame, show_playback_frame, timeline.total_frames, on_stop=playback_stopped)
+
+# Playback controls live next to the timeline buttons
+play_button = tk.Button(timeline.button_frame, text="Play", command=play_button_callback)
+play_button.pack(side="left")
+fps_var = tk.IntVar(value=30)
+tk.Label(timeline.button_frame, text="FPS").pack(side="left")
+tk.Spinbox(timeline.button_frame, from_=1, to=60, width=4, textvariable=fps_var).pack(side="left")
+loop_var = tk.BooleanVar(value=True)
+tk.Checkbutton(timeline.button_frame, text="Loop", variable=loop_var).pack(side="left")
+interpolation_var = tk.StringVar(value="hold")
+tk.Label(timeline.button_frame, text="Tween").pack(side="left")
+tk.OptionMenu(timeline.button_frame, interpolation_var, *INTERPOLATION_MODES, command=interpolation_changed).pack(side="left")
+effect_var = tk.StringVar(value="plasma")
+tk.OptionMenu(timeline.button_frame, effect_var, *EFFECTS).pack(side="left")
+effect_length_var = tk.IntVar(value=90)
+tk.Label(timeline.button_frame, text="Frames").pack(side="left")
+tk.Spinbox(timeline.button_frame, from_=1, to=100000, width=6, textvariable=effect_length_var).pack(side="left")
+tk.Button(timeline.button_frame, text="Add Effect", command=add_effect_callback).pack(side="left")
+tk.Button(timeline.button_frame, text="Remove Effect", command=remove_effect_callback).pack(side="left")
+
+poll_send_results()
+if autosave_path:
+    start_journal()
+
+# Connect in the background once the window is showing; frames wait until it is up
+root.after_idle(lambda: controller_worker.connect(run_simul_on_fail=False))
 
 # Run the Tkinter main loop
 root.mainloop()
+controller_worker.stop()
+if journal is not None:
+    journal.close()
+if record_path:
+    controller.close()
@@ -0,0 +1,178 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from designtool.colorconversion import codes_to_rgb, rgb_array_to_codes
+from designtool.keyframes import KeyframeIndex
+
+# "hold" shows the most recent keyframe until the next one, as the timeline always has
+INTERPOLATION_MODES = ("hold", "linear", "hsv", "ease")
+
+
+def rgb_to_hsv(rgb):
+    # Vectorized RGB (0-255) -> HSV, with hue in turns (0-1) and s/v in 0-1
+    rgb = rgb.astype(np.float32) / 255
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    v = rgb.max(axis=-1)
+    c = v - rgb.min(axis=-1)
+    safe_c = np.where(c == 0, 1, c)
+
+    h = np.where(v == r, ((g - b) / safe_c) % 6,
+        np.where(v == g, (b - r) / safe_c + 2, (r - g) / safe_c + 4)) / 6
+    h = np.where(c == 0, 0, h)
+    s = np.where(v == 0, 0, c / np.where(v == 0, 1, v))
+    return np.stack([h, s, v], axis=-1)
+
+
+def hsv_to_rgb(hsv):
+    # Vectorized inverse of rgb_to_hsv, returning float RGB in 0-255
+    h, s, v = hsv[..., 0] % 1, hsv[..., 1], hsv[..., 2]
+    i = np.floor(h * 6).astype(np.int8) % 6
+    f = h * 6 - np.floor(h * 6)
+    p, q, t = v * (1 - s), v * (1 - f * s), v * (1 - (1 - f) * s)
+    r = np.choose(i, [v, q, p, p, t, v])
+    g = np.choose(i, [t, v, v, q, p, p])
+    b = np.choose(i, [p, p, t, v, v, q])
+    return np.stack([r, g, b], axis=-1) * 255
+
+
+def ease_in_out(t):
+    # Smoothstep: slow start and end, fast middle
+    return t * t * (3 - 2 * t)
+
+
+def blend(start_rgb, end_rgb, t, mode):
+    """
+    Blend two whole frames of RGB colors in one operation.
+
+    Args:
+        start_rgb (numpy.ndarray): H x W x 3 colors at t = 0.
+        end_rgb (numpy.ndarray): H x W x 3 colors at t = 1.
+        t (float): Position between the two frames, 0-1.
+        mode (str): "linear", "hsv" or "ease".
+
+    Returns:
+        numpy.ndarray: H x W x 3 float RGB colors.
+    """
+    if mode == "ease":
+        t = ease_in_out(t)
+    if mode in ("linear", "ease"):
+        return start_rgb + (end_rgb.astype(np.float32) - start_rgb) * t
+    if mode == "hsv":
+        start_hsv, end_hsv = rgb_to_hsv(start_rgb), rgb_to_hsv(end_rgb)
+        # Take the shorter way around the hue circle
+        hue_delta = (end_hsv[..., 0] - start_hsv[..., 0] + 0.5) % 1 - 0.5
+        hsv = start_hsv + (end_hsv - start_hsv) * t
+        hsv[..., 0] = start_hsv[..., 0] + hue_delta * t
+        return hsv_to_rgb(hsv)
+    raise ValueError(f"Unknown interpolation mode: {mode}")
+
+
+class TweenCache:
+    """
+    LRU cache of computed in-between frames, capped by memory.
+
+    Args:
+        max_bytes (int): Least recently used frames are evicted past this size.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.frames = OrderedDict()  # Frame number -> palette codes
+
+    def get(self, frame_num):
+        frame = self.frames.get(frame_num)
+        if frame is not None:
+            self.frames.move_to_end(frame_num)
+        return frame
+
+    def put(self, frame_num, frame):
+        self.invalidate(frame_num, frame_num + 1)
+        self.frames[frame_num] = frame
+        self.size += frame.nbytes
+        while self.size > self.max_bytes and self.frames:
+            _, evicted = self.frames.popitem(last=False)
+            self.size -= evicted.nbytes
+
+    def invalidate(self, start=None, stop=None):
+        # Drop cached frames in [start, stop); None leaves that end open
+        for frame_num in [n for n in self.frames if (start is None or n >= start) and (stop is None or n < stop)]:
+            self.size -= self.frames.pop(frame_num).nbytes
+
+
+class Tweener:
+    """
+    Compute the frames between keyframes.
+
+    Keyframes are given as arrays of palette codes. Each in-between frame is
+    one blend over the whole grid, quantized back to the bulb palette, and
+    kept in a TweenCache. Editing a keyframe only invalidates the frames
+    whose blend depends on it.
+
+    Args:
+        mode (str): One of INTERPOLATION_MODES.
+        cache (TweenCache): Where computed frames are kept.
+    """
+
+    def __init__(self, mode="hold", cache=None):
+        self.mode = mode
+        self.cache = cache or TweenCache()
+        self.keys = KeyframeIndex()
+        self.keyframe_rgb = {}  # Keyframe number -> H x W x 3 bulb colors
+
+    def set_mode(self, mode):
+        if mode not in INTERPOLATION_MODES:
+            raise ValueError(f"Unknown interpolation mode: {mode}")
+        if mode != self.mode:
+            self.mode = mode
+            self.cache.invalidate()
+
+    def _affected_range(self, frame_num):
+        # Frames blended from this keyframe lie between its neighbours
+        start = self.keys.previous(frame_num - 1)
+        following = self.keys.next(frame_num)
+        stop = following + 1 if following is not None else None
+        return start, stop
+
+    def set_keyframe(self, frame_num, codes):
+        self.keys.add(frame_num)
+        self.keyframe_rgb[frame_num] = codes_to_rgb(codes)
+        self.cache.invalidate(*self._affected_range(frame_num))
+
+    def remove_keyframe(self, frame_num):
+        if frame_num in self.keyframe_rgb:
+            self.cache.invalidate(*self._affected_range(frame_num))
+            self.keys.remove(frame_num)
+            del self.keyframe_rgb[frame_num]
+
+    def clear(self):
+        self.keys.clear()
+        self.keyframe_rgb.clear()
+        self.cache.invalidate()
+
+    def is_tween(self, frame_num):
+        # Whether frame_num lies strictly between two keyframes and gets blended
+        if self.mode == "hold":
+            return False
+        start_key = self.keys.previous(frame_num)
+        return start_key is not None and start_key != frame_num and self.keys.next(frame_num) is not None
+
+    def frame(self, frame_num):
+        """
+        The palette codes shown at frame_num, or None before the first keyframe.
+        """
+        start_key = self.keys.previous(frame_num)
+        if start_key is None:
+            return None
+        if not self.is_tween(frame_num):
+            return rgb_array_to_codes(self.keyframe_rgb[start_key])
+
+        frame = self.cache.get(frame_num)
+        if frame is None:
+            end_key = self.keys.next(frame_num)
+            t = (frame_num - start_key) / (end_key - start_key)
+            rgb = blend(self.keyframe_rgb[start_key], self.keyframe_rgb[end_key], t, self.mode)
+            frame = rgb_array_to_codes(np.clip(np.rint(rgb), 0, 255).astype(np.uint8))
+            self.cache.put(frame_num, frame)
+        return frame